@@ -1,62 +1,102 @@
+import json
 import random
-from db import Cricket, update_game_result
+import time
+from collections import deque
+from db import update_game_result
+from catalog import get_catalog
 from pprint import pprint
 
 class GamePlay:
+    # Called as record_result(game_id, winner, loser) when a game ends;
+    # the simulator swaps in a no-op so games run without a database
+    record_result = staticmethod(update_game_result)
+    # Called as journal(game_id, kind, fields) after every change to a dealt
+    # game, so it can be rebuilt after a restart (see turnlog.py)
+    journal = None
+
     def __init__(self, game_id, player1_email):
         self.game_id = game_id
         self.player1 = player1_email
         self.player2 = None
         self.turn = player1_email
-        self.deck1 = []
-        self.deck2 = []
+        # Decks hold card indices into self.catalog, top card on the left
+        self.catalog = None
+        self.deck1 = deque()
+        self.deck2 = deque()
         self.matched = False
         self.active = True
         self.starter = None
+        # email of the server-side bot opponent, if any (see bots.py)
+        self.bot = None
 
         self.last_result = None
         self.winner_of_game = None
         # New flag to track if current turn has been processed
         self.turn_processed = False
+        # wall clock of the last move, for idle/turn timeouts (see lifecycle.py)
+        self.last_activity = time.time()
+
+    def touch(self):
+        self.last_activity = time.time()
+
+    def _log(self, kind, **fields):
+        if self.journal is not None:
+            self.journal(self.game_id, kind, fields)
 
-    def join(self, player2_email):
+    def join(self, player2_email, catalog=None, rng=None):
         """
         When second player joins, shuffle and split cards into two decks.
-        Store cards as plain dicts to avoid DetachedInstanceError.
+        Cards are dealt by index from the shared catalog, no DB query needed.
+        Pass a catalog and a seeded random.Random for reproducible deals.
         """
         self.player2 = player2_email
-        self.matched = True
-
-        cards = Cricket.query.all()
-        # cards = cards[0:10]
-        random.shuffle(cards)
-        mid = len(cards) // 2
 
-        # Convert SQLAlchemy objects to dictionaries
-        self.deck1 = [self._card_to_dict(card) for card in cards[:mid]]
-        self.deck2 = [self._card_to_dict(card) for card in cards[mid:]]
+        catalog = catalog if catalog is not None else get_catalog()
+        order = list(range(len(catalog)))
+        (rng or random).shuffle(order)
+        mid = len(order) // 2
 
-    def _card_to_dict(self, card):
-        data = card.__dict__.copy()
-        # Remove SQLAlchemy state
-        data.pop('_sa_instance_state', None)
-        return data
+        self.catalog = catalog
+        self.deck1 = deque(order[:mid])
+        self.deck2 = deque(order[mid:])
+        # only report matched once the decks are dealt
+        self.matched = True
+        self.touch()
+        if self.journal is not None:
+            ids = catalog.ids
+            self._log('deal', player1=self.player1, player2=player2_email, bot=self.bot,
+                      deck1=[ids[i] for i in self.deck1], deck2=[ids[i] for i in self.deck2])
+
+    def set_starter(self, player_email):
+        self.starter = player_email
+        self.turn = player_email
+        self.touch()
+        self._log('starter', player=player_email)
+
+    def card(self, index):
+        """Build the API dict for a card index held in this game's decks."""
+        if index is None:
+            return None
+        return self.catalog.card_dict(index)
 
     def get_current_turn(self):
         return self.turn
 
     def get_top_card(self, player_email):
         if player_email == self.player1 and self.deck1:
-            return self.deck1[0]
+            return self.card(self.deck1[0])
         elif player_email == self.player2 and self.deck2:
-            return self.deck2[0]
+            return self.card(self.deck2[0])
         return None
 
    
 
     def play_turn(self, player_email, attribute):
+        if not self.active:
+            return  # finished, or forfeited and lingering for the last fetches
         if player_email != self.turn:
             return  # Not this player's turn
+        self.touch()
 
         card1 = self.deck1[0]
         card2 = self.deck2[0]
@@ -64,13 +104,14 @@ class GamePlay:
 
         
 
-        val1 = card1.get(attribute)
-        val2 = card2.get(attribute)
-        if val1 is None or val2 is None:
+        # Compare per-attribute ranks precomputed by the catalog
+        rank1 = self.catalog.rank(card1, attribute)
+        rank2 = self.catalog.rank(card2, attribute)
+        if rank1 is None or rank2 is None:
             return  # Invalid attribute
 
         # Determine outcome
-        if val1 > val2:
+        if rank1 > rank2:
             winner_email = self.player1
             loser_email = self.player2
             winner_card = card1
@@ -85,12 +126,12 @@ class GamePlay:
 
 
         if winner_email == self.player1:
-            self.deck1.append(self.deck1.pop(0))
-            self.deck1.append(self.deck2.pop(0))
+            self.deck1.rotate(-1)
+            self.deck1.append(self.deck2.popleft())
             self.turn = self.player1
         else:
-            self.deck2.append(self.deck2.pop(0))
-            self.deck2.append(self.deck1.pop(0))
+            self.deck2.rotate(-1)
+            self.deck2.append(self.deck1.popleft())
             self.turn = self.player2
 
 
@@ -106,17 +147,18 @@ class GamePlay:
             final_winner = self.player2
             self.active = False
             self.winner_of_game = final_winner
-            update_game_result(self.game_id, final_winner, self.player1)
+            self.record_result(self.game_id, final_winner, self.player1)
         elif not self.deck2:
             game_ended = True
             final_winner = self.player1
             self.active = False
             self.winner_of_game = final_winner
-            update_game_result(self.game_id, final_winner, self.player2)    
+            self.record_result(self.game_id, final_winner, self.player2)
 
         # Store opponent card relative to the *current turn owner* (i.e. the player who played)
         opponent_card = card2 if player_email == self.player1 else card1
 
+        # Cards are stored as catalog indices; see GamePlay.card()
         self.last_result = {
             'winner': winner_email,
             'attribute': attribute,
@@ -127,7 +169,60 @@ class GamePlay:
             'next_turn': self.turn
         }
 
-        self.turn_processed = True
+        # in a bot game only the bot's moves are polled for
+        self.turn_processed = self.bot is None or player_email == self.bot
+        if self.journal is not None:
+            self.journal(self.game_id, 'turn', {'player': player_email, 'attribute': attribute})
+
+    def forfeit(self, loser_email):
+        """End the game against a player who stopped playing; returns the winner."""
+        winner_email = self.player2 if loser_email == self.player1 else self.player1
+        self.active = False
+        self.winner_of_game = winner_email
+        self.touch()
+        self._log('forfeit', loser=loser_email)
+        return winner_email
+
+    # -------- Serialization for shared state stores --------
+
+    _STATE_FIELDS = ('game_id', 'player1', 'player2', 'turn', 'matched', 'active',
+                     'starter', 'winner_of_game', 'turn_processed', 'last_activity', 'bot')
+
+    def to_state(self):
+        """
+        Compact JSON encoding of this game. Cards are written as card ids, not
+        catalog indices, so another process with its own catalog can load it.
+        """
+        state = {name: getattr(self, name) for name in self._STATE_FIELDS}
+        ids = self.catalog.ids if self.catalog is not None else ()
+        state['deck1'] = [ids[i] for i in self.deck1]
+        state['deck2'] = [ids[i] for i in self.deck2]
+        lr = self.last_result
+        if lr is not None:
+            # None: the card was deleted from the catalog since (see from_state)
+            lr = dict(lr, won_card=None if lr['won_card'] is None else ids[lr['won_card']],
+                      lost_card=None if lr['lost_card'] is None else ids[lr['lost_card']])
+        state['last_result'] = lr
+        return json.dumps(state, separators=(',', ':')).encode()
+
+    @classmethod
+    def from_state(cls, data):
+        state = json.loads(data)
+        gp = cls(state['game_id'], state['player1'])
+        for name in cls._STATE_FIELDS:
+            if name in state:  # newer fields are missing from older states
+                setattr(gp, name, state[name])
+        gp.catalog = catalog = get_catalog()
+        index_of = catalog.index_of
+        # cards deleted since the game was dealt are simply dropped
+        gp.deck1 = deque(index_of[c] for c in state['deck1'] if c in index_of)
+        gp.deck2 = deque(index_of[c] for c in state['deck2'] if c in index_of)
+        lr = state['last_result']
+        if lr is not None:
+            lr['won_card'] = index_of.get(lr['won_card'])
+            lr['lost_card'] = index_of.get(lr['lost_card'])
+        gp.last_result = lr
+        return gp
 
     def __str__(self):
         return f"Game ID: {self.game_id}, Player 1: {self.player1}, Player 2: {self.player2}, Turn: {self.turn}, Matched: {self.matched}"
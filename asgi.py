@@ -0,0 +1,278 @@
+"""
+ASGI entry point for the player API:  uvicorn asgi:application
+
+The endpoints clients sit on while waiting (/wait_event, /events/<game_id>,
+/check_match with a "wait" timeout and the /ws/<game_id> socket) are served
+natively on the event loop and park an asyncio future per connection, so one
+process can hold tens of thousands of idle players. Every other route
+(/register, /login, /start_game, /play_turn, /get_game_state,
+/get_match_history, ...) is the same Flask view, run on a pool of
+WSGI_WORKERS threads so its SQLAlchemy calls neither block the loop nor wait
+on each other.
+
+Matchmaking stays in app.py's Matchmaker, shared with the Flask views, so
+/start_game is one of the pooled routes; only the wait for an opponent
+(/check_match with "wait") runs on the loop.
+
+    python loadtest.py --compare-servers --database sqlite:////path/to/games.db --idle 2000
+
+serves the app both ways (werkzeug's threaded WSGI server, then uvicorn) and
+runs the same loadtest.py games against each while `--idle` players hold
+long-polls open.
+"""
+import asyncio
+import json
+from urllib.parse import parse_qsl
+
+from a2wsgi import WSGIMiddleware
+
+from app import (app, games, hub, tokens, lifecycle, matchmaker, match_redirect, bot_wait, match_bot,
+                 play_bot_turn, apply_turn, start_turn_log, plays_in)
+from push import KEEPALIVE, public_event, sse_format
+from state_store import MemoryStateStore
+from tokens import InvalidToken, bearer_token, resolve_email
+from ws import player_frames
+
+MAX_WAIT = 60  # seconds a long-poll may be held
+WSGI_WORKERS = 32  # threads running the Flask views
+
+wsgi_app = WSGIMiddleware(app, workers=WSGI_WORKERS)
+
+
+async def _get_game(game_id):
+    # shared stores do network/disk I/O, keep it off the event loop
+    if isinstance(games.store, MemoryStateStore):
+        return games.get(game_id)
+    return await asyncio.to_thread(_load_game, game_id)
+
+
+def _load_game(game_id):
+    # app context: loading a stored game builds the card catalog from the database
+    with app.app_context():
+        return games.get(game_id)
+
+
+async def _read_json(receive):
+    body = b''
+    more = True
+    while more:
+        message = await receive()
+        body += message.get('body', b'')
+        more = message.get('more_body', False)
+    try:
+        return json.loads(body or b'{}') or {}
+    except ValueError:
+        return {}
+
+
+def _player_email(scope, data):
+    """Same rules as app.player_email, from the raw ASGI scope."""
+    headers = dict(scope['headers'])
+    token = bearer_token(headers.get(b'authorization', b'').decode()) or data.get('token')
+    return resolve_email(tokens, token, data.get('email'), app.config['TOKEN_REQUIRED'])
+
+
+async def _send_json(send, payload, status=200):
+    body = json.dumps(payload).encode()
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json'),
+                            (b'access-control-allow-origin', b'*')]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def wait_event(scope, receive, send):
+    data = await _read_json(receive)
+    game_id = str(data.get('game_id'))
+    after = int(data.get('after') or 0)
+    timeout = min(float(data.get('timeout') or 25), MAX_WAIT)
+    email = _player_email(scope, data)
+    gp = await _get_game(game_id)
+    if not gp:
+        return await _send_json(send, {'error': 'Game not found'}, 404)
+    if not plays_in(gp, email):
+        return await _send_json(send, {'error': 'Not a player in this game'}, 403)
+    if gp.bot is not None:
+        await asyncio.to_thread(_bot_turn, game_id)
+    found = await hub.wait_async(game_id, email, after, timeout)
+    if found is None:
+        return await _send_json(send, {'events': [], 'closed': True})
+    await _send_json(send, {'events': [public_event(e) for e in found]})
+
+
+async def check_match(scope, receive, send):
+    data = await _read_json(receive)
+    game_id = str(data.get('game_id'))
+    email = _player_email(scope, data)
+    moved, new_game_id = matchmaker.redirect(game_id)
+    if moved:
+        with app.app_context():
+            response, status = match_redirect(game_id, new_game_id)
+        return await _send_json(send, response.get_json(), status)
+    # only games that exist get a hub channel; one for a bogus id would never be closed
+    gp = await _get_game(game_id)
+    if not gp:
+        return await _send_json(send, {'error': 'Game not found'}, 404)
+    if not plays_in(gp, email):
+        return await _send_json(send, {'error': 'Not a player in this game'}, 403)
+    seq = hub.last_seq(game_id)
+    gp = await _get_game(game_id)  # again, after seq: a match in between is seen here
+    if not gp:
+        return await _send_json(send, {'error': 'Game not found'}, 404)
+    wait = min(float(data.get('wait') or 0), MAX_WAIT)
+    bot_due = bot_wait(gp)
+    if bot_due is not None:
+        # don't hold the request past the moment the bot may step in
+        wait = min(wait, bot_due)
+    if not gp.matched and wait > 0:
+        # hold the request until start_game publishes 'matched'
+        await hub.wait_async(game_id, email, seq, wait)
+        gp = await _get_game(game_id)
+    if gp and not gp.matched and bot_wait(gp) == 0:
+        if await asyncio.to_thread(_match_bot, gp):
+            gp = await _get_game(game_id)
+    if gp and gp.matched:
+        return await _send_json(send, {'game_id': game_id, 'message': 'matched'})
+    await _send_json(send, {'message': 'waiting'}, 202)
+
+
+def _match_bot(gp):
+    with app.app_context():
+        return match_bot(gp)
+
+
+def _bot_turn(game_id):
+    # app context: the bot's winning move records the result
+    with app.app_context(), games.session(game_id) as gp:
+        if gp:
+            play_bot_turn(gp)
+
+
+def _apply_turn(game_id, email, attribute):
+    with app.app_context():
+        return apply_turn(game_id, email, attribute)
+
+
+async def events(scope, receive, send, game_id):
+    params = dict(parse_qsl(scope['query_string'].decode()))
+    email = _player_email(scope, params)
+    headers = dict(scope['headers'])
+    after = int(headers.get(b'last-event-id') or params.get('after') or 0)
+    gp = await _get_game(game_id) if email else None
+    if not gp:
+        return await _send_json(send, {'error': 'Game not found'}, 404)
+    if not plays_in(gp, email):
+        return await _send_json(send, {'error': 'Not a player in this game'}, 403)
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', b'text/event-stream'),
+                            (b'cache-control', b'no-cache'),
+                            (b'x-accel-buffering', b'no')]})
+    while True:
+        found = await hub.wait_async(game_id, email, after, KEEPALIVE)
+        if found is None:
+            break
+        chunk = ''.join(sse_format(e) for e in found) if found else ": keepalive\n\n"
+        await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+        if found:
+            after = found[-1]['seq']
+            if any(e['event'] == 'game_over' for e in found):
+                break
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def game_socket(scope, receive, send, game_id):
+    """The ws.py gameplay protocol, served on the event loop."""
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    await send({'type': 'websocket.accept'})
+
+    async def send_frame(frame):
+        await send({'type': 'websocket.send', 'text': json.dumps(frame)})
+
+    try:
+        email = _player_email(scope, dict(parse_qsl(scope['query_string'].decode())))
+    except InvalidToken as e:
+        await send_frame({'t': 'error', 'error': str(e)})
+        return await send({'type': 'websocket.close', 'code': 1008})
+    gp = await _get_game(game_id)
+    if not email or not gp:
+        await send_frame({'t': 'error', 'error': 'Game not found'})
+        return await send({'type': 'websocket.close', 'code': 1000})
+    if not plays_in(gp, email):
+        await send_frame({'t': 'error', 'error': 'Not a player in this game'})
+        return await send({'type': 'websocket.close', 'code': 1008})
+    after = hub.last_seq(game_id)
+    await send_frame({'t': 'state', 'turn': gp.get_current_turn(), 'card': gp.get_top_card(email)})
+
+    async def push():
+        nonlocal after
+        while True:
+            found = await hub.wait_async(game_id, email, after, KEEPALIVE)
+            if found is None:
+                return
+            for frame in player_frames(found, email):
+                await send_frame(frame)
+                if frame['t'] == 'over':
+                    return
+            if found:
+                after = found[-1]['seq']
+
+    async def listen():
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                return
+            try:
+                msg = json.loads(message.get('text') or message.get('bytes') or b'{}')
+            except ValueError:
+                msg = {}
+            if isinstance(msg, dict) and msg.get('t') == 'play':
+                await asyncio.to_thread(_apply_turn, game_id, email, msg.get('attribute'))
+            else:
+                hub.publish(game_id, 'error', {'error': 'Unknown message'}, to=email)
+
+    pusher, listener = asyncio.create_task(push()), asyncio.create_task(listen())
+    await asyncio.wait({pusher, listener}, return_when=asyncio.FIRST_COMPLETED)
+    client_left = listener.done()
+    for task in (pusher, listener):
+        task.cancel()
+    if not client_left:
+        # the game ended (or its channel closed) with the client still connected
+        await send({'type': 'websocket.close', 'code': 1000})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # before any request: the native routes don't pass through Flask's before_request
+            await asyncio.to_thread(start_turn_log)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            lifecycle.stop()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    kind = scope['type']
+    if kind == 'lifespan':
+        return await lifespan(receive, send)
+    if kind == 'websocket':
+        path = scope['path']
+        if path.startswith('/ws/'):
+            return await game_socket(scope, receive, send, path[len('/ws/'):])
+        # no other websocket routes: refuse the handshake
+        return await send({'type': 'websocket.close', 'code': 1000})
+    if kind != 'http':
+        raise ValueError(f"Unsupported ASGI scope type {kind!r}")
+    path, method = scope['path'], scope['method']
+    try:
+        if path == '/wait_event' and method == 'POST':
+            return await wait_event(scope, receive, send)
+        if path == '/check_match' and method == 'POST':
+            return await check_match(scope, receive, send)
+        if path.startswith('/events/') and method == 'GET':
+            return await events(scope, receive, send, path[len('/events/'):])
+    except InvalidToken as e:
+        return await _send_json(send, {'error': str(e)}, 401)
+    await wsgi_app(scope, receive, send)
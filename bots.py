@@ -0,0 +1,137 @@
+"""
+Server-side bot opponent.
+
+A player left waiting for longer than BOT_MATCH_AFTER seconds is matched
+with the bot instead. The bot always plays its top card's best attribute:
+the one with the highest chance of beating a random other card in the
+catalog, from the cards' precomputed ranks. That table is built once per
+catalog version (catalogs are immutable snapshots, and each reload gets a
+new version), which makes a bot move a tuple lookup plus play_turn: no
+database work and no HTTP round trip. The reaper in lifecycle.py matches
+waiting players with the bot and makes its moves.
+
+Bot games don't count towards ratings or the leaderboard.
+"""
+import bisect
+import secrets
+import threading
+import weakref
+
+from catalog import ATTRIBUTES
+
+BOT_EMAIL = 'bot@trumpcards.local'
+BOT_NAME = 'TrumpBot'
+# Best-attribute tables kept, for the newest catalog versions. The catalog
+# reloads with a new version every CATALOG_MAX_AGE (60 s) and a game plays on
+# the version it was dealt from, so this covers games of up to half an hour.
+CATALOG_VERSIONS = 32
+
+_tables = {}  # catalog version -> (weakref to that catalog, table)
+_tables_lock = threading.Lock()
+
+
+def best_attributes(catalog):
+    """
+    For each card index, (attribute, win probability) of its best attribute
+    against every other card in the catalog.
+    """
+    entry = _tables.get(catalog.version)
+    # the weakref check: catalogs built outside get_catalog (simulate.py) all have version 0
+    if entry is not None and entry[0]() is catalog:
+        return entry[1]
+    table = _best_table(catalog)
+    with _tables_lock:
+        _tables.pop(catalog.version, None)
+        _tables[catalog.version] = (weakref.ref(catalog), table)
+        while len(_tables) > CATALOG_VERSIONS:
+            del _tables[next(iter(_tables))]  # the oldest
+    return table
+
+
+def _best_table(catalog):
+    others = max(1, len(catalog) - 1)
+    table = []
+    sorted_ranks = {}
+    for attr in ATTRIBUTES:
+        sorted_ranks[attr] = sorted(r for r in catalog.ranks[attr] if r is not None)
+    for i in range(len(catalog)):
+        best, best_p = ATTRIBUTES[0], -1.0
+        for attr in ATTRIBUTES:
+            rank = catalog.ranks[attr][i]
+            if rank is None:
+                continue
+            # cards with a strictly lower rank lose to this one
+            p = bisect.bisect_left(sorted_ranks[attr], rank) / others
+            if p > best_p:
+                best, best_p = attr, p
+        table.append((best, best_p))
+    return tuple(table)
+
+
+def bot_attribute(gp):
+    """The attribute the bot plays with its current top card."""
+    deck = gp.deck1 if gp.bot == gp.player1 else gp.deck2
+    return best_attributes(gp.catalog)[deck[0]][0]
+
+
+def is_bot_turn(gp):
+    return gp.bot is not None and gp.active and gp.matched and gp.turn == gp.bot
+
+
+_bot_player_ready = False
+
+
+def ensure_bot_player():
+    """Create the bot's players row on first use (games reference players.email)."""
+    global _bot_player_ready
+    if _bot_player_ready:
+        return
+    from werkzeug.security import generate_password_hash
+    from db import db, Player
+    if Player.query.get(BOT_EMAIL) is None:
+        # a random password nobody knows: the bot can't be logged into
+        db.session.add(Player(email=BOT_EMAIL, name=BOT_NAME, pwd=generate_password_hash(secrets.token_hex(32))))
+        db.session.commit()
+    _bot_player_ready = True
+
+
+if __name__ == '__main__':
+    # Thousands of concurrent bot games in one process: interleave moves
+    # across all of them, like one worker serving every bot opponent.
+    import random
+    import time
+
+    from simulate import SimulatedGame, synthetic_catalog
+
+    games_count = 5000
+    catalog = synthetic_catalog(40)
+    started = time.perf_counter()
+    best_attributes(catalog)
+    print(f"best-attribute table for {len(catalog)} cards: {(time.perf_counter() - started) * 1e3:.2f} ms")
+
+    rng = random.Random(1)
+    live = []
+    for n in range(games_count):
+        gp = SimulatedGame(str(n), 'human')
+        gp.join(BOT_EMAIL, catalog=catalog, rng=rng)
+        gp.bot = BOT_EMAIL
+        gp.turn = gp.starter = BOT_EMAIL
+        live.append(gp)
+
+    bot_turns = rounds = 0
+    started = time.perf_counter()
+    while live and rounds < 10000:
+        rounds += 1
+        still = []
+        for gp in live:
+            if is_bot_turn(gp):
+                gp.play_turn(gp.bot, bot_attribute(gp))
+                bot_turns += 1
+            elif gp.active:
+                gp.play_turn(gp.turn, rng.choice(ATTRIBUTES))
+            if gp.active:
+                still.append(gp)
+        live = still
+    elapsed = time.perf_counter() - started
+    print(f"{games_count} games, {bot_turns} bot moves in {elapsed:.2f}s "
+          f"({bot_turns / elapsed:,.0f} bot moves/s including the human side)")
@@ -0,0 +1,173 @@
+import threading
+import time
+from db import Cricket
+from media import get_media_resolver
+
+try:
+    import numpy as np
+except ImportError:  # optional: resolve_batch falls back to plain Python
+    np = None
+
+# Column order of every card tuple held by the catalog
+CARD_FIELDS = (
+    'id', 'player_name', 'power', 'strike_rate', 'wickets',
+    'matches_played', 'runs_scored', 'highest_score', 'img',
+)
+FIELD_INDEX = {name: i for i, name in enumerate(CARD_FIELDS)}
+# Stats a turn can be played on
+ATTRIBUTES = ('power', 'strike_rate', 'wickets', 'matches_played', 'runs_scored', 'highest_score')
+ATTRIBUTE_INDEX = {name: i for i, name in enumerate(ATTRIBUTES)}
+
+
+class CardCatalog:
+    """
+    Immutable snapshot of the cricket table.
+    Cards are stored as plain tuples (see CARD_FIELDS) so a game only needs
+    to remember card indices; dicts are built on demand. Image paths are
+    turned into absolute URLs once, here, by `img_url`.
+
+    For each attribute every card also gets a dense rank (equal values share
+    a rank), so resolving a turn is one integer compare. resolve_batch does
+    many at once on a cards x attributes rank matrix, with NumPy if present.
+    """
+
+    def __init__(self, rows, version=0, img_url=None):
+        self.version = version
+        img = FIELD_INDEX['img']
+        cards = []
+        for row in rows:
+            card = list(row)
+            if img_url is not None:
+                card[img] = img_url(card[img])
+            cards.append(tuple(card))
+        self.cards = tuple(cards)
+        self.ids = tuple(card[0] for card in self.cards)
+        self.index_of = {card_id: i for i, card_id in enumerate(self.ids)}
+        self.ranks = {attr: self._dense_ranks(FIELD_INDEX[attr]) for attr in ATTRIBUTES}
+        self._matrix = None
+
+    def _dense_ranks(self, pos):
+        # None (a stat never filled in) has no rank, and a turn on it is rejected
+        values = sorted({card[pos] for card in self.cards if card[pos] is not None})
+        rank_of = {value: r for r, value in enumerate(values)}
+        return tuple(rank_of.get(card[pos]) for card in self.cards)
+
+    def __len__(self):
+        return len(self.cards)
+
+    def value(self, index, field):
+        pos = FIELD_INDEX.get(field)
+        if pos is None:
+            return None
+        return self.cards[index][pos]
+
+    def rank(self, index, attribute):
+        """Dense rank of a card's attribute; None for unknown attributes or missing stats."""
+        ranks = self.ranks.get(attribute)
+        if ranks is None:
+            return None
+        return ranks[index]
+
+    def matrix(self):
+        """cards x ATTRIBUTES rank matrix (missing stats rank -1); a NumPy array when available."""
+        if self._matrix is None:
+            rows = [[-1 if self.ranks[a][i] is None else self.ranks[a][i] for a in ATTRIBUTES]
+                    for i in range(len(self.cards))]
+            self._matrix = np.array(rows, dtype=np.int32).reshape(len(rows), len(ATTRIBUTES)) if np is not None else rows
+        return self._matrix
+
+    def resolve_batch(self, cards_a, cards_b, attributes):
+        """
+        Resolve many turns at once: for each (card_a, card_b, attribute) triple,
+        True when card_a wins (strictly higher, as in play_turn). Attributes
+        are ATTRIBUTES indices. Returns a NumPy bool array, or a list without NumPy.
+        """
+        m = self.matrix()
+        if np is not None:
+            attributes = np.asarray(attributes)
+            return m[np.asarray(cards_a), attributes] > m[np.asarray(cards_b), attributes]
+        return [m[a][k] > m[b][k] for a, b, k in zip(cards_a, cards_b, attributes)]
+
+    def card_dict(self, index):
+        return dict(zip(CARD_FIELDS, self.cards[index]))
+
+    @classmethod
+    def from_db(cls, version=0, base_url=None):
+        """Load every card; image URLs are made against base_url (resolved now if None)."""
+        columns = [getattr(Cricket, name) for name in CARD_FIELDS]
+        rows = Cricket.query.with_entities(*columns).order_by(Cricket.id).all()
+        resolver = get_media_resolver()
+        base_url = base_url or resolver.base_url()
+        return cls(rows, version, lambda img: resolver.absolute(img, base_url))
+
+
+# ---------------- Process-wide cache ----------------
+
+# The admin panel runs as its own process, so its edits can't invalidate our
+# cache directly; reload at most this often to pick them up.
+CATALOG_MAX_AGE = 60  # seconds
+
+_lock = threading.Lock()
+_catalog = None
+_loaded_at = 0.0
+_version = 0
+
+
+def get_catalog():
+    """Return the current catalog, loading it from the DB when missing or stale."""
+    global _catalog, _loaded_at, _version
+    catalog = _catalog
+    if catalog is not None and time.monotonic() - _loaded_at < CATALOG_MAX_AGE:
+        return catalog
+    # Before taking _lock: a changed address calls on_change (invalidate_catalog),
+    # which takes _lock itself
+    base_url = get_media_resolver().base_url()
+    with _lock:
+        if _catalog is None or time.monotonic() - _loaded_at >= CATALOG_MAX_AGE:
+            if _catalog is not None:
+                _version += 1
+            _catalog = CardCatalog.from_db(_version, base_url)
+            _loaded_at = time.monotonic()
+        return _catalog
+
+
+def invalidate_catalog():
+    """Drop the cached catalog after card CRUD; live games keep their snapshot."""
+    global _catalog, _version
+    with _lock:
+        _version += 1
+        _catalog = None
+
+
+if __name__ == '__main__':
+    # Turn resolution cost: dict lookups (the old play_turn), rank lookups and
+    # resolve_batch, on a synthetic catalog.
+    import random
+    import timeit
+
+    rng = random.Random(0)
+    rows = [(i, f"Player {i}", rng.randint(1, 100), rng.uniform(40, 180), rng.randint(0, 600),
+             rng.randint(5, 400), rng.randint(0, 20000), rng.randint(0, 260), None) for i in range(200)]
+    catalog = CardCatalog(rows)
+    n = 1_000_000
+    a = [rng.randrange(len(catalog)) for _ in range(n)]
+    b = [rng.randrange(len(catalog)) for _ in range(n)]
+    k = [rng.randrange(len(ATTRIBUTES)) for _ in range(n)]
+    names = [ATTRIBUTES[i] for i in k]
+    dicts = [catalog.card_dict(i) for i in range(len(catalog))]
+    ranks = catalog.ranks
+
+    def by_dict():
+        return [dicts[x][attr] > dicts[y][attr] for x, y, attr in zip(a, b, names)]
+
+    def by_rank():
+        return [ranks[attr][x] > ranks[attr][y] for x, y, attr in zip(a, b, names)]
+
+    assert by_dict() == by_rank() == list(catalog.resolve_batch(a, b, k))
+    if np is not None:
+        a, b, k = np.array(a), np.array(b), np.array(k)
+    for label, fn in (('dict lookups', by_dict), ('rank lookups', by_rank),
+                      ('resolve_batch' + (' (numpy)' if np is not None else ' (python)'),
+                       lambda: catalog.resolve_batch(a, b, k))):
+        seconds = min(timeit.repeat(fn, number=1, repeat=3))
+        print(f"{label:<24} {n / seconds / 1e6:8.2f} M comparisons/s")
@@ -1,6 +1,10 @@
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import and_, case, or_
+from sqlalchemy.orm import aliased
+
+from passwords import get_password_hasher
+from ratings import DEFAULT_RATING, elo_update, get_ratings
 
 db = SQLAlchemy()
 
@@ -27,6 +31,15 @@ class Game(db.Model):
     loser = db.Column(db.String(255), db.ForeignKey('players.email', ondelete="SET NULL"), nullable=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Match history filters player1 OR player2 and orders by (timestamp, id);
+    # win/loss counts group by winner/loser. Kept in step with migrations.py.
+    __table_args__ = (
+        db.Index('ix_games_player1_timestamp', 'player1', 'timestamp', 'id'),
+        db.Index('ix_games_player2_timestamp', 'player2', 'timestamp', 'id'),
+        db.Index('ix_games_winner', 'winner'),
+        db.Index('ix_games_loser', 'loser'),
+    )
+
 class Cricket(db.Model):
     __tablename__ = 'cricket'
     id = db.Column(db.Integer, primary_key=True)
@@ -39,13 +52,32 @@ class Cricket(db.Model):
     highest_score = db.Column(db.Integer, default=0)
     img = db.Column(db.Text)
 
+    # Bulk imports upsert on the player's name (see import_cards.py)
+    __table_args__ = (
+        db.Index('ux_cricket_player_name', 'player_name', unique=True),
+    )
+
+class PlayerStats(db.Model):
+    """Per-player totals, kept up to date by update_game_result (see leaderboard.py)."""
+    __tablename__ = 'player_stats'
+    email = db.Column(db.String(255), db.ForeignKey('players.email', ondelete="CASCADE"), primary_key=True)
+    wins = db.Column(db.Integer, nullable=False, default=0)
+    losses = db.Column(db.Integer, nullable=False, default=0)
+    rating = db.Column(db.Float, nullable=False, default=DEFAULT_RATING)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_player_stats_rating', 'rating'),
+    )
+
 # ---------------- Player Functions ----------------
 
 def get_player_by_email(email):
     return Player.query.filter_by(email=email).first()
 
 def create_player(email, name, pwd):
-    hashed_pwd = generate_password_hash(pwd)
+    # hashed on the password pool; raises PasswordHasherBusy when it's saturated
+    hashed_pwd = get_password_hasher().hash(pwd)
     player = Player(email=email, name=name, pwd=hashed_pwd)
     db.session.add(player)
     db.session.commit()
@@ -53,7 +85,12 @@ def create_player(email, name, pwd):
 
 def authenticate_player(email, pwd):
     player = Player.query.filter_by(email=email).first()
-    if player and check_password_hash(player.pwd, pwd):
+    hasher = get_password_hasher()
+    if player and hasher.check(player.pwd, pwd):
+        if hasher.needs_rehash(player.pwd):
+            # upgrade to the configured scheme while we have the plain password
+            player.pwd = hasher.rehash(pwd)
+            db.session.commit()
         return player
     return None
 
@@ -68,14 +105,53 @@ def add_game(player1_email, player2_email=None):
 def get_game_by_id(game_id):
     return Game.query.get(game_id)
 
+def finished_game_ids(game_ids, batch_size=5000):
+    """The ids among game_ids whose result is already recorded."""
+    game_ids = [int(g) for g in game_ids]
+    finished = set()
+    for start in range(0, len(game_ids), batch_size):
+        rows = (Game.query.with_entities(Game.id)
+                .filter(Game.id.in_(game_ids[start:start + batch_size]), Game.winner.isnot(None)))
+        finished.update(str(game_id) for game_id, in rows)
+    return finished
+
 def update_game_result(game_id, winner_email, loser_email):
-    game = Game.query.get(game_id)
+    # locked: two workers may both see the game end
+    game = Game.query.filter_by(id=game_id).with_for_update().first()
+    if game and game.winner is not None:
+        # already recorded; rating it again would count the game twice
+        db.session.commit()  # ends the transaction holding the row lock
+        return game
     if game:
         game.winner = winner_email
         game.loser = loser_email
+        from bots import BOT_EMAIL
+        if BOT_EMAIL in (winner_email, loser_email):
+            # practice games against the bot aren't rated
+            db.session.commit()
+            return game
+        winner, loser = _locked_stats(winner_email, loser_email)
+        winner.rating, loser.rating = elo_update(winner.rating, loser.rating)
+        winner.wins += 1
+        loser.losses += 1
         db.session.commit()
+        # keep the in-memory views in step with the committed rows
+        from leaderboard import get_leaderboard
+        for stats in (winner, loser):
+            get_ratings().set(stats.email, stats.rating)
+            get_leaderboard().update(stats.email, stats.rating, stats.wins, stats.losses)
     return game
 
+def _locked_stats(*emails):
+    """PlayerStats rows for these players, created if missing and locked for update."""
+    rows = {s.email: s for s in PlayerStats.query.filter(PlayerStats.email.in_(emails))
+            .order_by(PlayerStats.email).with_for_update()}
+    for email in emails:
+        if email not in rows:
+            rows[email] = PlayerStats(email=email, wins=0, losses=0, rating=DEFAULT_RATING)
+            db.session.add(rows[email])
+    return [rows[email] for email in emails]
+
 # ---------------- Cricket Card Functions ----------------
 
 def get_all_cricket_cards():
@@ -118,39 +194,80 @@ def delete_cricket_card(card_id):
     return False
 
 
-def get_player_match_history(email):
-    # Fetch games where the player is either player1 or player2
-    games = Game.query.filter(
-        (Game.player1 == email) | (Game.player2 == email)
-    ).order_by(Game.timestamp.desc()).all()
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
 
-    history = []
-    for game in games:
-        if game.player1 == email:
-            opponent_email = game.player2
-        else:
-            opponent_email = game.player1
 
-        # Fetch opponent name if email is present
+def encode_history_cursor(timestamp, game_id):
+    return f"{timestamp.isoformat()}|{game_id}"
+
+
+def decode_history_cursor(cursor):
+    """Raises ValueError for a malformed cursor."""
+    timestamp, game_id = cursor.rsplit('|', 1)
+    return datetime.fromisoformat(timestamp), int(game_id)
+
+
+def match_history_query(email, limit=HISTORY_PAGE_SIZE, cursor=None, page=None, since=None, until=None):
+    """The query behind get_player_match_history (limit + 1 rows), e.g. to EXPLAIN it."""
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    page = max(1, page) if page is not None else None  # a negative OFFSET is an SQL error
+    opponent = aliased(Player)
+    opponent_email = case((Game.player1 == email, Game.player2), else_=Game.player1)
+
+    query = db.session.query(
+        Game.id, Game.timestamp, Game.winner, Game.loser,
+        opponent_email.label('opponent_email'), opponent.name.label('opponent_name'),
+    ).outerjoin(opponent, opponent.email == opponent_email).filter(
+        or_(Game.player1 == email, Game.player2 == email)
+    )
+    if since is not None:
+        query = query.filter(Game.timestamp >= since)
+    if until is not None:
+        query = query.filter(Game.timestamp < until)
+    if cursor:
+        ts, game_id = decode_history_cursor(cursor)
+        query = query.filter(or_(Game.timestamp < ts, and_(Game.timestamp == ts, Game.id < game_id)))
+    query = query.order_by(Game.timestamp.desc(), Game.id.desc())
+    if page and not cursor:
+        query = query.offset((page - 1) * limit)
+    # one extra row tells whether another page exists
+    return query.limit(limit + 1)
+
+
+def get_player_match_history(email, limit=HISTORY_PAGE_SIZE, cursor=None, page=None, since=None, until=None):
+    """
+    One page of a player's games, newest first, with opponent names joined in
+    the same query. Pages by keyset `cursor` (from the previous call) or, if
+    no cursor is given, by 1-based `page`. Returns (history, next_cursor).
+    """
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    rows = match_history_query(email, limit, cursor, page, since, until).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_history_cursor(rows[-1].timestamp, rows[-1].id)
+
+    history = []
+    for row in rows:
+        # Opponent name, if the game had an opponent
         opponent_name = None
-        if opponent_email:
-            opponent = Player.query.filter_by(email=opponent_email).first()
-            opponent_name = opponent.name if opponent else "Unknown"
+        if row.opponent_email:
+            opponent_name = row.opponent_name or "Unknown"
 
         # Determine result
-        if game.winner == email:
+        if row.winner == email:
             result = "Win"
-        elif game.loser == email:
+        elif row.loser == email:
             result = "Lose"
         else:
             result = "Draw"
 
         history.append({
-            "game_id": game.id,
+            "game_id": row.id,
             "opponent": opponent_name,
             "result": result,
-            "timestamp": game.timestamp
+            "timestamp": row.timestamp
         })
 
-    print("Match history for player {}: {}".format(email, history))
-    return history
+    return history, next_cursor
@@ -0,0 +1,155 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, with bursts of `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, deadline=None):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise DeadlineExceeded("Scrape deadline reached")
+            time.sleep(wait)
+
+
+class Fetcher:
+    """
+    Shared HTTP client for the scrapers: one keep-alive session, a token
+    bucket per host, retries with exponential backoff, and one deadline for
+    the whole job. map() fetches with bounded concurrency. An optional
+    HTTPCache answers fresh pages locally and revalidates stale ones.
+    """
+
+    def __init__(self, workers=8, rate=2.0, burst=4, retries=3, backoff=0.5, timeout=15, deadline=None, cache=None):
+        self.cache = cache
+        self.workers = workers
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.deadline = None
+        if deadline is not None:
+            self.set_deadline(deadline)
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def set_deadline(self, seconds):
+        """Give the whole job `seconds` from now to finish."""
+        self.deadline = time.monotonic() + seconds
+
+    def _bucket(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    def _check_deadline(self):
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise DeadlineExceeded("Scrape deadline reached")
+
+    def get(self, url, **kwargs):
+        """GET through the cache, if any; see _get for the network path."""
+        cache = self.cache
+        if cache is None:
+            return self._get(url, **kwargs)
+
+        entry = cache.lookup(url)
+        if entry is not None and cache.is_fresh(url, entry):
+            cache.record('hits')
+            cache.touch(url)
+            return cache.to_response(url, entry)
+        if cache.offline:
+            cache.record('misses')
+            raise requests.ConnectionError(f"Not in offline cache: {url}")
+
+        if entry is not None:
+            kwargs['headers'] = dict(kwargs.get('headers') or {}, **cache.conditional_headers(entry))
+        response = self._get(url, **kwargs)
+        if entry is not None and response.status_code == 304:
+            cache.record('revalidated')
+            cache.touch(url, revalidated=True)
+            return cache.to_response(url, entry)
+        cache.record('misses')
+        if response.status_code == 200:
+            cache.store(url, response)
+        return response
+
+    def _get(self, url, **kwargs):
+        """GET with rate limiting and retries; returns the last response."""
+        bucket = self._bucket(url)
+        for attempt in range(self.retries + 1):
+            self._check_deadline()
+            bucket.acquire(self.deadline)
+            timeout = self.timeout
+            if self.deadline is not None:
+                timeout = max(0.1, min(timeout, self.deadline - time.monotonic()))
+            try:
+                response = self.session.get(url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return response
+                retry_after = response.headers.get('Retry-After', '')
+                if retry_after.isdigit():
+                    time.sleep(min(int(retry_after), 60))
+                    continue
+            # exponential backoff with jitter
+            time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+    def get_many(self, urls):
+        """Fetch urls concurrently; a failed fetch yields None in its slot."""
+        def fetch(url):
+            try:
+                return self.get(url)
+            except Exception as e:
+                print(f"Error fetching {url}: {e}")
+                return None
+        return self.map(fetch, urls)
+
+    def map(self, fn, items):
+        """Run fn(item) concurrently; results keep the order of items."""
+        items = list(items)
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(items))) as pool:
+            return list(pool.map(fn, items))
@@ -0,0 +1,65 @@
+"""
+Pluggable HTML parsing for the scrapers.
+
+make_soup() picks the fastest available BeautifulSoup backend (lxml when it
+is installed, html.parser otherwise; override with SCRAPER_PARSER) and can
+be told to materialize only the elements a scraper reads, e.g. the stat
+tables, instead of building a tree for the whole page.
+
+    python html_parse.py page1.html page2.html ...
+
+compares pages/sec and peak memory of each backend on saved pages.
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+    DEFAULT_BACKEND = 'lxml'
+except ImportError:
+    DEFAULT_BACKEND = 'html.parser'
+
+BACKEND = os.environ.get('SCRAPER_PARSER', DEFAULT_BACKEND)
+
+
+def only_tags(*names):
+    """Keep just these elements (and their contents)."""
+    return SoupStrainer(list(names))
+
+
+def only_classes(*names):
+    """Keep just elements carrying one of these CSS classes (and their contents)."""
+    wanted = set(names)
+    return SoupStrainer(class_=lambda value: value is not None and not wanted.isdisjoint(value.split()))
+
+
+def make_soup(markup, parse_only=None, backend=None):
+    return BeautifulSoup(markup, backend or BACKEND, parse_only=parse_only)
+
+
+def benchmark(paths, rounds=5):
+    pages = []
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            pages.append(f.read())
+    backends = ['html.parser'] + (['lxml'] if DEFAULT_BACKEND == 'lxml' else [])
+    for backend in backends:
+        for label, strainer in (('full tree', None), ('tables only', only_tags('h1', 'table'))):
+            tracemalloc.start()
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for page in pages:
+                    make_soup(page, strainer, backend)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{backend:12} {label:12} {len(pages) * rounds / elapsed:8.1f} pages/sec  "
+                  f"peak {peak / 1024 / 1024:6.1f} MiB")
+
+
+if __name__ == '__main__':
+    benchmark(sys.argv[1:])
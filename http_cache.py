@@ -0,0 +1,189 @@
+"""
+On-disk HTTP cache for the scrapers.
+
+Bodies are stored zlib-compressed under their sha256, so identical pages are
+kept once; a SQLite index maps each URL to its body, validators (ETag,
+Last-Modified) and fetch time. Fresh entries (younger than the per-host TTL)
+are served without touching the network, stale ones are revalidated with a
+conditional GET, and the least recently used entries are evicted once the
+cache grows past max_bytes. With offline=True every cached page is served
+and nothing is fetched, which is handy when only the parsers changed.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+DAY = 24 * 60 * 60
+# Career stats change slowly; the cricdata listing moves more often
+DEFAULT_TTLS = {
+    'stats.espncricinfo.com': 7 * DAY,
+    'www.howstat.com': 7 * DAY,
+    'cricdata.org': DAY,
+}
+
+
+class HTTPCache:
+    def __init__(self, root='.scrape_cache', max_bytes=200 * 1024 * 1024, ttls=None, default_ttl=DAY, offline=False):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.default_ttl = default_ttl
+        self.offline = offline
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'stored': 0, 'evicted': 0}
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+        os.makedirs(os.path.join(root, 'blobs'), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "url TEXT PRIMARY KEY, body_hash TEXT NOT NULL, size INTEGER NOT NULL, "
+                "status INTEGER NOT NULL, content_type TEXT, etag TEXT, last_modified TEXT, "
+                "fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_accessed ON entries (accessed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_body ON entries (body_hash)")
+            # blobs are shared between URLs with identical bodies, count each once
+            self._bytes = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT body_hash, size FROM entries)").fetchone()[0]
+        self._bytes_lock = threading.Lock()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, 'index.db'), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _blob_path(self, body_hash):
+        return os.path.join(self.root, 'blobs', body_hash[:2], body_hash + '.z')
+
+    def ttl_for(self, url):
+        return self.ttls.get(urlsplit(url).netloc, self.default_ttl)
+
+    # -------- Lookup / store --------
+
+    def lookup(self, url):
+        row = self._conn().execute(
+            "SELECT body_hash, status, content_type, etag, last_modified, fetched_at FROM entries WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return None
+        body_hash, status, content_type, etag, last_modified, fetched_at = row
+        try:
+            with open(self._blob_path(body_hash), 'rb') as f:
+                body = zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+        return {'body': body, 'status': status, 'content_type': content_type, 'etag': etag,
+                'last_modified': last_modified, 'fetched_at': fetched_at}
+
+    def is_fresh(self, url, entry):
+        return self.offline or time.time() - entry['fetched_at'] < self.ttl_for(url)
+
+    def store(self, url, response):
+        body = response.content
+        body_hash = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(body_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(zlib.compress(body, 6))
+            os.replace(tmp, path)
+        size = os.path.getsize(path)
+        now = time.time()
+        with self._bytes_lock, self._conn() as conn:
+            old = conn.execute("SELECT body_hash, size FROM entries WHERE url = ?", (url,)).fetchone()
+            if not self._shared(conn, body_hash):
+                self._bytes += size
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, body_hash, size, response.status_code,
+                 response.headers.get('Content-Type'), response.headers.get('ETag'),
+                 response.headers.get('Last-Modified'), now, now),
+            )
+            if old is not None and not self._shared(conn, old[0]):
+                self._bytes -= old[1]
+                self._remove_blob(old[0])
+        self.record('stored')
+        self.evict()
+
+    def touch(self, url, revalidated=False):
+        now = time.time()
+        column = "fetched_at = ?, accessed_at = ?" if revalidated else "accessed_at = ?"
+        params = (now, now, url) if revalidated else (now, url)
+        with self._conn() as conn:
+            conn.execute(f"UPDATE entries SET {column} WHERE url = ?", params)
+
+    def _remove_blob(self, body_hash):
+        try:
+            os.remove(self._blob_path(body_hash))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _shared(conn, body_hash):
+        return conn.execute("SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1", (body_hash,)).fetchone() is not None
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits max_bytes."""
+        # a running total of the blobs in the index, so a store that fits costs nothing here
+        with self._bytes_lock:
+            conn = self._conn()
+            while self._bytes > self.max_bytes:
+                oldest = conn.execute(
+                    "SELECT url, body_hash, size FROM entries ORDER BY accessed_at LIMIT 64").fetchall()
+                if not oldest:
+                    break
+                for url, body_hash, size in oldest:
+                    with conn:
+                        conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+                        shared = self._shared(conn, body_hash)
+                    self.record('evicted')
+                    if not shared:
+                        self._remove_blob(body_hash)
+                        self._bytes -= size
+                    if self._bytes <= self.max_bytes:
+                        break
+
+    # -------- Helpers for the fetcher --------
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def to_response(self, url, entry):
+        response = requests.Response()
+        response.url = url
+        response.status_code = entry['status']
+        response._content = entry['body']
+        response.headers = CaseInsensitiveDict()
+        if entry['content_type']:
+            response.headers['Content-Type'] = entry['content_type']
+        response.encoding = get_encoding_from_headers(response.headers)
+        return response
+
+    def report(self):
+        s = self.stats
+        looked_up = s['hits'] + s['misses'] + s['revalidated']
+        rate = (s['hits'] + s['revalidated']) / looked_up * 100 if looked_up else 0.0
+        return (f"HTTP cache: {s['hits']} hits, {s['revalidated']} revalidated, {s['misses']} misses "
+                f"({rate:.0f}% served from cache), {s['stored']} stored, {s['evicted']} evicted")
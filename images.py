@@ -0,0 +1,158 @@
+"""
+Card art pipeline: fetch, dedupe and resize card images.
+
+Every source image (a remote URL from the scrapers or an admin upload) is
+hashed; the hash names a folder of fixed-width WebP (and AVIF, when Pillow
+supports it) variants under static/uploads/cards/, so the same picture is
+only processed and stored once. The card's img then points at the default
+variant, which is far smaller than the originals mobile clients used to
+download every game.
+
+    python images.py            # convert every card that isn't converted yet
+"""
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, features
+except ImportError:  # optional: without Pillow images are stored as-is
+    Image = None
+
+VARIANT_WIDTHS = (128, 256, 512)
+DEFAULT_WIDTH = 256
+CARDS_DIR = 'cards'  # under the uploads folder
+
+
+def _formats():
+    formats = ['webp']
+    if features.check('avif'):
+        formats.append('avif')
+    return formats
+
+
+def variant_path(digest, width=DEFAULT_WIDTH, fmt='webp'):
+    """Path as stored in Cricket.img, relative to the static folder."""
+    return f"uploads/{CARDS_DIR}/{digest}/{width}.{fmt}"
+
+
+def is_variant(img):
+    return bool(img) and img.replace('\\', '/').startswith(f"uploads/{CARDS_DIR}/")
+
+
+def render_variants(data, out_dir):
+    """Write every width/format of one image into out_dir. Runs in a worker process."""
+    os.makedirs(out_dir, exist_ok=True)
+    with Image.open(io.BytesIO(data)) as source:
+        source = source.convert('RGBA' if source.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        for width in VARIANT_WIDTHS:
+            image = source
+            if source.width > width:
+                height = round(source.height * width / source.width)
+                image = source.resize((width, height), Image.LANCZOS)
+            for fmt in _formats():
+                path = os.path.join(out_dir, f"{width}.{fmt}")
+                tmp = path + '.tmp'
+                image.save(tmp, format=fmt.upper(), quality=80)
+                os.replace(tmp, path)
+    return out_dir
+
+
+class ImagePipeline:
+    def __init__(self, upload_folder='static/uploads', workers=None, fetcher=None):
+        self.upload_folder = upload_folder
+        self.workers = workers
+        self.fetcher = fetcher
+
+    def _digest_dir(self, digest):
+        return os.path.join(self.upload_folder, CARDS_DIR, digest)
+
+    def _is_done(self, digest):
+        return os.path.exists(os.path.join(self._digest_dir(digest), f"{DEFAULT_WIDTH}.webp"))
+
+    def process_bytes(self, data):
+        """Return the img path for these image bytes, rendering variants if new."""
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        if not self._is_done(digest):
+            render_variants(data, self._digest_dir(digest))
+        return variant_path(digest)
+
+    def process_upload(self, path, original_img):
+        """
+        Convert a just-saved admin upload. Falls back to the original path if
+        Pillow is missing or the file can't be decoded.
+        """
+        if Image is None:
+            return original_img
+        try:
+            with open(path, 'rb') as f:
+                return self.process_bytes(f.read())
+        except (OSError, ValueError) as e:
+            print(f"Could not convert {path}: {e}")
+            return original_img
+
+    def _load_source(self, img):
+        """Local path for uploads, otherwise a remote URL to fetch."""
+        if img.startswith(('http://', 'https://')):
+            return None
+        path = os.path.join(os.path.dirname(self.upload_folder), img.replace('\\', '/'))
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def convert_cards(self, cards):
+        """
+        Point each card's img at its variants. Remote images are fetched
+        concurrently, identical images are rendered once, and rendering runs
+        on a process pool. Returns the number of cards updated.
+        """
+        if Image is None:
+            raise RuntimeError("Pillow is required for the image pipeline")
+        todo = [c for c in cards if c.img and not is_variant(c.img)]
+        remote = sorted({c.img for c in todo if c.img.startswith(('http://', 'https://'))})
+        fetched = {}
+        if remote:
+            if self.fetcher is None:
+                from fetcher import Fetcher
+                self.fetcher = Fetcher()
+            for url, response in zip(remote, self.fetcher.get_many(remote)):
+                if response is not None and response.status_code == 200:
+                    fetched[url] = response.content
+
+        # dedupe by content before any rendering work
+        sources = {}
+        for card in todo:
+            try:
+                data = fetched.get(card.img) or self._load_source(card.img)
+            except OSError as e:
+                print(f"Skipping {card.player_name}: {e}")
+                continue
+            if data:
+                sources.setdefault(hashlib.sha256(data).hexdigest()[:32], (data, []))[1].append(card)
+
+        updated = 0
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            jobs = {digest: pool.submit(render_variants, data, self._digest_dir(digest))
+                    for digest, (data, _) in sources.items() if not self._is_done(digest)}
+            for digest, (_, owners) in sources.items():
+                job = jobs.get(digest)
+                try:
+                    if job is not None:
+                        job.result()
+                except Exception as e:
+                    print(f"Could not convert image for {owners[0].player_name}: {e}")
+                    continue
+                for card in owners:
+                    card.img = variant_path(digest)
+                    updated += 1
+        return updated
+
+
+if __name__ == '__main__':
+    from app import app
+    from db import db, Cricket
+    with app.app_context():
+        pipeline = ImagePipeline(app.config['UPLOAD_FOLDER'])
+        count = pipeline.convert_cards(Cricket.query.all())
+        db.session.commit()
+        print(f"Converted images for {count} cards")
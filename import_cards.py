@@ -0,0 +1,111 @@
+"""
+Bulk import of scraped cards into the cricket table.
+
+    python import_cards.py cricket_players.jsonl [--batch-size 1000]
+    python import_cards.py --synthetic 100000
+
+Reads JSON Lines one record at a time and writes them in multi-row
+INSERT ... ON CONFLICT (player_name) DO UPDATE batches, so memory stays flat
+whatever the input size and re-running an import updates cards in place.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from db import db, Cricket
+
+FIELDS = ('player_name', 'power', 'strike_rate', 'wickets', 'matches_played',
+          'runs_scored', 'highest_score', 'img')
+REQUIRED = ('player_name', 'power', 'strike_rate')
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                print(f"Skipping line {line_no}: not valid JSON")
+
+
+def synthetic_records(count):
+    for i in range(count):
+        yield {
+            'player_name': f"Synthetic Player {i}",
+            'power': random.randint(60, 100),
+            'strike_rate': round(random.uniform(70.0, 150.0), 2),
+            'wickets': random.randint(0, 300),
+            'matches_played': random.randint(10, 200),
+            'runs_scored': random.randint(500, 15000),
+            'highest_score': random.randint(50, 300),
+            'img': None,
+        }
+
+
+def _upsert_statement():
+    dialects = {'postgresql': postgresql, 'sqlite': sqlite}
+    dialect = dialects.get(db.engine.dialect.name)
+    if dialect is None:
+        raise RuntimeError(f"Bulk upsert is not supported on {db.engine.dialect.name}")
+    stmt = dialect.insert(Cricket.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=['player_name'],
+        set_={name: stmt.excluded[name] for name in FIELDS if name != 'player_name'},
+    )
+
+
+def import_cards(records, batch_size=1000):
+    """Upsert records in batches; returns (rows written, rows skipped)."""
+    written = skipped = 0
+    batch = {}
+    # one cached statement; SQLAlchemy sends each batch as multi-row VALUES
+    stmt = _upsert_statement()
+    start = time.perf_counter()
+
+    def flush():
+        nonlocal written
+        if batch:
+            db.session.execute(stmt, list(batch.values()))
+            db.session.commit()
+            written += len(batch)
+            batch.clear()
+            rate = written / (time.perf_counter() - start)
+            print(f"\r{written} rows imported ({rate:,.0f} rows/sec)", end='', file=sys.stderr)
+
+    for record in records:
+        if any(record.get(name) in (None, '') for name in REQUIRED):
+            skipped += 1
+            continue
+        # a name may appear only once per INSERT ... ON CONFLICT statement
+        batch[record['player_name']] = {name: record.get(name) for name in FIELDS}
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    print(file=sys.stderr)
+    return written, skipped
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', nargs='?', help='JSON Lines file written by scrapy_cricInfo.py')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--synthetic', type=int, metavar='N', help='import N generated cards instead')
+    args = parser.parse_args()
+    if not args.path and not args.synthetic:
+        parser.error('give a JSONL path or --synthetic N')
+
+    from app import app
+    with app.app_context():
+        records = synthetic_records(args.synthetic) if args.synthetic else read_jsonl(args.path)
+        started = time.perf_counter()
+        written, skipped = import_cards(records, args.batch_size)
+        elapsed = time.perf_counter() - started
+        print(f"Imported {written} cards in {elapsed:.1f}s ({written / elapsed if elapsed else 0:,.0f} rows/sec), "
+              f"skipped {skipped}")
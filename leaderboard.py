@@ -0,0 +1,152 @@
+"""
+Leaderboard: players ranked by Elo rating.
+
+player_stats is the materialized table (wins, losses, rating per player),
+updated incrementally by update_game_result. This module keeps a sorted
+in-memory copy, so top-N and a player's rank are a bisect away instead of
+a scan of the games table.
+
+    python leaderboard.py --rebuild    # recompute player_stats from all games
+
+Running servers keep their loaded copy, so restart them after a rebuild.
+"""
+import bisect
+import threading
+
+from bots import BOT_EMAIL
+from db import db, Game, Player, PlayerStats
+from ratings import DEFAULT_RATING, elo_update, get_ratings
+
+REPLAY_BATCH = 5000
+
+
+class Leaderboard:
+    def __init__(self):
+        self.entries = {}  # email -> (rating, wins, losses)
+        self._order = []   # sorted (-rating, email), best first
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read player_stats once; needs an app context."""
+        with self._lock:
+            if self.loaded:
+                return
+            rows = PlayerStats.query.with_entities(
+                PlayerStats.email, PlayerStats.rating, PlayerStats.wins, PlayerStats.losses)
+            self.entries = {email: (rating, wins, losses) for email, rating, wins, losses in rows}
+            self._order = sorted((-rating, email) for email, (rating, _, _) in self.entries.items())
+            self.loaded = True
+
+    def reset(self):
+        with self._lock:
+            self.loaded = False
+            self.entries, self._order = {}, []
+
+    def update(self, email, rating, wins, losses):
+        """Move a player to their new rating; ignored until loaded."""
+        with self._lock:
+            if not self.loaded:
+                return
+            old = self.entries.get(email)
+            if old is not None:
+                del self._order[bisect.bisect_left(self._order, (-old[0], email))]
+            self.entries[email] = (rating, wins, losses)
+            bisect.insort(self._order, (-rating, email))
+
+    def rank(self, email):
+        """1-based rank, or None for players who haven't finished a game."""
+        if not self.loaded:
+            self.load()
+        with self._lock:
+            entry = self.entries.get(email)
+            if entry is None:
+                return None
+            return bisect.bisect_left(self._order, (-entry[0], email)) + 1
+
+    def top(self, limit=10, offset=0):
+        """[(rank, email, rating, wins, losses)] for one page of the board."""
+        if not self.loaded:
+            self.load()
+        with self._lock:
+            page = self._order[offset:offset + limit]
+            return [(offset + i + 1, email) + self.entries[email] for i, (_, email) in enumerate(page)]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+_board = Leaderboard()
+
+
+def get_leaderboard():
+    return _board
+
+
+def leaderboard_rows(ranked):
+    """JSON rows for (rank, email, rating, wins, losses) tuples, with player names."""
+    emails = [row[1] for row in ranked]
+    names = dict(Player.query.with_entities(Player.email, Player.name).filter(Player.email.in_(emails))) if emails else {}
+    return [{
+        'rank': rank,
+        'email': email,
+        'name': names.get(email),
+        'rating': round(rating),
+        'wins': wins,
+        'losses': losses,
+    } for rank, email, rating, wins, losses in ranked]
+
+
+def rebuild(batch_size=REPLAY_BATCH):
+    """
+    Recompute player_stats by replaying every finished game in id order,
+    reading the games table in keyset-paged batches. Needs an app context.
+    """
+    stats = {}  # email -> [rating, wins, losses]
+    last_id, replayed = 0, 0
+    while True:
+        batch = (Game.query.with_entities(Game.id, Game.winner, Game.loser)
+                 .filter(Game.id > last_id, Game.winner.isnot(None), Game.loser.isnot(None),
+                         Game.winner != BOT_EMAIL, Game.loser != BOT_EMAIL)
+                 .order_by(Game.id).limit(batch_size).all())
+        if not batch:
+            break
+        for _, winner, loser in batch:
+            w = stats.setdefault(winner, [DEFAULT_RATING, 0, 0])
+            l = stats.setdefault(loser, [DEFAULT_RATING, 0, 0])
+            w[0], l[0] = elo_update(w[0], l[0])
+            w[1] += 1
+            l[2] += 1
+        last_id = batch[-1][0]
+        replayed += len(batch)
+
+    PlayerStats.query.delete()
+    rows = [{'email': email, 'rating': rating, 'wins': wins, 'losses': losses}
+            for email, (rating, wins, losses) in stats.items()]
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(PlayerStats.__table__.insert(), rows[start:start + batch_size])
+    db.session.commit()
+    get_leaderboard().reset()
+    get_ratings().reset()
+    return replayed, len(rows)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Leaderboard maintenance")
+    parser.add_argument('--rebuild', action='store_true', help="recompute player_stats from the games table")
+    parser.add_argument('--batch-size', type=int, default=REPLAY_BATCH)
+    parser.add_argument('--top', type=int, default=10, help="print the top N players")
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        db.create_all()
+        if args.rebuild:
+            started = time.perf_counter()
+            games, players = rebuild(args.batch_size)
+            print(f"Replayed {games} games for {players} players in {time.perf_counter() - started:.1f}s")
+        for row in leaderboard_rows(get_leaderboard().top(args.top)):
+            print(f"{row['rank']:>4}  {row['rating']:>5}  {row['wins']:>4}-{row['losses']:<4}  {row['name'] or row['email']}")
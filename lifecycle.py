@@ -0,0 +1,323 @@
+"""
+Game lifecycle: timeouts, forfeits and eviction of live games.
+
+Every game is watched from the moment it is parked for matchmaking. A
+background reaper drives a hashed timer wheel: each game has one pending
+check, due when its current timeout would run out. When the check fires,
+the game is reloaded and
+
+    - waiting for an opponent past wait_timeout   -> evicted
+    - matched but never started past idle_timeout -> evicted, no result
+    - started, turn owner silent past turn_timeout -> forfeit, recorded with
+      update_game_result and pushed as game_over
+    - finished for longer than linger              -> evicted
+
+With bots on (match_bot/play_bot given), the same checks drive the bot
+opponent, so players on /events or the websocket never have to poll for it:
+
+    - waiting for an opponent past bot_match_after -> matched with the bot
+    - the bot's turn for bot_move_delay            -> the bot moves
+
+Anything that was active in the meantime is just rescheduled from its
+last_activity. Checks are lazy, so moves cost nothing here. Eviction
+removes the game from the registry and closes its push channel, so the
+memory held by finished and abandoned games is returned.
+
+Each process watches the games it creates plus whatever is in the store
+when it starts.
+
+    python lifecycle.py 1000000      # soak test: RSS while a million games come and go
+"""
+import contextlib
+import math
+import os
+import threading
+import time
+
+TICK = 1.0             # timer wheel resolution, seconds
+WHEEL_SLOTS = 512
+WAIT_TIMEOUT = 120     # parked without an opponent
+IDLE_TIMEOUT = 300     # matched, starter never decided
+TURN_TIMEOUT = 90      # the player whose turn it is doesn't move
+FINISHED_LINGER = 60   # keep finished games for clients fetching the last turn
+BOT_MOVE_DELAY = 1.5   # the bot's pause before moving, so each move is seen in turn
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel: schedule() and each tick of advance() are O(1) per
+    timer, however many thousands of games are being watched. A key has at
+    most one pending timer; scheduling it again replaces it.
+    """
+
+    def __init__(self, tick=TICK, slots=WHEEL_SLOTS, now=None):
+        self.tick = tick
+        self.slots = [dict() for _ in range(slots)]  # key -> remaining full rotations
+        self.where = {}  # key -> slot index
+        self.cursor = 0
+        self.ticked_at = time.time() if now is None else now
+
+    def schedule(self, key, when):
+        ticks = max(1, math.ceil((when - self.ticked_at) / self.tick))
+        self.cancel(key)
+        slot = (self.cursor + ticks) % len(self.slots)
+        self.slots[slot][key] = (ticks - 1) // len(self.slots)
+        self.where[key] = slot
+
+    def cancel(self, key):
+        slot = self.where.pop(key, None)
+        if slot is not None:
+            self.slots[slot].pop(key, None)
+
+    def advance(self, now=None):
+        """Move the wheel up to `now`; returns the keys whose timers fired."""
+        now = time.time() if now is None else now
+        due = []
+        while self.ticked_at + self.tick <= now:
+            self.ticked_at += self.tick
+            self.cursor = (self.cursor + 1) % len(self.slots)
+            slot = self.slots[self.cursor]
+            for key, rounds in list(slot.items()):
+                if rounds:
+                    slot[key] = rounds - 1
+                else:
+                    del slot[key]
+                    del self.where[key]
+                    due.append(key)
+        return due
+
+    def __len__(self):
+        return len(self.where)
+
+
+def current_rss():
+    """Resident set size of this process in bytes (peak RSS where /proc is missing)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+class GameLifecycle:
+    def __init__(self, games, hub=None, matchmaker=None, record_result=None, app=None,
+                 wait_timeout=WAIT_TIMEOUT, idle_timeout=IDLE_TIMEOUT, turn_timeout=TURN_TIMEOUT,
+                 linger=FINISHED_LINGER, tick=TICK, match_bot=None, play_bot=None,
+                 bot_match_after=None, bot_move_delay=BOT_MOVE_DELAY):
+        self.games = games
+        self.hub = hub
+        self.matchmaker = matchmaker
+        if record_result is None:
+            from db import update_game_result as record_result
+        self.record_result = record_result
+        self.app = app  # for an app context around store loads and update_game_result
+        self.wait_timeout = wait_timeout
+        self.idle_timeout = idle_timeout
+        self.turn_timeout = turn_timeout
+        self.linger = linger
+        # match_bot(gp) pairs a waiting game with the bot, True once matched; play_bot(gp)
+        # makes the bot's move, inside the game's session
+        self.match_bot = match_bot
+        self.play_bot = play_bot
+        self.bot_match_after = bot_match_after
+        self.bot_move_delay = bot_move_delay
+        self.wheel = TimerWheel(tick)
+        self.stats = {'evicted': 0, 'forfeits': 0, 'expired_waiting': 0, 'abandoned': 0, 'bot_matches': 0}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _app_context(self):
+        # loading a stored game builds the card catalog, which queries the cricket table;
+        # forfeits and bot games write results
+        return self.app.app_context() if self.app is not None else contextlib.nullcontext()
+
+    # -------- Scheduling --------
+
+    def _deadline(self, gp):
+        if not gp.active:
+            return gp.last_activity + self.linger
+        if not gp.matched:
+            if self._bot_matching():
+                return gp.last_activity + min(self.wait_timeout, self.bot_match_after)
+            return gp.last_activity + self.wait_timeout
+        if gp.starter is None:
+            return gp.last_activity + self.idle_timeout
+        if self._bot_moves(gp):
+            return gp.last_activity + self.bot_move_delay
+        return gp.last_activity + self.turn_timeout
+
+    def _bot_matching(self):
+        return self.match_bot is not None and self.bot_match_after is not None
+
+    def _bot_moves(self, gp):
+        return self.play_bot is not None and gp.bot is not None and gp.turn == gp.bot
+
+    def watch(self, gp):
+        """Start (or restart) the timeout clock for a game."""
+        with self._lock:
+            self.wheel.schedule(gp.game_id, self._deadline(gp))
+
+    def watch_all(self):
+        """Watch every game already in the store, e.g. after a restart."""
+        with self._app_context():
+            for game_id in self.games.store.game_ids():
+                gp = self.games.get(game_id)
+                if gp is not None:
+                    self.watch(gp)
+
+    # -------- Reaping --------
+
+    def _evict(self, gp, reason):
+        self.games.remove(gp.game_id)
+        if self.hub is not None:
+            self.hub.close(gp.game_id)
+        self.stats['evicted'] += 1
+        if reason:
+            self.stats[reason] += 1
+
+    def _check(self, game_id, now):
+        """Handle one due game; returns True once it is gone."""
+        with self.games.session(game_id) as gp:
+            if gp is None:
+                return True
+            if now < self._deadline(gp):
+                self.watch(gp)  # it moved since the check was scheduled
+                return False
+            if not gp.active:
+                evict = None
+            elif not gp.matched and self._bot_matching() and now < gp.last_activity + self.wait_timeout:
+                evict = 'match_bot'
+            elif not gp.matched:
+                evict = 'expired_waiting'
+            elif gp.starter is not None and self._bot_moves(gp):
+                self.play_bot(gp)
+                self.watch(gp)  # the bot's next move, or the human's turn clock
+                return False
+            elif gp.starter is None:
+                evict = 'abandoned'
+            else:
+                # a bot never stalls; if it's waiting on its turn the human left
+                loser = gp.turn if gp.turn != gp.bot else (gp.player2 if gp.bot == gp.player1 else gp.player1)
+                winner = gp.forfeit(loser)
+                self.watch(gp)  # evicted after linger
+                evict = False
+
+        if evict is False:
+            self._forfeit(game_id, winner, loser)
+            return False
+        if evict == 'match_bot':
+            # outside the session: match_bot takes the game out of matchmaking first
+            matched = self.match_bot(gp)
+            gp = self.games.get(game_id)
+            if gp is None:
+                return True
+            if matched:
+                self.stats['bot_matches'] += 1
+                self.watch(gp)
+            else:
+                # a human got there first, or the player moved on: back to the plain wait
+                with self._lock:
+                    self.wheel.schedule(game_id, gp.last_activity + self.wait_timeout)
+            return False
+        if evict == 'expired_waiting' and self.matchmaker is not None \
+                and not self.matchmaker.cancel(gp.player1, gp.game_id):
+            # not (or no longer) queued for this game: a human may have matched it since
+            with self.games.session(game_id) as gp:
+                if gp is None:
+                    return True
+                if gp.matched:
+                    self.watch(gp)
+                    return False
+        # outside the session, which would otherwise save the game back
+        self._evict(gp, evict)
+        return True
+
+    def _forfeit(self, game_id, winner, loser):
+        self.stats['forfeits'] += 1
+        self.record_result(game_id, winner, loser)
+        if self.hub is not None:
+            self.hub.publish(game_id, 'game_over', {'overallWinner': winner, 'forfeit': loser})
+
+    def reap(self, now=None):
+        """Run every check that is due; the reaper thread calls this each tick."""
+        now = time.time() if now is None else now
+        with self._lock:
+            due = self.wheel.advance(now)
+        for game_id in due:
+            try:
+                with self._app_context():
+                    self._check(game_id, now)
+            except Exception as e:
+                print(f"Lifecycle check failed for game {game_id}: {e}")
+        return len(due)
+
+    def start(self):
+        """Watch existing games and start the reaper thread."""
+        if self._thread is not None:
+            return
+        self.watch_all()
+
+        def run():
+            while not self._stop.wait(self.wheel.tick):
+                self.reap()
+
+        self._thread = threading.Thread(target=run, name='game-reaper', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def metrics(self):
+        return dict(self.stats, watched=len(self.wheel), rss_bytes=current_rss())
+
+
+if __name__ == '__main__':
+    # Soak test: games are created, played a little and abandoned at a steady
+    # rate on a simulated clock, while the lifecycle forfeits and evicts them.
+    # RSS should level off once the first games start being evicted.
+    import random
+    import sys
+
+    import catalog as catalog_module
+    from catalog import CardCatalog
+    from gameplay import GamePlay
+    from push import PushHub
+    from registry import GameRegistry
+
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    per_second = 500  # new games per simulated second
+    rows = [(i, f"Player {i}", random.randint(1, 100), random.uniform(50, 150), random.randint(0, 500),
+             random.randint(1, 400), random.randint(0, 15000), random.randint(0, 250), f"uploads/{i}.webp")
+            for i in range(1, 41)]
+    catalog_module._catalog = CardCatalog(rows)
+    catalog_module.CATALOG_MAX_AGE = float('inf')
+
+    games, hub = GameRegistry(), PushHub()
+    lifecycle = GameLifecycle(games, hub, record_result=lambda game_id, winner, loser: None)
+    rng = random.Random(7)
+    attributes = ('power', 'strike_rate', 'wickets', 'runs_scored')
+    now = lifecycle.wheel.ticked_at
+    started = time.perf_counter()
+    print(f"{'games':>9} {'live':>7} {'watched':>7} {'evicted':>9} {'forfeits':>9} {'rss MB':>7}")
+    for n in range(1, total + 1):
+        gp = GamePlay(str(n), f"a{n}@example.com")
+        gp.last_activity = now
+        games.add(gp)
+        if rng.random() < 0.9:  # most get an opponent and play a few turns
+            gp.join(f"b{n}@example.com")
+            gp.starter = gp.turn = gp.player1
+            for _ in range(rng.randint(0, 5)):
+                gp.play_turn(gp.turn, rng.choice(attributes))
+                hub.publish(gp.game_id, 'turn', {'n': 1})
+            gp.last_activity = now
+        lifecycle.watch(gp)
+        if n % per_second == 0:
+            now += 1.0
+            lifecycle.reap(now)
+        if n % (total // 10) == 0:
+            print(f"{n:>9} {len(games):>7} {len(lifecycle.wheel):>7} {lifecycle.stats['evicted']:>9} "
+                  f"{lifecycle.stats['forfeits']:>9} {current_rss() / 2**20:>7.1f}")
+    print(f"{time.perf_counter() - started:.1f}s wall for {total} games")
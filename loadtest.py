@@ -0,0 +1,272 @@
+"""
+Load-test client: end-to-end turn latency over the REST flow vs the WebSocket.
+
+Pairs of throwaway players register, match and play against a running
+server. Each pair runs on its own thread. A turn is timed from the moment
+the player to move sends it until that player holds the outcome and their
+next card:
+
+    rest  /play_turn, /check_turn_processed, /get_turn_details, /get_game_state
+    ws    one 'play' frame out, one 'result' frame back (needs simple-websocket)
+
+    python loadtest.py --url http://127.0.0.1:5000 --pairs 8 --turns 50
+
+prints p50/p99/mean latency and turns/sec for each mode. --idle N keeps N
+/wait_event long-polls open while the games run, as waiting players would.
+
+    python loadtest.py --compare-servers --database sqlite:////path/games.db --idle 2000
+
+starts the app under werkzeug's threaded WSGI server and then under uvicorn
+(asgi.py), on the same database, and runs the same games against each. The
+database must already hold the schema and the cards.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import requests
+
+from catalog import ATTRIBUTES
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class Player:
+    def __init__(self, base):
+        self.base = base
+        self.http = requests.Session()  # keep-alive, as a browser would
+        self.email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+        self.token = None
+
+    def post(self, path, **body):
+        response = self.http.post(self.base + path, json=body, timeout=30)
+        if response.status_code >= 500:
+            response.raise_for_status()
+        return response.status_code, response.json()
+
+    def sign_up(self):
+        self.post('/register', email=self.email, name=self.email.split('@')[0], pwd='load-test')
+        status, body = self.post('/login', email=self.email, password='load-test')
+        if status != 200:
+            raise RuntimeError(f"login failed: {body}")
+        self.token = body['token']
+        self.http.headers['Authorization'] = f"Bearer {self.token}"
+
+
+def match(base, queue):
+    """Register two players and pair them in their own matchmaking queue; returns (game_id, starter, p1, p2)."""
+    p1, p2 = Player(base), Player(base)
+    p1.sign_up()
+    p2.sign_up()
+    _, waiting = p1.post('/start_game', email=p1.email, queue=queue)
+    _, matched = p2.post('/start_game', email=p2.email, queue=queue)
+    if matched.get('message') != 'matched' or matched['game_id'] != waiting['game_id']:
+        raise RuntimeError(f"players were not paired: {waiting} / {matched}")
+    game_id = matched['game_id']
+    _, starter = p1.post('/decide_starter', game_id=game_id)
+    return game_id, starter['starter'], p1, p2
+
+
+def rest_game(base, queue, turns, latencies):
+    game_id, starter, p1, p2 = match(base, queue)
+    players = {p.email: p for p in (p1, p2)}
+    mover = players[starter]
+    for _ in range(turns):
+        started = time.perf_counter()
+        mover.post('/play_turn', game_id=game_id, email=mover.email, attribute=random.choice(ATTRIBUTES))
+        _, processed = mover.post('/check_turn_processed', game_id=game_id)
+        _, outcome = mover.post('/get_turn_details', game_id=game_id, email=mover.email)
+        _, state = mover.post('/get_game_state', game_id=game_id, email=mover.email)
+        latencies.append(time.perf_counter() - started)
+        if not processed.get('turn_processed') or 'error' in outcome or 'error' in state:
+            raise RuntimeError(f"turn failed: {processed} / {outcome} / {state}")
+        if outcome.get('gameOver'):
+            return
+        mover = players[outcome['next_turn']]
+
+
+def ws_game(base, queue, turns, latencies):
+    from simple_websocket import Client
+
+    game_id, mover, p1, p2 = match(base, queue)
+    ws_base = base.replace('http', 'ws', 1)
+    sockets = {p.email: Client.connect(f"{ws_base}/ws/{game_id}?token={p.token}") for p in (p1, p2)}
+    try:
+        # the 'state' frame means the server is subscribed; a play sent before it may
+        # go unseen by the other socket
+        for sock in sockets.values():
+            _wait_state(sock)
+        for _ in range(turns):
+            started = time.perf_counter()
+            sockets[mover].send(json.dumps({'t': 'play', 'attribute': random.choice(ATTRIBUTES)}))
+            frame = _next_result(sockets[mover])
+            latencies.append(time.perf_counter() - started)
+            # the opponent gets their own result frame; drain it so nothing backs up
+            for email, sock in sockets.items():
+                if email != mover:
+                    _next_result(sock)
+            if frame['gameOver']:
+                return
+            mover = frame['next_turn']
+    finally:
+        for sock in sockets.values():
+            sock.close()
+
+
+def _wait_state(sock):
+    from wsproto.events import Ping
+
+    for _ in range(50):
+        message = sock.receive(timeout=0.2)
+        if message is not None:
+            if json.loads(message)['t'] == 'state':
+                return
+            continue
+        # simple-websocket's client leaves a frame that came in with the handshake
+        # unread until more data arrives; a ping's pong releases it
+        sock.sock.send(sock.ws.send(Ping()))
+    raise RuntimeError("no state frame from the server")
+
+
+def _next_result(sock):
+    while True:
+        message = sock.receive(timeout=30)
+        if message is None:
+            raise RuntimeError("timed out waiting for a result frame")
+        frame = json.loads(message)
+        if frame['t'] == 'result':
+            return frame
+        if frame['t'] == 'error':
+            raise RuntimeError(frame['error'])
+
+
+FLOWS = {'rest': rest_game, 'ws': ws_game}
+
+
+def hold_long_polls(base, count):
+    """Open `count` /wait_event long-polls on one quiet game; returns the open sockets."""
+    game_id, _, p1, _ = match(base, f"idle-{uuid.uuid4().hex[:8]}")
+    # nothing is ever newer than this seq, so each poll is held until it times out
+    body = json.dumps({'game_id': game_id, 'email': p1.email, 'after': 10 ** 9, 'timeout': 60}).encode()
+    url = urlsplit(base)
+    request = (f"POST /wait_event HTTP/1.1\r\nHost: {url.netloc}\r\nContent-Type: application/json\r\n"
+               f"Authorization: Bearer {p1.token}\r\nContent-Length: {len(body)}\r\n\r\n").encode() + body
+    sockets = []
+    for _ in range(count):
+        sock = socket.create_connection((url.hostname, url.port or 80), timeout=30)
+        sock.sendall(request)
+        sockets.append(sock)
+    return sockets
+
+
+def run(base, mode, pairs, turns, idle=0):
+    latencies, errors = [], []
+    run_id = uuid.uuid4().hex[:8]
+    held = hold_long_polls(base, idle) if idle else []
+
+    def pair(i):
+        try:
+            FLOWS[mode](base, f"load-{run_id}-{i}", turns, latencies)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=pair, args=(i,)) for i in range(pairs)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    for sock in held:
+        sock.close()
+    if errors:
+        print(f"{mode}: {len(errors)} of {pairs} pairs failed, first error: {errors[0]!r}")
+    if not latencies:
+        return None
+    ordered = sorted(latencies)
+    return {
+        'turns': len(ordered),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 2),
+        # includes sign-up and matching, so compare it between modes only
+        'turns_per_sec': round(len(ordered) / elapsed, 1),
+    }
+
+
+SERVERS = {
+    'wsgi': [sys.executable, '-c', "import sys; from werkzeug.serving import run_simple; from app import app; "
+                                   "run_simple('127.0.0.1', int(sys.argv[1]), app, threaded=True)", '{port}'],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1', '--port', '{port}',
+             '--log-level', 'warning'],
+}
+
+
+def serve(kind, database, port):
+    """Start the app under `kind` from SERVERS in a child process; returns it once it accepts connections."""
+    command = [part.format(port=port) for part in SERVERS[kind]]
+    env = dict(os.environ, DATABASE_URL=database)
+    proc = subprocess.Popen(command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                            stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return proc
+        except OSError:
+            if proc.poll() is not None:
+                break
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{kind} server did not start")
+
+
+def print_report(label, report):
+    print(f"{label:10} {report['turns']:6} turns  p50 {report['p50_ms']:8.2f} ms  "
+          f"p99 {report['p99_ms']:8.2f} ms  mean {report['mean_ms']:8.2f} ms  "
+          f"{report['turns_per_sec']:8.1f} turns/sec")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="End-to-end turn latency: REST flow vs WebSocket")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--pairs', type=int, default=8, help="concurrent games")
+    parser.add_argument('--turns', type=int, default=50, help="turns per game (fewer if it ends first)")
+    parser.add_argument('--modes', default='rest,ws')
+    parser.add_argument('--idle', type=int, default=0, help="long-polls held open during the run")
+    parser.add_argument('--compare-servers', action='store_true', help="serve the app as WSGI, then ASGI")
+    parser.add_argument('--database', default=os.environ.get('DATABASE_URL'),
+                        help="database URL the servers use with --compare-servers (default: $DATABASE_URL)")
+    parser.add_argument('--port', type=int, default=5077, help="first port for --compare-servers")
+    args = parser.parse_args()
+    modes = args.modes.split(',')
+    if not args.compare_servers:
+        for mode in modes:
+            report = run(args.url.rstrip('/'), mode, args.pairs, args.turns, args.idle)
+            if report:
+                print_report(mode, report)
+        sys.exit(0)
+    if not args.database:
+        parser.error("--compare-servers needs --database (or DATABASE_URL)")
+    for offset, kind in enumerate(SERVERS):
+        port = args.port + offset
+        proc = serve(kind, args.database, port)
+        try:
+            for mode in modes:
+                report = run(f"http://127.0.0.1:{port}", mode, args.pairs, args.turns, args.idle)
+                if report:
+                    print_report(f"{kind} {mode}", report)
+        finally:
+            proc.terminate()
+            proc.wait()
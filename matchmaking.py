@@ -0,0 +1,281 @@
+"""
+Skill-based matchmaking.
+
+Players waiting for a game sit in named queues (one per game mode), bucketed
+by Elo rating. A new arrival is paired with the closest-rated waiting player
+whose search window covers it. Windows start at base_window and widen the
+longer a player waits, so nobody waits forever for a perfect match. A
+waiting player who calls start_game again searches with their own widened
+window; tickets older than `timeout` are dropped.
+
+Each queue keeps a dict of rating bucket -> deque of tickets (oldest first)
+plus a sorted list of non-empty bucket keys, so a search bisects to the
+buckets in range and only looks at the head of each: O(log n) in the number
+of buckets plus a bounded scan of max_window / bucket_width buckets.
+
+Queues live in this process, like the push hub.
+
+    python matchmaking.py       # benchmark with 50k simulated players
+"""
+import bisect
+import threading
+import time
+from collections import OrderedDict, deque
+
+BUCKET_WIDTH = 50
+BASE_WINDOW = 100      # rating points either side, on arrival
+WIDEN_PER_SECOND = 10  # window growth while waiting
+MAX_WINDOW = 800
+TIMEOUT = 120          # seconds in the queue before the ticket is dropped
+REDIRECTS = 10000      # remembered moved/expired games, for /check_match
+
+
+class Ticket:
+    __slots__ = ('email', 'rating', 'queue', 'game_id', 'queued_at', 'active')
+
+    def __init__(self, email, rating, queue, game_id, queued_at):
+        self.email = email
+        self.rating = rating
+        self.queue = queue
+        self.game_id = game_id
+        self.queued_at = queued_at
+        self.active = True
+
+
+class _Queue:
+    def __init__(self, bucket_width):
+        self.bucket_width = bucket_width
+        self.buckets = {}  # bucket key -> deque of tickets, oldest first
+        self.keys = []     # sorted keys of non-empty buckets
+
+    def key(self, rating):
+        return int(rating // self.bucket_width)
+
+    def push(self, ticket):
+        key = self.key(ticket.rating)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = deque()
+            bisect.insort(self.keys, key)
+        bucket.append(ticket)
+
+    def head(self, key):
+        """Oldest live ticket in a bucket, dropping removed ones on the way."""
+        bucket = self.buckets[key]
+        while bucket and not bucket[0].active:
+            bucket.popleft()
+        if not bucket:
+            del self.buckets[key]
+            del self.keys[bisect.bisect_left(self.keys, key)]
+            return None
+        return bucket[0]
+
+    def in_range(self, low, high):
+        lo = bisect.bisect_left(self.keys, self.key(low))
+        hi = bisect.bisect_right(self.keys, self.key(high))
+        return self.keys[lo:hi]
+
+
+class Matchmaker:
+    def __init__(self, bucket_width=BUCKET_WIDTH, base_window=BASE_WINDOW, widen_per_second=WIDEN_PER_SECOND,
+                 max_window=MAX_WINDOW, timeout=TIMEOUT):
+        self.bucket_width = bucket_width
+        self.base_window = base_window
+        self.widen_per_second = widen_per_second
+        self.max_window = max_window
+        self.timeout = timeout
+        self._queues = {}
+        self._tickets = {}       # email -> live ticket
+        self._by_age = deque()   # every ticket in arrival order, for timeouts
+        self._redirects = OrderedDict()  # abandoned game id -> game the player moved to, or None if timed out
+        self._lock = threading.Lock()
+        self.stats = {'queued': 0, 'matched': 0, 'timed_out': 0, 'wait_seconds': 0.0}
+
+    def window(self, ticket, now):
+        return min(self.max_window, self.base_window + (now - ticket.queued_at) * self.widen_per_second)
+
+    def _queue(self, name):
+        queue = self._queues.get(name)
+        if queue is None:
+            queue = self._queues[name] = _Queue(self.bucket_width)
+        return queue
+
+    def _remove(self, ticket):
+        ticket.active = False
+        if self._tickets.get(ticket.email) is ticket:
+            del self._tickets[ticket.email]
+
+    def _redirect(self, game_id, to):
+        self._redirects[game_id] = to
+        if len(self._redirects) > REDIRECTS:
+            self._redirects.popitem(last=False)
+
+    def _expire(self, now):
+        while self._by_age and now - self._by_age[0].queued_at >= self.timeout:
+            ticket = self._by_age.popleft()
+            if ticket.active:
+                self._remove(ticket)
+                self._redirect(ticket.game_id, None)
+                self.stats['timed_out'] += 1
+
+    def _find(self, queue, email, rating, window, now):
+        """Closest-rated waiting ticket that accepts `rating`, within `window` of it."""
+        best = None
+        for key in queue.in_range(rating - self.max_window, rating + self.max_window):
+            ticket = queue.head(key)
+            if ticket is None or ticket.email == email:
+                continue
+            diff = abs(ticket.rating - rating)
+            if diff > max(window, self.window(ticket, now)):
+                continue
+            if best is None or diff < abs(best.rating - rating):
+                best = ticket
+        return best
+
+    def _matched(self, opponent, now):
+        self._remove(opponent)
+        self.stats['matched'] += 1
+        self.stats['wait_seconds'] += now - opponent.queued_at
+
+    def match_or_enqueue(self, email, rating, create_game, queue='default', now=None):
+        """
+        Pair `email` with a waiting player or queue it. `create_game(email)`
+        returns the id of a game to park in, and is only called when queuing.
+
+        Returns (ticket, opponent): opponent is the matched ticket (join its
+        game_id) or None, in which case ticket is the caller's queue entry.
+        If a player already waiting gets matched, ticket is their old entry,
+        whose parked game the caller should drop.
+
+        create_game runs outside the lock, so a game's database insert holds
+        up neither the other queues nor the arrivals in this one.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            mine = self._tickets.get(email)
+            if mine is not None and mine.queue != queue:
+                self._remove(mine)
+                mine = None
+            q = self._queue(queue)
+            window = self.window(mine, now) if mine else self.base_window
+            opponent = self._find(q, email, rating, window, now)
+            if opponent is not None:
+                self._matched(opponent, now)
+                if mine is not None:
+                    self._remove(mine)
+                    self._redirect(mine.game_id, opponent.game_id)
+                return mine, opponent
+            if mine is not None:
+                return mine, None
+
+        ticket = Ticket(email, rating, queue, create_game(email), now)
+        with self._lock:
+            mine = self._tickets.get(email)
+            if mine is not None:
+                # a concurrent call for the same player parked first; the lifecycle
+                # reaper evicts the game we just made, nobody is told about it
+                return mine, None
+            # somebody may have queued while the game was being created
+            opponent = self._find(self._queue(queue), email, rating, self.base_window, now)
+            if opponent is not None:
+                self._matched(opponent, now)
+                ticket.active = False
+                return ticket, opponent
+            self._tickets[email] = ticket
+            self._by_age.append(ticket)
+            self._queue(queue).push(ticket)
+            self.stats['queued'] += 1
+            return ticket, None
+
+    def cancel(self, email, game_id=None):
+        """
+        Take email out of its queue; False if it wasn't waiting (e.g. just
+        matched), or was waiting in another game than game_id.
+        """
+        with self._lock:
+            ticket = self._tickets.get(email)
+            if ticket is None or game_id is not None and ticket.game_id != game_id:
+                return False
+            self._remove(ticket)
+            return True
+
+    def redirect(self, game_id):
+        """(True, new_game_id) if game_id was abandoned: moved to new_game_id, or None if it timed out."""
+        with self._lock:
+            if game_id in self._redirects:
+                return True, self._redirects[game_id]
+        return False, None
+
+    def __len__(self):
+        return len(self._tickets)
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self.stats, waiting=len(self._tickets))
+            stats['queues'] = {}
+            for ticket in self._tickets.values():
+                stats['queues'][ticket.queue] = stats['queues'].get(ticket.queue, 0) + 1
+        matched = stats['matched']
+        stats['avg_wait'] = round(stats.pop('wait_seconds') / matched, 2) if matched else 0.0
+        return stats
+
+
+if __name__ == '__main__':
+    import heapq
+    import random
+    import sys
+
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 600.0
+    rng = random.Random(42)
+    pct = lambda xs, p: xs[min(len(xs) - 1, int(len(xs) * p))]
+
+    # 1) Raw operation cost: fill a queue with `players` tickets that can't
+    #    match each other, then pair every one of them with a new arrival.
+    mm = Matchmaker(base_window=0, widen_per_second=0)
+    queued = [rng.gauss(1200, 250) for _ in range(players)]
+    started = time.perf_counter()
+    for i, rating in enumerate(queued):
+        mm.match_or_enqueue(f"q{i}", rating, lambda e: e, now=0.0)
+    enqueue = time.perf_counter() - started
+    mm.base_window = BASE_WINDOW
+    started = time.perf_counter()
+    for i, rating in enumerate(queued):
+        mm.match_or_enqueue(f"a{i}", rating + rng.uniform(-20, 20), lambda e: e, now=1.0)
+    match = time.perf_counter() - started
+    print(f"{players} queued: enqueue {players / enqueue:,.0f}/s, "
+          f"{mm.stats['matched']} matched at {mm.stats['matched'] / match:,.0f} matches/s")
+
+    # 2) Wait times: players arrive over `duration` simulated seconds and
+    #    re-poll start_game every 2 seconds while waiting.
+    mm = Matchmaker()
+    poll_every = 2.0
+    arrivals = sorted((rng.uniform(0, duration), f"p{i}", rng.gauss(1200, 250)) for i in range(players))
+    ratings, queued_at, polls = {}, {}, []
+    waits, gaps = [], []
+
+    def attempt(email, now):
+        ticket, opponent = mm.match_or_enqueue(email, ratings[email], lambda e: e, now=now)
+        if opponent is None:
+            queued_at.setdefault(email, now)
+            heapq.heappush(polls, (now + poll_every, email))
+            return
+        waits.append(now - queued_at.pop(opponent.email))
+        waits.append(now - queued_at.pop(email, now))
+        gaps.append(abs(opponent.rating - ratings[email]))
+
+    for arrived, email, rating in arrivals:
+        ratings[email] = rating
+        while polls and polls[0][0] <= arrived:
+            when, polled = heapq.heappop(polls)
+            if polled in mm._tickets:
+                attempt(polled, when)
+        attempt(email, arrived)
+
+    waits.sort()
+    gaps.sort()
+    print(f"{players} arrivals over {duration:.0f}s: {mm.stats['matched']} pairs, "
+          f"{mm.stats['timed_out']} timed out, {len(mm)} still waiting")
+    print(f"wait (s):    p50={pct(waits, .5):.1f} p90={pct(waits, .9):.1f} p99={pct(waits, .99):.1f} max={waits[-1]:.1f}")
+    print(f"rating gap:  p50={pct(gaps, .5):.0f} p90={pct(gaps, .9):.0f} p99={pct(gaps, .99):.0f}")
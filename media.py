@@ -0,0 +1,145 @@
+import hashlib
+import mimetypes
+import os
+import re
+import socket
+import threading
+import time
+
+from flask import Response, request, send_file
+from werkzeug.exceptions import NotFound
+from werkzeug.utils import safe_join
+
+
+class MediaURLResolver:
+    """
+    Turns stored card image paths ('uploads\\x.jpg') into absolute URLs.
+    The public base URL comes from config (e.g. a CDN) or, failing that, from
+    this host's address, resolved once and re-checked every `refresh` seconds
+    instead of on every request.
+    """
+
+    def __init__(self, base_url=None, port=5000, refresh=300, on_change=None):
+        self.override = base_url.rstrip('/') if base_url else None
+        self.port = port
+        self.refresh = refresh
+        self.on_change = on_change
+        self._base = None
+        self._resolved_at = 0.0
+        self._lock = threading.Lock()
+
+    def _resolve(self):
+        ip_address = socket.gethostbyname(socket.gethostname())
+        return f"http://{ip_address}:{self.port}"
+
+    def base_url(self):
+        if self.override:
+            return self.override
+        if self._base is not None and time.monotonic() - self._resolved_at < self.refresh:
+            return self._base
+        changed = False
+        with self._lock:
+            if self._base is None or time.monotonic() - self._resolved_at >= self.refresh:
+                old, self._base = self._base, self._resolve()
+                self._resolved_at = time.monotonic()
+                changed = old is not None and old != self._base
+            base = self._base
+        # outside the lock: the callback may rebuild the catalog, which calls back here
+        if changed and self.on_change:
+            self.on_change()
+        return base
+
+    def absolute(self, img, base=None):
+        """Absolute URL of an image path, against `base` when given (no lookup)."""
+        if not img or img.startswith(('http://', 'https://')):
+            return img
+        path = img.replace('\\', '/').lstrip('/')
+        return f"{base or self.base_url()}/{path}"
+
+
+_resolver = MediaURLResolver()
+
+
+def get_media_resolver():
+    return _resolver
+
+
+def configure_media(base_url=None, port=5000, refresh=300, on_change=None):
+    """Replace the process-wide resolver; call once at startup."""
+    global _resolver
+    _resolver = MediaURLResolver(base_url, port, refresh, on_change)
+    return _resolver
+
+
+# -------- Fingerprinted uploads --------
+
+FINGERPRINT_LEN = 16
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# '<name>.<16 hex>.<ext>' from save_fingerprinted, or 'cards/<hash>/<variant>' from images.py
+_NAMED = re.compile(r'\.([0-9a-f]{%d})\.[A-Za-z0-9]+$' % FINGERPRINT_LEN)
+_VARIANT = re.compile(r'^cards/([0-9a-f]{32})/([0-9]+\.[a-z]+)$')
+
+
+def fingerprint_of(filename):
+    """
+    Content fingerprint embedded in an upload's name, or None. Fingerprinted
+    files never change under the same name, so the fingerprint is also
+    their ETag.
+    """
+    filename = filename.replace('\\', '/')
+    match = _VARIANT.match(filename)
+    if match:
+        return f"{match.group(1)}-{match.group(2)}"
+    match = _NAMED.search(filename)
+    return match.group(1) if match else None
+
+
+def save_fingerprinted(file, folder, filename):
+    """
+    Save an uploaded FileStorage as '<name>.<content hash>.<ext>' and return
+    the new name, so replacing a card's art always produces a new URL.
+    """
+    data = file.read()
+    stem, ext = os.path.splitext(filename)
+    digest = hashlib.sha256(data).hexdigest()[:FINGERPRINT_LEN]
+    name = f"{stem}.{digest}{ext.lower()}"
+    path = os.path.join(folder, name)
+    if not os.path.exists(path):
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    return name
+
+
+def send_upload(folder, filename, max_age=300, accel_prefix=None):
+    """
+    Serve a file from the uploads folder. Fingerprinted names are cached by
+    clients for a year as immutable, with the fingerprint as a strong ETag;
+    other files get a short max_age so a replaced upload shows up soon.
+    Range and conditional requests are handled by send_file. With
+    accel_prefix set (e.g. '/protected-uploads/'), the body is left to the
+    front proxy through X-Accel-Redirect; Flask's USE_X_SENDFILE works too.
+    """
+    path = safe_join(folder, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+    fingerprint = fingerprint_of(filename)
+
+    if accel_prefix:
+        response = Response(mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + filename.replace('\\', '/')
+        response.set_etag(fingerprint or f"{os.path.getmtime(path)}-{os.path.getsize(path)}")
+    else:
+        response = send_file(path, conditional=True, etag=fingerprint or True, max_age=max_age)
+
+    if fingerprint:
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    if accel_prefix:
+        response.make_conditional(request)
+    return response
@@ -0,0 +1,87 @@
+"""
+Ordered schema migrations for databases created before a model change.
+db.create_all() only creates missing tables, so indexes and columns added to
+existing tables go here. Applied versions are recorded in schema_migrations.
+
+    python migrations.py
+"""
+from datetime import datetime
+
+from sqlalchemy import text
+
+from db import db
+
+class MigrationError(Exception):
+    pass
+
+
+def check_unique_player_names(conn):
+    """Refuse to build ux_cricket_player_name over duplicate names, saying which ones."""
+    duplicates = conn.execute(text(
+        "SELECT player_name, COUNT(*) FROM cricket GROUP BY player_name HAVING COUNT(*) > 1 ORDER BY player_name"
+    )).all()
+    if duplicates:
+        names = ', '.join(f"{name!r} x{count}" for name, count in duplicates)
+        raise MigrationError(f"cricket has several cards for the same player ({names}); "
+                             f"rename or delete the extra cards in the admin panel, then migrate again")
+
+
+# (version, description, statements). {concurrently} becomes CONCURRENTLY on
+# PostgreSQL so building an index on a large games table doesn't block writes.
+# A callable statement is run with the connection, e.g. to check the data first.
+MIGRATIONS = [
+    (1, 'games indexes for match history and win/loss counts', [
+        "CREATE INDEX {concurrently} IF NOT EXISTS ix_games_player1_timestamp ON games (player1, timestamp, id)",
+        "CREATE INDEX {concurrently} IF NOT EXISTS ix_games_player2_timestamp ON games (player2, timestamp, id)",
+        "CREATE INDEX {concurrently} IF NOT EXISTS ix_games_winner ON games (winner)",
+        "CREATE INDEX {concurrently} IF NOT EXISTS ix_games_loser ON games (loser)",
+        "ANALYZE games",
+    ]),
+    # Cards that share a name are left to an admin to merge; nothing is deleted here
+    (2, 'unique player_name on cricket for bulk upserts', [
+        check_unique_player_names,
+        "CREATE UNIQUE INDEX {concurrently} IF NOT EXISTS ux_cricket_player_name ON cricket (player_name)",
+    ]),
+]
+
+
+def applied_versions(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, description TEXT NOT NULL, applied_at TIMESTAMP NOT NULL)"
+    ))
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def run_migrations():
+    """Apply every pending migration; call inside an app context."""
+    engine = db.engine
+    is_postgres = engine.dialect.name == 'postgresql'
+    # CREATE INDEX CONCURRENTLY refuses to run inside a transaction
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        done = applied_versions(conn)
+        for version, description, statements in MIGRATIONS:
+            if version in done:
+                continue
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(text(statement.format(concurrently='CONCURRENTLY' if is_postgres else '')))
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {'v': version, 'd': description, 't': datetime.utcnow()},
+            )
+            print(f"Applied migration {version}: {description}")
+
+
+if __name__ == '__main__':
+    import sys
+
+    from app import app
+    with app.app_context():
+        db.create_all()
+        try:
+            run_migrations()
+        except MigrationError as e:
+            sys.exit(f"Migration failed: {e}")
@@ -0,0 +1,168 @@
+"""
+Password hashing off the request threads.
+
+The KDF behind generate_password_hash is deliberately slow and CPU-bound,
+so a burst of /register or /login calls used to hold the GIL and stall every
+other request, live /play_turn calls included. Hashes are now computed on a
+small process pool. At most max_pending hashes may be queued or running;
+past that, callers get PasswordHasherBusy (a 503 with Retry-After) instead
+of piling up. Queue depth and timings are exposed for /metrics.
+
+The hash scheme is a werkzeug method string ('scrypt', 'pbkdf2:sha256:600000',
+...). When it changes, a player's stored hash is upgraded the next time
+they log in successfully.
+
+    python passwords.py http://127.0.0.1:5000    # registration storm vs gameplay latency
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+PASSWORD_METHOD = 'scrypt'
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+def _exit_with_parent():
+    # a pool worker blocks on its call queue forever once the server is gone
+    # (killed, or crashed before shutting the pool down); leave with it instead
+    parent = multiprocessing.parent_process()
+    threading.Thread(target=lambda: (parent.join(), os._exit(0)), daemon=True).start()
+
+
+class PasswordHasher:
+    def __init__(self, method=PASSWORD_METHOD, workers=2, max_pending=32):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        # 'scrypt' is stored as 'scrypt:32768:8:1', compare against the expanded form
+        self.prefix = generate_password_hash('', method).split('$', 1)[0]
+        self._pool = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.stats = {'hashed': 0, 'checked': 0, 'rejected': 0, 'rehashed': 0, 'busy_seconds': 0.0, 'max_pending_seen': 0}
+
+    def _executor(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # fresh interpreters rather than forks of the server, which would inherit its
+                    # listening socket and turn log lock
+                    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context(method),
+                                                     initializer=_exit_with_parent)
+        return self._pool
+
+    def _run(self, kind, fn, *args):
+        """Run fn on the pool, or raise PasswordHasherBusy if too much is queued."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.stats['rejected'] += 1
+                raise PasswordHasherBusy("Too many logins in progress, try again shortly")
+            self._pending += 1
+            self.stats['max_pending_seen'] = max(self.stats['max_pending_seen'], self._pending)
+        started = time.monotonic()
+        try:
+            if not self.workers:  # inline, e.g. for scripts
+                return fn(*args)
+            return self._executor().submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self.stats[kind] += 1
+                self.stats['busy_seconds'] += time.monotonic() - started
+
+    def hash(self, password):
+        return self._run('hashed', generate_password_hash, password, self.method)
+
+    def rehash(self, password):
+        return self._run('rehashed', generate_password_hash, password, self.method)
+
+    def check(self, pwhash, password):
+        return self._run('checked', check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if pwhash was made with a different method or cost than the configured one."""
+        return pwhash.split('$', 1)[0] != self.prefix
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['pending'] = self._pending
+        done = stats['hashed'] + stats['rehashed'] + stats['checked']
+        stats['avg_ms'] = round(stats.pop('busy_seconds') / done * 1000, 2) if done else 0.0
+        stats.update(method=self.method, workers=self.workers, max_pending=self.max_pending)
+        return stats
+
+
+_hasher = PasswordHasher()
+
+
+def get_password_hasher():
+    return _hasher
+
+
+def configure_passwords(method=PASSWORD_METHOD, workers=2, max_pending=32):
+    """Replace the process-wide hasher; call once at startup."""
+    global _hasher
+    _hasher = PasswordHasher(method, workers, max_pending)
+    return _hasher
+
+
+if __name__ == '__main__':
+    # Load test against a running server: hammer /register from many threads
+    # while one client times a cheap gameplay call (/check_match).
+    import statistics
+    import sys
+    import uuid
+    from concurrent.futures import ThreadPoolExecutor
+
+    import requests
+
+    base = sys.argv[1].rstrip('/') if len(sys.argv) > 1 else 'http://127.0.0.1:5000'
+    storm_seconds, storm_threads = 10, 32
+
+    def probe(seconds):
+        session = requests.Session()
+        latencies = []
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            started = time.perf_counter()
+            session.post(f"{base}/check_match", json={'game_id': 'probe'})
+            latencies.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.01)
+        return latencies
+
+    def register(end):
+        session = requests.Session()
+        codes = {}
+        while time.monotonic() < end:
+            email = f"storm-{uuid.uuid4().hex}@example.com"
+            code = session.post(f"{base}/register", json={'email': email, 'name': 'Storm', 'pwd': 'hunter2'}).status_code
+            codes[code] = codes.get(code, 0) + 1
+        return codes
+
+    def summary(label, latencies):
+        latencies = sorted(latencies)
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(f"{label:<16} n={len(latencies):5d}  p50={statistics.median(latencies):7.2f} ms  p99={p99:7.2f} ms")
+
+    summary('idle', probe(3))
+    end = time.monotonic() + storm_seconds
+    with ThreadPoolExecutor(storm_threads + 1) as pool:
+        storms = [pool.submit(register, end) for _ in range(storm_threads)]
+        during = pool.submit(probe, storm_seconds)
+        summary('during storm', during.result())
+        codes = {}
+        for s in storms:
+            for code, n in s.result().items():
+                codes[code] = codes.get(code, 0) + n
+    print(f"/register responses: {codes}")
+    print(requests.get(f"{base}/metrics").json())
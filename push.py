@@ -0,0 +1,156 @@
+"""
+Per-game event channels so clients can wait for a match or a turn result in
+one held request instead of polling /check_match and /check_turn_processed.
+
+Waiting uses threading.Condition, so a threaded server still spends a thread
+per held connection; run under a gevent worker (gunicorn -k gevent), where
+these primitives become greenlets, to hold thousands of idle connections.
+The ASGI entry point (asgi.py) waits with wait_async instead, which parks an
+asyncio future rather than a thread.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+HISTORY = 64          # events kept per game for clients that reconnect
+KEEPALIVE = 15        # seconds between SSE keep-alive comments
+
+
+class _Channel:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.events = deque(maxlen=HISTORY)
+        self.seq = 0
+        self.closed = False
+        self.futures = []  # (loop, future) pairs parked by wait_async
+
+    def wake(self):
+        """Wake every waiter; caller holds self.cond."""
+        self.cond.notify_all()
+        for loop, fut in self.futures:
+            loop.call_soon_threadsafe(_resolve, fut)
+        self.futures.clear()
+
+    def since(self, after, email):
+        return [e for e in self.events
+                if e['seq'] > after and (e['to'] is None or e['to'] == email)]
+
+
+def _resolve(fut):
+    if not fut.done():
+        fut.set_result(None)
+
+
+class PushHub:
+    def __init__(self):
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def _channel(self, game_id):
+        game_id = str(game_id)
+        with self._lock:
+            ch = self._channels.get(game_id)
+            if ch is None:
+                ch = self._channels[game_id] = _Channel()
+            return ch
+
+    def publish(self, game_id, event, data, to=None):
+        """Append an event for the game (or only for player `to`) and wake waiters."""
+        return self.publish_many(game_id, [(event, data, to)])
+
+    def publish_many(self, game_id, batch):
+        """Append several (event, data, to) entries so waiters see them together."""
+        ch = self._channel(game_id)
+        with ch.cond:
+            for event, data, to in batch:
+                ch.seq += 1
+                ch.events.append({'seq': ch.seq, 'event': event, 'data': data, 'to': to})
+            ch.wake()
+            return ch.seq
+
+    def last_seq(self, game_id):
+        ch = self._channel(game_id)
+        with ch.cond:
+            return ch.seq
+
+    def wait(self, game_id, email=None, after=0, timeout=30):
+        """
+        Block until events newer than `after` exist for `email`, or timeout.
+        Returns None once the game's channel has been closed.
+        """
+        ch = self._channel(game_id)
+        deadline = time.monotonic() + timeout
+        with ch.cond:
+            while True:
+                events = ch.since(after, email)
+                if events:
+                    return events
+                if ch.closed:
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                ch.cond.wait(remaining)
+
+    async def wait_async(self, game_id, email=None, after=0, timeout=30):
+        """Coroutine version of wait() for the ASGI server."""
+        ch = self._channel(game_id)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            with ch.cond:
+                events = ch.since(after, email)
+                if events:
+                    return events
+                if ch.closed:
+                    return None
+                fut = loop.create_future()
+                ch.futures.append((loop, fut))
+            remaining = deadline - loop.time()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                await asyncio.wait_for(fut, remaining)
+            except asyncio.TimeoutError:
+                with ch.cond:
+                    if (loop, fut) in ch.futures:
+                        ch.futures.remove((loop, fut))
+                return []
+
+    def close(self, game_id):
+        """Forget a finished game, releasing anyone still waiting on it."""
+        with self._lock:
+            ch = self._channels.pop(str(game_id), None)
+        if ch is not None:
+            with ch.cond:
+                ch.closed = True
+                ch.wake()
+
+    def __len__(self):
+        return len(self._channels)
+
+
+def public_event(e):
+    return {'seq': e['seq'], 'event': e['event'], 'data': e['data']}
+
+
+def sse_format(e):
+    return f"id: {e['seq']}\nevent: {e['event']}\ndata: {json.dumps(e['data'])}\n\n"
+
+
+def sse_stream(hub, game_id, email, after=0):
+    """Generator of Server-Sent Events for one player; ends after game_over."""
+    while True:
+        events = hub.wait(game_id, email, after, timeout=KEEPALIVE)
+        if events is None:
+            return
+        if not events:
+            yield ": keepalive\n\n"
+            continue
+        for e in events:
+            after = e['seq']
+            yield sse_format(e)
+            if e['event'] == 'game_over':
+                return
@@ -0,0 +1,64 @@
+"""
+Elo ratings for matchmaking.
+
+The player_stats table holds every player's rating, updated by
+update_game_result as games finish (and rebuilt from the games table by
+'python leaderboard.py --rebuild'). This module keeps the Elo maths and an
+in-memory copy of the ratings, loaded once, so matchmaking never queries
+the database per request.
+"""
+import threading
+
+DEFAULT_RATING = 1200.0
+K_FACTOR = 32.0
+
+
+def expected_score(rating, opponent):
+    return 1.0 / (1.0 + 10 ** ((opponent - rating) / 400.0))
+
+
+def elo_update(winner, loser, k=K_FACTOR):
+    """New (winner, loser) ratings after one game."""
+    delta = k * (1.0 - expected_score(winner, loser))
+    return winner + delta, loser - delta
+
+
+class RatingBook:
+    def __init__(self, default=DEFAULT_RATING):
+        self.default = default
+        self.ratings = {}
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read every rating from player_stats; needs an app context."""
+        from db import PlayerStats
+        with self._lock:
+            if self.loaded:
+                return
+            self.ratings = dict(PlayerStats.query.with_entities(PlayerStats.email, PlayerStats.rating))
+            self.loaded = True
+
+    def reset(self):
+        """Forget the cache; the next lookup reloads (after a rebuild)."""
+        with self._lock:
+            self.loaded = False
+            self.ratings = {}
+
+    def rating(self, email):
+        if not self.loaded:
+            self.load()
+        return self.ratings.get(email, self.default)
+
+    def set(self, email, rating):
+        """Record a committed rating; ignored until loaded (the load will read it)."""
+        with self._lock:
+            if self.loaded:
+                self.ratings[email] = rating
+
+
+_book = RatingBook()
+
+
+def get_ratings():
+    return _book
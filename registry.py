@@ -0,0 +1,71 @@
+from contextlib import contextmanager
+
+from state_store import MemoryStateStore
+
+
+class GameRegistry:
+    """
+    Live games and the waiting slot, kept in a pluggable state store.
+    With the default MemoryStateStore games stay in this process; a SQLite or
+    Redis store lets several workers serve the same game.
+    """
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else MemoryStateStore()
+
+    def get(self, game_id):
+        """Read-only view of a game; use session() to change it."""
+        return self.store.load(str(game_id))
+
+    def add(self, gp):
+        self.store.save(gp)
+
+    def remove(self, game_id):
+        self.store.delete(str(game_id))
+
+    def __len__(self):
+        return len(self.store.game_ids())
+
+    @contextmanager
+    def session(self, game_id):
+        """
+        Lock a game for update and write it back afterwards.
+        Yields None when the game doesn't exist.
+        """
+        game_id = str(game_id)
+        with self.store.lock('game:' + game_id):
+            gp = self.store.load(game_id)
+            yield gp
+            if gp is not None:
+                self.store.save(gp)
+
+    def release_waiting(self, game_id):
+        """Clear the waiting slot if it still holds game_id; False if someone claimed it."""
+        with self.store.lock('waiting'):
+            if self.store.get_waiting() != str(game_id):
+                return False
+            self.store.set_waiting(None)
+            return True
+
+    def claim_or_wait(self, email, create_game):
+        """
+        Atomically pair `email` with the waiting game, or park a new one.
+        `create_game(email)` is only called when nobody is waiting.
+        Returns (gp, claimed); when claimed the caller must still deal cards.
+        """
+        with self.store.lock('waiting'):
+            waiting_id = self.store.get_waiting()
+            gp = self.store.load(waiting_id) if waiting_id else None
+            if gp is not None and gp.player1 == email:
+                # same user polling again, still waiting
+                return gp, False
+            if gp is not None:
+                with self.session(gp.game_id) as gp:
+                    gp.player2 = email
+                # only once claimed, so a failed claim leaves the game waiting
+                self.store.set_waiting(None)
+                return gp, True
+            gp = create_game(email)
+            self.add(gp)
+            self.store.set_waiting(gp.game_id)
+            return gp, False
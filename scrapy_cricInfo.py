@@ -1,3 +1,22 @@
+import random
+import re
+import json
+from fetcher import Fetcher
+from http_cache import HTTPCache
+from html_parse import make_soup, only_classes, only_tags
+
+# Shared keep-alive session with per-host rate limiting, retries and an
+# on-disk page cache (HTTPCache(offline=True) re-parses without the network).
+# Built on first use, so importing this module leaves the working directory alone.
+fetcher = None
+
+
+def get_fetcher():
+    global fetcher
+    if fetcher is None:
+        fetcher = Fetcher(cache=HTTPCache())
+    return fetcher
+
 def scrape_cricket_archive_api(num_players=10):
     """
     Use a public cricket API to fetch player data
@@ -17,23 +36,25 @@ def scrape_cricket_archive_api(num_players=10):
     players_data = []
     count = 0
     
-    for player_id in player_ids:
+    def pages():
+        # Query the public stats pages concurrently, only as many as players are
+        # still missing, and hand them back in order
+        pending = list(player_ids)
+        while pending and count < num_players:
+            batch = pending[:num_players - count]
+            del pending[:len(batch)]
+            urls = [f"https://stats.espncricinfo.com/ci/engine/player/{player_id}.html" for player_id in batch]
+            yield from zip(batch, get_fetcher().get_many(urls))
+    
+    for player_id, response in pages():
         if count >= num_players:
             break
             
         try:
-            # Query the public stats page
-            url = f"https://stats.espncricinfo.com/ci/engine/player/{player_id}.html"
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            
-            response = requests.get(url, headers=headers)
-            if response.status_code != 200:
+            if response is None or response.status_code != 200:
                 continue
                 
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = make_soup(response.text, only_tags('h1', 'table'))
             
             # Get player name
             name_element = soup.select_one('h1.engineering-subhead')
@@ -127,9 +148,6 @@ def scrape_cricket_archive_api(num_players=10):
             players_data.append(player_dict)
             count += 1
             
-            # Add delay to avoid overwhelming the server
-            time.sleep(0.5)
-            
         except Exception as e:
             print(f"Error fetching player details: {e}")
             return {}
@@ -150,19 +168,23 @@ def scrape_cricdata_players(num_players=10):
     """
     url = "https://cricdata.org/players"
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
     try:
-        response = requests.get(url, headers=headers)
+        response = get_fetcher().get(url)
         if response.status_code != 200:
             return generate_sample_cricket_data(num_players)
             
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = make_soup(response.text, only_classes('player-item'))
         
         player_elements = soup.select('.player-item')
         
+        # Fetch the profile pages we will need concurrently
+        profile_urls = [
+            "https://cricdata.org" + link['href']
+            for link in (el.select_one('a') for el in player_elements if el.select_one('.player-name'))
+            if link and 'href' in link.attrs
+        ][:num_players]
+        profiles = dict(zip(profile_urls, get_fetcher().map(fetch_cricdata_player_details, profile_urls)))
+        
         players_data = []
         count = 0
         
@@ -186,7 +208,7 @@ def scrape_cricdata_players(num_players=10):
                 profile_url = "https://cricdata.org" + profile_link['href']
                 
                 # Get additional stats from profile page
-                player_stats = fetch_cricdata_player_details(profile_url)
+                player_stats = profiles.get(profile_url) or {}
                 
                 # Use fetched stats or generate reasonable defaults
                 matches = player_stats.get('matches_played', random.randint(10, 200))
@@ -214,9 +236,6 @@ def scrape_cricdata_players(num_players=10):
                 players_data.append(player_dict)
                 count += 1
                 
-                # Add delay between requests
-                time.sleep(0.5)
-                
             except Exception as e:
                 print(f"Error processing player: {e}")
                 continue
@@ -237,15 +256,11 @@ def fetch_cricdata_player_details(profile_url):
     Fetch additional player stats from their cricdata profile page
     """
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(profile_url, headers=headers)
+        response = get_fetcher().get(profile_url)
         if response.status_code != 200:
             return {}
             
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = make_soup(response.text, only_classes('player-profile-image', 'player-stat-item'))
         
         # Initialize player stats
         player_stats = {
@@ -303,12 +318,10 @@ def fetch_cricdata_player_details(profile_url):
         
         return player_stats
         
-    except Exception as e:import requests
-from bs4 import BeautifulSoup
-import random
-import re
-import json
-import time
+    except Exception as e:
+        print(f"Error fetching player details: {e}")
+        return {}
+
 
 def scrape_howstat_players(num_players=10):
     """
@@ -323,21 +336,30 @@ def scrape_howstat_players(num_players=10):
     # Howstat URL for current ODI batting rankings
     url = "http://www.howstat.com/cricket/Statistics/Players/PlayerRankingsBatODI.asp"
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
     try:
         # Send HTTP request to the URL
-        response = requests.get(url, headers=headers)
+        response = get_fetcher().get(url)
         response.raise_for_status()  # Raise exception for 4XX/5XX responses
         
         # Parse the HTML content
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = make_soup(response.text, only_classes('TableLined'))
         
         # Find player table rows - adjust selector based on actual site structure
         player_rows = soup.select('table.TableLined tr')
         
+        # Fetch the profile pages we will need concurrently
+        profile_urls = []
+        for row in player_rows[1:]:
+            cells = row.select('td')
+            if len(cells) < 3 or not cells[1].text.strip():
+                continue
+            link = cells[1].select_one('a')
+            if link and 'href' in link.attrs:
+                profile_urls.append("http://www.howstat.com/cricket/Statistics/Players/" + link['href'])
+            if len(profile_urls) >= num_players:
+                break
+        profiles = dict(zip(profile_urls, get_fetcher().map(fetch_howstat_player_details, profile_urls)))
+        
         players_data = []
         count = 0
         
@@ -365,7 +387,7 @@ def scrape_howstat_players(num_players=10):
                     player_url = "http://www.howstat.com/cricket/Statistics/Players/" + profile_link['href']
                 
                 # Extract additional player data from their profile page if available
-                player_stats = fetch_howstat_player_details(player_url) if player_url else {}
+                player_stats = profiles.get(player_url) or {} if player_url else {}
                 
                 # Use stats from profile or generate reasonable defaults
                 strike_rate = player_stats.get('strike_rate', round(random.uniform(70.0, 150.0), 2))
@@ -394,9 +416,6 @@ def scrape_howstat_players(num_players=10):
                 players_data.append(player_dict)
                 count += 1
                 
-                # Add delay to avoid overwhelming the server
-                time.sleep(0.5)
-                
             except Exception as e:
                 print(f"Error processing player: {e}")
                 continue
@@ -419,14 +438,10 @@ def fetch_howstat_player_details(player_url):
     Fetch detailed stats for a player from their Howstat profile page
     """
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(player_url, headers=headers)
+        response = get_fetcher().get(player_url)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = make_soup(response.text, only_classes('TableLined', 'PlayerPicture'))
         
         # Initialize default stats
         player_stats = {
@@ -509,17 +524,13 @@ def scrape_cricket_info_players(num_players=10):
     # Cricket Archive URL for ODI players
     url = "https://stats.espncricinfo.com/ci/content/records/283193.html"
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
     try:
         # Send HTTP request to the URL
-        response = requests.get(url, headers=headers)
+        response = get_fetcher().get(url)
         response.raise_for_status()
         
         # Parse the HTML content
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = make_soup(response.text, only_classes('engineTable'))
         
         # Find player table
         player_rows = soup.select('table.engineTable tbody tr')
@@ -652,7 +663,23 @@ def save_to_json(players_data, filename="cricket_players.json"):
     print(f"Data saved to {filename}")
 
 
+def save_to_jsonl(players_data, filename="cricket_players.jsonl"):
+    """
+    Stream the scraped player data to a JSON Lines file, one player per line,
+    ready for import_cards.py
+    """
+    with open(filename, 'w', encoding='utf-8') as f:
+        for player in players_data:
+            f.write(json.dumps(player))
+            f.write('\n')
+    
+    print(f"Data saved to {filename}")
+
+
 if __name__ == "__main__":
+    # One deadline for the whole import, across every source below
+    get_fetcher().set_deadline(30 * 60)
+    
     # Try different scraping methods in order of reliability
     players = []
     
@@ -693,32 +720,10 @@ if __name__ == "__main__":
         print(f"Wickets: {player['wickets']}")
         print(f"Image URL: {player['img']}")
     
-    # Save the data to a JSON file
-    save_to_json(players)
+    print(get_fetcher().cache.report())
+    
+    # Save the data as JSON Lines for the bulk importer
+    save_to_jsonl(players)
     
-    # Return data in format ready for database import
-    print("\nData ready for database import. Example usage:")
-    print("from your_app import db, Cricket")
-    print("import json")
-    print("")
-    print("def import_cricket_data():")
-    print("    # Load the JSON data")
-    print("    with open('cricket_players.json', 'r') as f:")
-    print("        players_data = json.load(f)")
-    print("    ")
-    print("    # Create Cricket objects and add to database")
-    print("    for player_data in players_data:")
-    print("        player = Cricket(")
-    print("            player_name=player_data['player_name'],")
-    print("            power=player_data['power'],")
-    print("            strike_rate=player_data['strike_rate'],")
-    print("            wickets=player_data['wickets'],")
-    print("            matches_played=player_data['matches_played'],")
-    print("            runs_scored=player_data['runs_scored'],")
-    print("            highest_score=player_data['highest_score'],")
-    print("            img=player_data['img']")
-    print("        )")
-    print("        db.session.add(player)")
-    print("    ")
-    print("    # Commit changes")
-    print("    db.session.commit()")
\ No newline at end of file
+    print("\nData ready for database import:")
+    print("    python import_cards.py cricket_players.jsonl")
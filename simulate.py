@@ -0,0 +1,321 @@
+"""
+Headless game simulator and regression benchmark for GamePlay.
+
+Bots play complete games against each other on a synthetic catalog, with
+every deal and every bot decision drawn from a random.Random seeded per
+game, so a given --seed always produces the same games. Games are spread
+over a process pool. The report has turns/sec, bytes allocated per turn
+(traced on a sample of games) and the distribution of game lengths.
+
+    python simulate.py --games 20000 --out results.json
+    python simulate.py --compare simulate_baseline.json    # CI: exit 1 on a regression
+
+Because games are deterministic, a change in the game-length distribution
+against a baseline with the same settings means the game rules changed,
+not noise. Throughput is noisier: raw turns/sec moves with the machine and
+whatever else it runs. Each chunk of games therefore also times a fixed
+reference loop that doesn't touch GamePlay, and the gate compares
+turns_per_reference (game turns per reference round, on the same worker at
+the same moment), the median over --runs runs. str hashing, and with it
+every dict's layout, is randomized per interpreter and moves that ratio by
+several percent between invocations, so runs are pinned to PYTHONHASHSEED=0
+unless it is set already.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import deque
+from multiprocessing import Pool
+
+from catalog import ATTRIBUTES, CardCatalog
+from gameplay import GamePlay
+
+MAX_TURNS = 5000  # games still running after this many turns count as draws
+REFERENCE_ROUNDS = 20000  # reference loop rounds timed with each chunk of games
+
+
+class SimulatedGame(GamePlay):
+    record_result = staticmethod(lambda game_id, winner, loser: None)
+
+
+def synthetic_catalog(size=40, seed=0):
+    """A catalog of made-up players with plausible stat ranges."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(1, size + 1):
+        matches = rng.randint(5, 400)
+        rows.append((i, f"Player {i}", rng.randint(1, 100), round(rng.uniform(40, 180), 2),
+                     rng.randint(0, 600), matches, rng.randint(0, matches * 55),
+                     rng.randint(0, 260), f"uploads/{i}.webp"))
+    return CardCatalog(rows)
+
+
+# -------- Strategies: (game, card index, rng) -> attribute --------
+
+def random_strategy(catalog, ranks):
+    def choose(gp, card, rng):
+        return rng.choice(ATTRIBUTES)
+    return choose
+
+
+def greedy_strategy(catalog, ranks):
+    """Play the attribute where this card ranks highest in the catalog."""
+    best = [max(ATTRIBUTES, key=lambda a: ranks[a][i]) for i in range(len(catalog))]
+
+    def choose(gp, card, rng):
+        return best[card]
+    return choose
+
+
+def first_strategy(catalog, ranks):
+    """Always 'power', like a player who never reads the card."""
+    def choose(gp, card, rng):
+        return ATTRIBUTES[0]
+    return choose
+
+
+def bot_strategy(catalog, ranks):
+    """The server-side bot opponent (bots.py)."""
+    from bots import best_attributes
+    best = best_attributes(catalog)
+
+    def choose(gp, card, rng):
+        return best[card][0]
+    return choose
+
+
+STRATEGIES = {'random': random_strategy, 'greedy': greedy_strategy, 'first': first_strategy, 'bot': bot_strategy}
+
+
+def attribute_ranks(catalog):
+    """{attribute: [percentile of each card's value]}, used by the greedy bot."""
+    ranks = {}
+    for attr in ATTRIBUTES:
+        order = sorted(range(len(catalog)), key=lambda i: catalog.value(i, attr))
+        pct = [0.0] * len(catalog)
+        for position, i in enumerate(order):
+            pct[i] = position / max(1, len(catalog) - 1)
+        ranks[attr] = pct
+    return ranks
+
+
+# -------- Running games --------
+
+def play_game(seed, catalog, bots, max_turns=MAX_TURNS, trace=False):
+    """
+    Play one game between bots[0] (player 1) and bots[1]. Returns
+    (turns, winner: 0, 1 or None for a draw, traced bytes allocated over all turns).
+    """
+    rng = random.Random(seed)
+    gp = SimulatedGame(str(seed), 'bot1')
+    gp.join('bot2', catalog=catalog, rng=rng)
+    gp.turn = gp.starter = rng.choice((gp.player1, gp.player2))
+    turns = allocated = 0
+    while gp.active and turns < max_turns:
+        mine = gp.turn == gp.player1
+        card = (gp.deck1 if mine else gp.deck2)[0]
+        attribute = bots[0 if mine else 1](gp, card, rng)
+        if trace:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            gp.play_turn(gp.turn, attribute)
+            allocated += tracemalloc.get_traced_memory()[1] - before
+        else:
+            gp.play_turn(gp.turn, attribute)
+        turns += 1
+    if gp.active:
+        return turns, None, allocated
+    return turns, 0 if gp.winner_of_game == gp.player1 else 1, allocated
+
+
+def reference_workload(rounds):
+    """
+    A turn-shaped loop of plain deque, dict and tuple work that no change to
+    GamePlay can speed up or slow down; times how fast this interpreter is
+    running right now.
+    """
+    deck1, deck2 = deque(range(20)), deque(range(20, 40))
+    ranks = tuple((i * 7) % 40 for i in range(40))
+    started = time.perf_counter()
+    for n in range(rounds):
+        card1, card2 = deck1[0], deck2[0]
+        if ranks[card1] > ranks[card2]:
+            deck1.rotate(-1)
+            deck1.append(deck2.popleft())
+            winner, mover = deck1, deck2
+        else:
+            deck2.rotate(-1)
+            deck2.append(deck1.popleft())
+            winner, mover = deck2, deck1
+        result = {'winner': n, 'won_card': card1, 'lost_card': card2, 'gameOver': False}
+        if not mover:
+            # refill so the loop never runs out of cards
+            deck1, deck2 = deque(range(20)), deque(range(20, 40))
+        result['next_turn'] = len(winner)
+    return time.perf_counter() - started
+
+
+def run_chunk(task):
+    """Pool worker: time the reference loop, then play games seed..seed+count-1 and time them."""
+    seed, count, cards, catalog_seed, names, max_turns = task
+    catalog = synthetic_catalog(cards, catalog_seed)
+    ranks = attribute_ranks(catalog)
+    bots = [STRATEGIES[name](catalog, ranks) for name in names]
+    reference = reference_workload(REFERENCE_ROUNDS)
+    lengths, winners = [], []
+    started = time.perf_counter()
+    for s in range(seed, seed + count):
+        turns, winner, _ = play_game(s, catalog, bots, max_turns)
+        lengths.append(turns)
+        winners.append(winner)
+    return lengths, winners, time.perf_counter() - started, reference
+
+
+def trace_allocations(games, cards, catalog_seed, names, max_turns):
+    """Average bytes allocated by play_turn, traced on a few games in this process."""
+    catalog = synthetic_catalog(cards, catalog_seed)
+    ranks = attribute_ranks(catalog)
+    bots = [STRATEGIES[name](catalog, ranks) for name in names]
+    tracemalloc.start()
+    try:
+        turns = allocated = 0
+        for s in range(games):
+            t, _, a = play_game(s, catalog, bots, max_turns, trace=True)
+            turns += t
+            allocated += a
+    finally:
+        tracemalloc.stop()
+    return allocated / turns if turns else 0.0
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def simulate(games=20000, cards=40, catalog_seed=0, seed=1, strategies=('greedy', 'random'),
+             workers=None, chunk=500, max_turns=MAX_TURNS, runs=1):
+    """Play the games `runs` times; timings are the median run, outcomes are the same every run."""
+    workers = workers or os.cpu_count() or 1
+    tasks = [(seed + i, min(chunk, games - i), cards, catalog_seed, tuple(strategies), max_turns)
+             for i in range(0, games, chunk)]
+    timings = []
+    with Pool(workers) as pool:
+        for _ in range(runs):
+            started = time.perf_counter()
+            chunks = pool.map(run_chunk, tasks)
+            wall = time.perf_counter() - started
+            busy = sum(elapsed for _, _, elapsed, _ in chunks)
+            reference = sum(elapsed for _, _, _, elapsed in chunks)
+            timings.append((wall, busy, reference))
+
+    lengths = [n for chunk_lengths, _, _, _ in chunks for n in chunk_lengths]
+    winners = [w for _, chunk_winners, _, _ in chunks for w in chunk_winners]
+    turns = sum(lengths)
+    ordered = sorted(lengths)
+    wall = statistics.median(wall for wall, _, _ in timings)
+    busy = statistics.median(busy for _, busy, _ in timings)
+    reference_rounds = REFERENCE_ROUNDS * len(tasks)
+    return {
+        'config': {'games': games, 'cards': cards, 'catalog_seed': catalog_seed, 'seed': seed,
+                   'strategies': list(strategies), 'max_turns': max_turns, 'workers': workers, 'runs': runs,
+                   'hash_seed': os.environ.get('PYTHONHASHSEED')},
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'turns': turns,
+        'wall_seconds': round(wall, 3),
+        'turns_per_sec': round(turns / wall),
+        'turns_per_sec_per_worker': round(turns / busy),
+        # game turns/sec over reference rounds/sec, each run timed on the same workers
+        'turns_per_reference': round(statistics.median(
+            (turns / busy) / (reference_rounds / reference) for _, busy, reference in timings), 4),
+        'alloc_bytes_per_turn': round(trace_allocations(min(200, games), cards, catalog_seed, strategies, max_turns), 1),
+        'game_length': {
+            'mean': round(statistics.fmean(lengths), 2),
+            'p50': percentile(ordered, 0.50),
+            'p90': percentile(ordered, 0.90),
+            'p99': percentile(ordered, 0.99),
+            'max': ordered[-1],
+        },
+        'wins': {strategies[0] + ' (p1)': winners.count(0), strategies[1] + ' (p2)': winners.count(1),
+                 'draws': winners.count(None)},
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result, baseline, tolerance):
+    """Regressions of result against baseline, as messages; empty when it's fine."""
+    problems = []
+    if result['config'] != dict(baseline['config'], workers=result['config']['workers'], runs=result['config']['runs']):
+        problems.append("settings differ from the baseline, rerun with the same --games/--cards/--seed/--strategies "
+                        "and PYTHONHASHSEED")
+        return problems
+    if result['game_length'] != baseline['game_length'] or result['wins'] != baseline['wins']:
+        problems.append(f"game outcomes changed: {baseline['game_length']} -> {result['game_length']}")
+    # relative to the reference loop, throughput depends on neither the CI box's
+    # speed nor its core count, nor on how busy it is
+    old, new = baseline['turns_per_reference'], result['turns_per_reference']
+    if new < old * (1 - tolerance):
+        problems.append(f"throughput dropped {1 - new / old:.0%}: {old} -> {new} turns per reference round")
+    old, new = baseline['alloc_bytes_per_turn'], result['alloc_bytes_per_turn']
+    if new > old * (1 + tolerance) + 16:
+        problems.append(f"allocations grew: {old} -> {new} bytes per turn")
+    return problems
+
+
+if __name__ == '__main__':
+    if 'PYTHONHASHSEED' not in os.environ:
+        os.execve(sys.executable, [sys.executable] + sys.argv, dict(os.environ, PYTHONHASHSEED='0'))
+    parser = argparse.ArgumentParser(description="Simulate bot games and benchmark GamePlay")
+    parser.add_argument('--games', type=int, default=20000)
+    parser.add_argument('--cards', type=int, default=40)
+    parser.add_argument('--catalog-seed', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--strategies', default='greedy,random', help=f"player1,player2 from {sorted(STRATEGIES)}")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-turns', type=int, default=MAX_TURNS)
+    parser.add_argument('--runs', type=int, default=None, help="report the median of this many runs "
+                                                                  "(default 1, or 3 with --compare)")
+    parser.add_argument('--out', help="write the results JSON here")
+    parser.add_argument('--compare', help="baseline results JSON; exit 1 on a regression")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="allowed throughput/allocation drift")
+    args = parser.parse_args()
+
+    names = tuple(args.strategies.split(','))
+    if len(names) != 2 or any(n not in STRATEGIES for n in names):
+        parser.error(f"--strategies takes two of {sorted(STRATEGIES)}")
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        settings = baseline['config']
+        args.games, args.cards, args.seed = settings['games'], settings['cards'], settings['seed']
+        args.catalog_seed, args.max_turns = settings['catalog_seed'], settings['max_turns']
+        names = tuple(settings['strategies'])
+
+    runs = args.runs or (3 if baseline is not None else 1)
+    result = simulate(args.games, args.cards, args.catalog_seed, args.seed, names, args.workers,
+                      max_turns=args.max_turns, runs=runs)
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(result, f, indent=2)
+            f.write('\n')
+    if baseline is not None:
+        problems = compare(result, baseline, args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION: {problem}", file=sys.stderr)
+        sys.exit(1 if problems else 0)
@@ -0,0 +1,288 @@
+"""
+Backends that hold live game state for the GameRegistry.
+
+MemoryStateStore keeps GamePlay objects in this process. SQLiteStateStore
+(WAL mode, one file on the host) and RedisStateStore (any Redis-protocol
+server) keep serialized games so several worker processes, or hosts, can
+serve the same game. Every backend offers the same small interface:
+load/save/delete/game_ids, a named mutex and the waiting-game slot.
+"""
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+
+from gameplay import GamePlay
+
+LOCK_TIMEOUT = 10  # seconds to wait for a lock before giving up
+LOCK_LEASE = 30    # seconds after which a lock held by a dead worker expires
+
+
+class MemoryStateStore:
+    """
+    In-process store; games live as objects in crc32-sharded dicts. Named
+    locks are one Lock per name, created on demand and dropped once nobody
+    holds or waits for them, so two names never share (and deadlock on) a lock.
+    """
+
+    def __init__(self, shards=16):
+        self._shards = [{} for _ in range(shards)]
+        self._shard_locks = [threading.Lock() for _ in range(shards)]
+        self._locks = {}  # name -> [Lock, holders + waiters]
+        self._locks_guard = threading.Lock()
+        self._waiting = None
+
+    def _shard(self, game_id):
+        i = zlib.crc32(game_id.encode()) % len(self._shards)
+        return self._shards[i], self._shard_locks[i]
+
+    def load(self, game_id):
+        shard, lock = self._shard(game_id)
+        with lock:
+            return shard.get(game_id)
+
+    def save(self, gp):
+        shard, lock = self._shard(gp.game_id)
+        with lock:
+            shard[gp.game_id] = gp
+
+    def delete(self, game_id):
+        shard, lock = self._shard(game_id)
+        with lock:
+            shard.pop(game_id, None)
+
+    def game_ids(self):
+        ids = []
+        for shard, lock in zip(self._shards, self._shard_locks):
+            with lock:
+                ids.extend(shard)
+        return ids
+
+    @contextmanager
+    def lock(self, name):
+        with self._locks_guard:
+            entry = self._locks.get(name)
+            if entry is None:
+                entry = self._locks[name] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            if not entry[0].acquire(timeout=LOCK_TIMEOUT):
+                raise TimeoutError(f"Could not lock {name}")
+            try:
+                yield
+            finally:
+                entry[0].release()
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[name]
+
+    def get_waiting(self):
+        return self._waiting
+
+    def set_waiting(self, game_id):
+        self._waiting = game_id
+
+
+class SQLiteStateStore:
+    """Games serialized into a WAL-mode SQLite file shared by local workers."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS game_state (game_id TEXT PRIMARY KEY, state BLOB NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS store_locks (name TEXT PRIMARY KEY, token TEXT NOT NULL, expires REAL NOT NULL)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, game_id):
+        row = self._conn().execute("SELECT state FROM game_state WHERE game_id = ?", (game_id,)).fetchone()
+        return GamePlay.from_state(row[0]) if row else None
+
+    def save(self, gp):
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO game_state (game_id, state) VALUES (?, ?)",
+                         (gp.game_id, gp.to_state()))
+
+    def delete(self, game_id):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM game_state WHERE game_id = ?", (game_id,))
+
+    def game_ids(self):
+        return [row[0] for row in self._conn().execute("SELECT game_id FROM game_state")]
+
+    @contextmanager
+    def lock(self, name):
+        conn = self._conn()
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            now = time.time()
+            with conn:
+                conn.execute("DELETE FROM store_locks WHERE name = ? AND expires < ?", (name, now))
+                cur = conn.execute("INSERT OR IGNORE INTO store_locks (name, token, expires) VALUES (?, ?, ?)",
+                                   (name, token, now + LOCK_LEASE))
+            if cur.rowcount == 1:
+                break
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Could not lock {name}")
+            time.sleep(0.002)
+        try:
+            yield
+        finally:
+            with conn:
+                conn.execute("DELETE FROM store_locks WHERE name = ? AND token = ?", (name, token))
+
+    def get_waiting(self):
+        row = self._conn().execute("SELECT value FROM store_meta WHERE key = 'waiting'").fetchone()
+        return row[0] if row else None
+
+    def set_waiting(self, game_id):
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES ('waiting', ?)", (game_id,))
+
+
+class RedisStateStore:
+    """Games serialized into a Redis-protocol server shared by every host."""
+
+    # compare-and-delete so a worker never releases a lock it no longer owns
+    _UNLOCK = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, url, prefix='trumpcards:'):
+        import redis  # optional dependency, only needed for this backend
+        self.redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, *parts):
+        return self.prefix + ':'.join(parts)
+
+    def load(self, game_id):
+        data = self.redis.get(self._key('game', game_id))
+        return GamePlay.from_state(data) if data else None
+
+    def save(self, gp):
+        self.redis.set(self._key('game', gp.game_id), gp.to_state())
+
+    def delete(self, game_id):
+        self.redis.delete(self._key('game', game_id))
+
+    def game_ids(self):
+        start = len(self._key('game', ''))
+        return [key[start:].decode() for key in self.redis.scan_iter(self._key('game', '*'))]
+
+    @contextmanager
+    def lock(self, name):
+        key = self._key('lock', name)
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while not self.redis.set(key, token, nx=True, px=int(LOCK_LEASE * 1000)):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Could not lock {name}")
+            time.sleep(0.002)
+        try:
+            yield
+        finally:
+            self.redis.eval(self._UNLOCK, 1, key, token)
+
+    def get_waiting(self):
+        value = self.redis.get(self._key('waiting'))
+        return value.decode() if value else None
+
+    def set_waiting(self, game_id):
+        if game_id is None:
+            self.redis.delete(self._key('waiting'))
+        else:
+            self.redis.set(self._key('waiting'), game_id)
+
+
+def open_state_store(url):
+    """Build a store from a config URL: 'memory', 'sqlite:///path' or 'redis://...'."""
+    if url in (None, '', 'memory'):
+        return MemoryStateStore()
+    if url.startswith('sqlite:///'):
+        return SQLiteStateStore(url[len('sqlite:///'):])
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisStateStore(url)
+    raise ValueError(f"Unsupported game state store: {url}")
+
+
+def _bench_worker(task):
+    """Play `games` complete games through a registry on the shared store; returns (turns, seconds)."""
+    url, worker, games_count, start_line = task
+    import random
+
+    import catalog as catalog_module
+    from registry import GameRegistry
+    from simulate import SimulatedGame, synthetic_catalog
+
+    catalog_module._catalog = synthetic_catalog(40)
+    catalog_module.CATALOG_MAX_AGE = float('inf')
+    games = GameRegistry(open_state_store(url))
+    rng = random.Random(worker)
+    ids = [f"{worker}-{n}" for n in range(games_count)]
+    for game_id in ids:
+        gp = SimulatedGame(game_id, 'a')
+        gp.join('b', catalog=catalog_module._catalog, rng=rng)
+        gp.set_starter('a')
+        games.add(gp)
+    start_line.wait()  # every worker has dealt its games
+    started = time.perf_counter()
+    turns = 0
+    live = list(ids)
+    while live:
+        still = []
+        for game_id in live:
+            # one request's worth of work: lock, load, play, save
+            with games.session(game_id) as gp:
+                gp.record_result = lambda *args: None
+                gp.play_turn(gp.turn, rng.choice(('power', 'strike_rate', 'wickets', 'runs_scored')))
+                turns += 1
+                if gp.active and turns < games_count * 200:
+                    still.append(game_id)
+        live = still
+    elapsed = time.perf_counter() - started
+    for game_id in ids:
+        games.remove(game_id)
+    return turns, elapsed
+
+
+if __name__ == '__main__':
+    # Turns/sec through a shared store as worker processes are added:
+    #   python state_store.py --store sqlite:///tmp/bench.db --workers 1,2,4
+    #   python state_store.py --store redis://localhost:6379/0
+    import argparse
+    import multiprocessing
+    import os
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Game state store throughput by worker count")
+    parser.add_argument('--store', help="store URL (default: a temporary SQLite file)")
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--games', type=int, default=200, help="games per worker")
+    args = parser.parse_args()
+    url = args.store or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    open_state_store(url)  # create the schema once, before the workers race for it
+
+    print(f"{url}  ({os.cpu_count()} CPUs)")
+    print(f"{'workers':>7} {'turns':>8} {'seconds':>8} {'turns/s':>9}")
+    manager = multiprocessing.Manager()
+    for workers in [int(w) for w in args.workers.split(',')]:
+        start_line = manager.Barrier(workers)
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(_bench_worker, [(url, w, args.games, start_line) for w in range(workers)])
+        turns = sum(t for t, _ in results)
+        elapsed = max(seconds for _, seconds in results)
+        print(f"{workers:>7} {turns:>8} {elapsed:>8.2f} {turns / elapsed:>9,.0f}")
@@ -0,0 +1,77 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The modules import 'gameplay' while the file is GamePlay.py, which only
+# resolves on case-insensitive filesystems; alias it elsewhere.
+try:
+    import gameplay  # noqa: F401
+except ImportError:
+    sys.modules['gameplay'] = importlib.import_module('GamePlay')
+
+
+@pytest.fixture
+def db_app(tmp_path):
+    """A bare Flask app on a fresh SQLite database, inside an app context."""
+    from flask import Flask
+    from db import db
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    """A synthetic 40-card catalog, also served by get_catalog(); no database needed."""
+    import catalog as catalog_module
+    from simulate import synthetic_catalog
+    cards = synthetic_catalog(40)
+    monkeypatch.setattr(catalog_module, '_catalog', cards)
+    monkeypatch.setattr(catalog_module, 'CATALOG_MAX_AGE', float('inf'))
+    return cards
+
+
+@pytest.fixture(scope='session')
+def live_app(tmp_path_factory):
+    """The real app on a SQLite database with 40 cards, imported once per test run."""
+    root = tmp_path_factory.mktemp('app')
+    os.environ['DATABASE_URL'] = f"sqlite:///{root / 'app.db'}"
+    cwd = os.getcwd()
+    os.chdir(root)  # keep anything written relative to the working directory out of the checkout
+    try:
+        import app as app_module
+    finally:
+        os.chdir(cwd)
+    app_module.app.config['TURN_LOG_DIR'] = str(root / 'turnlog')
+    from db import db, Cricket
+    with app_module.app.app_context():
+        db.create_all()
+        for i in range(40):
+            db.session.add(Cricket(player_name=f"Player {i}", power=50 + i, strike_rate=60.0 + i * 2,
+                                   wickets=(i * 7) % 41, matches_played=10 + i, runs_scored=100 * i,
+                                   highest_score=20 + (i * 13) % 150, img=f"uploads/p{i}.webp"))
+        db.session.commit()
+    return app_module
+
+
+@pytest.fixture(scope='session')
+def live_server(live_app):
+    """live_app served on a local threaded werkzeug server; yields its base URL."""
+    import logging
+    import threading
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, live_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
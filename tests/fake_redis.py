@@ -0,0 +1,144 @@
+"""
+A small Redis-protocol server for tests: the commands RedisStateStore uses
+(GET, SET with NX/PX, DEL, SCAN MATCH and the unlock EVAL script, plus
+the HELLO/CLIENT handshake), kept in a
+dict on a background thread.
+"""
+import fnmatch
+import socketserver
+import threading
+import time
+
+from state_store import RedisStateStore
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        resp3 = False
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            try:
+                reply = self.server.fake.execute(command)
+            except Exception as e:
+                reply = e
+            if command[0].upper() == b'HELLO' and isinstance(reply, dict):
+                resp3 = reply[b'proto'] == 3
+            self.wfile.write(_encode(reply, resp3))
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.split()  # inline command
+        parts = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            parts.append(self.rfile.read(size + 2)[:-2])
+        return parts
+
+
+def _encode(value, resp3=False):
+    if isinstance(value, Exception):
+        return b'-ERR %s\r\n' % str(value).encode()
+    if value is None:
+        return b'_\r\n' if resp3 else b'$-1\r\n'
+    if value is True:
+        return b'+OK\r\n'
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, bytes):
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+    if isinstance(value, str):
+        return b'+%s\r\n' % value.encode()
+    if isinstance(value, dict):
+        return b'%%%d\r\n' % len(value) + b''.join(_encode(k, resp3) + _encode(v, resp3) for k, v in value.items())
+    return b'*%d\r\n' % len(value) + b''.join(_encode(v, resp3) for v in value)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}     # key -> value
+        self.expires = {}  # key -> monotonic deadline
+        self.lock = threading.Lock()
+        self.commands = 0
+
+    def _alive(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and time.monotonic() >= deadline:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def execute(self, parts):
+        name = parts[0].upper().decode()
+        args = parts[1:]
+        with self.lock:
+            self.commands += 1
+            if name == 'PING':
+                return 'PONG'
+            if name == 'HELLO':
+                # redis-py negotiates RESP3; every other reply here is valid in both
+                return {b'server': b'fake-redis', b'version': b'7.0.0', b'proto': int(args[0]) if args else 2}
+            if name in ('CLIENT', 'SELECT'):
+                return True
+            if name == 'GET':
+                return self.data[args[0]] if self._alive(args[0]) else None
+            if name == 'SET':
+                return self._set(args)
+            if name == 'DEL':
+                removed = 0
+                for key in args:
+                    if self._alive(key):
+                        del self.data[key]
+                        self.expires.pop(key, None)
+                        removed += 1
+                return removed
+            if name == 'SCAN':
+                pattern = b'*'
+                if b'MATCH' in [a.upper() for a in args]:
+                    pattern = args[[a.upper() for a in args].index(b'MATCH') + 1]
+                keys = [k for k in list(self.data) if self._alive(k) and fnmatch.fnmatchcase(k, pattern)]
+                return [b'0', keys]
+            if name == 'EVAL' and args[0] == RedisStateStore._UNLOCK.encode():
+                key, token = args[2], args[3]
+                if self._alive(key) and self.data[key] == token:
+                    del self.data[key]
+                    self.expires.pop(key, None)
+                    return 1
+                return 0
+        raise ValueError(f"unknown command '{name}'")
+
+    def _set(self, args):
+        key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+        if b'NX' in options and self._alive(key):
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if b'PX' in options:
+            self.expires[key] = time.monotonic() + int(args[2 + options.index(b'PX') + 1]) / 1000
+        return True
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.fake = FakeRedis()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"redis://127.0.0.1:{self.server_address[1]}/0"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
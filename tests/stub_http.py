@@ -0,0 +1,100 @@
+"""
+A local HTTP/1.1 server for the scraper tests. It serves saved pages from
+tests/fixtures/<site>/ (the path /players maps to players.html). Scripted
+responses let a test inject failures, delays or ETags for one path.
+It also counts requests per path and the distinct client connections used.
+"""
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from requests.adapters import HTTPAdapter
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_GET(self):
+        stub = self.server.stub
+        path = self.path.split('?', 1)[0]
+        status, headers, body, delay = stub.response(path, self.headers)
+        with stub.lock:
+            stub.hits[path] += 1
+            stub.connections.add(self.client_address)
+        if delay:
+            time.sleep(delay)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer:
+    def __init__(self, site):
+        self.root = os.path.join(FIXTURES, site)
+        self.hits = Counter()
+        self.connections = set()
+        self.scripts = {}  # path -> [(status, headers, delay), ...] served before the page
+        self.delays = {}  # path -> seconds added to every response
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def script(self, path, *responses):
+        """Serve these (status, headers, delay) responses for path, then the page."""
+        self.scripts[path] = list(responses)
+
+    def response(self, path, request_headers):
+        with self.lock:
+            queued = self.scripts.get(path)
+            scripted = queued.pop(0) if queued else None
+        if scripted is not None:
+            status, headers, delay = scripted
+            return status, headers, b'', delay
+        file = os.path.join(self.root, path.strip('/') + '.html')
+        if not os.path.isfile(file):
+            return 404, {}, b'not found', 0
+        with open(file, 'rb') as f:
+            body = f.read()
+        etag = '"%d-%d"' % (len(body), int(os.path.getmtime(file)))
+        if request_headers.get('If-None-Match') == etag:
+            return 304, {'ETag': etag}, b'', 0
+        headers = {'Content-Type': 'text/html; charset=utf-8', 'ETag': etag}
+        return 200, headers, body, self.delays.get(path, 0)
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class RedirectAdapter(HTTPAdapter):
+    """Sends requests for a real site's base URL to the stub server instead."""
+
+    def __init__(self, base, stub_url, **kwargs):
+        super().__init__(**kwargs)
+        self.base = base
+        self.stub_url = stub_url
+
+    def send(self, request, **kwargs):
+        request.url = self.stub_url + request.url[len(self.base):]
+        return super().send(request, **kwargs)
+
+
+def route(fetcher, base, stub):
+    """Point fetcher's session at stub for every URL under base."""
+    fetcher.session.mount(base, RedirectAdapter(base, stub.url, pool_connections=fetcher.workers,
+                                                 pool_maxsize=fetcher.workers))
+    return fetcher
+
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import time
+import uuid
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def asgi(live_app):
+    import asgi as asgi_module
+    return asgi_module
+
+
+def new_game(live_app):
+    """Two players matched in a game of their own with the starter decided: (game_id, starter, other)."""
+    client = live_app.app.test_client()
+    queue = uuid.uuid4().hex
+    a, b = f"a-{queue}@example.com", f"b-{queue}@example.com"
+    client.post('/start_game', json={'email': a, 'queue': queue})
+    game_id = client.post('/start_game', json={'email': b, 'queue': queue}).get_json()['game_id']
+    starter = client.post('/decide_starter', json={'game_id': game_id}).get_json()['starter']
+    return game_id, starter, b if starter == a else a
+
+
+def http_scope(method, path, query=b'', headers=()):
+    return {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': query,
+            'headers': [(b'host', b'testserver')] + list(headers), 'server': ('testserver', 80),
+            'client': ('127.0.0.1', 12345)}
+
+
+async def request(app, method, path, body=None, query=b'', headers=()):
+    """Run one HTTP request through the ASGI app; returns (status, parsed JSON body)."""
+    payload = json.dumps(body or {}).encode()
+    messages = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        sent.append(message)
+
+    await app(http_scope(method, path, query, headers), receive, send)
+    body = b''.join(m.get('body', b'') for m in sent if m['type'] == 'http.response.body')
+    return sent[0]['status'], json.loads(body)
+
+
+class Socket:
+    """Client side of an ASGI websocket conversation."""
+
+    def __init__(self, app, path, query=b''):
+        self.inbox, self.outbox = asyncio.Queue(), asyncio.Queue()
+        self.inbox.put_nowait({'type': 'websocket.connect'})
+        scope = {'type': 'websocket', 'asgi': {'version': '3.0'}, 'scheme': 'ws', 'path': path,
+                 'raw_path': path.encode(), 'query_string': query, 'headers': [], 'subprotocols': []}
+        self.task = asyncio.ensure_future(app(scope, self.inbox.get, self.outbox.put))
+
+    async def next(self, timeout=5):
+        return await asyncio.wait_for(self.outbox.get(), timeout)
+
+    async def frame(self, kind, timeout=5):
+        while True:
+            message = await self.next(timeout)
+            assert message['type'] == 'websocket.send', message
+            frame = json.loads(message['text'])
+            if frame['t'] == kind:
+                return frame
+
+    def send(self, frame):
+        self.inbox.put_nowait({'type': 'websocket.receive', 'text': json.dumps(frame)})
+
+    async def disconnect(self):
+        self.inbox.put_nowait({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.wait_for(self.task, 5)
+
+
+def test_lifespan_stops_the_lifecycle(asgi, monkeypatch):
+    stopped = []
+    monkeypatch.setattr(asgi.lifecycle, 'stop', lambda: stopped.append(True))
+    inbox = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = []
+
+    async def receive():
+        return inbox.pop(0)
+
+    async def send(message):
+        sent.append(message['type'])
+
+    asyncio.run(asgi.application({'type': 'lifespan', 'asgi': {'version': '3.0'}}, receive, send))
+    assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+    assert stopped == [True]
+
+
+def test_websocket_to_unknown_path_is_refused(asgi):
+    async def scenario():
+        sock = Socket(asgi.application, '/socket.io/')
+        return await sock.next()
+    assert asyncio.run(scenario()) == {'type': 'websocket.close', 'code': 1000}
+
+
+def test_websocket_plays_a_turn(asgi, live_app):
+    game_id, starter, other = new_game(live_app)
+
+    async def scenario():
+        mover = Socket(asgi.application, f'/ws/{game_id}', f'email={starter}'.encode())
+        watcher = Socket(asgi.application, f'/ws/{game_id}', f'email={other}'.encode())
+        assert (await mover.next())['type'] == 'websocket.accept'
+        assert (await watcher.next())['type'] == 'websocket.accept'
+        state = await mover.frame('state')
+        await watcher.frame('state')
+        assert state['turn'] == starter and state['card']
+        mover.send({'t': 'play', 'attribute': 'power'})
+        mine, theirs = await mover.frame('result'), await watcher.frame('result')
+        assert mine['result'] != theirs['result']
+        assert mine['next_turn'] == theirs['next_turn'] in (starter, other)
+        mover.send({'t': 'hello'})
+        assert (await mover.frame('error'))['error'] == 'Unknown message'
+        await mover.disconnect()
+        await watcher.disconnect()
+
+    asyncio.run(scenario())
+
+
+def test_websocket_unknown_game(asgi):
+    async def scenario():
+        sock = Socket(asgi.application, '/ws/987654321', b'email=nobody@example.com')
+        await sock.next()  # accept
+        error = await sock.frame('error')
+        closed = await sock.next()
+        return error, closed
+    error, closed = asyncio.run(scenario())
+    assert error['error'] == 'Game not found' and closed['type'] == 'websocket.close'
+
+
+def test_events_honours_after_without_last_event_id(asgi, live_app):
+    game_id, starter, _ = new_game(live_app)
+    last = asgi.hub.last_seq(game_id)
+    asgi.hub.publish(game_id, 'error', {'error': 'first'})
+    asgi.hub.publish(game_id, 'error', {'error': 'second'})
+    chunks = []
+
+    async def scenario():
+        async def receive():
+            await asyncio.sleep(3600)
+
+        async def send(message):
+            if message.get('body'):
+                chunks.append(message['body'].decode())
+                raise asyncio.CancelledError  # one chunk is enough
+
+        query = f'email={starter}&after={last + 1}'.encode()
+        with pytest.raises(asyncio.CancelledError):
+            await asgi.application(http_scope('GET', f'/events/{game_id}', query), receive, send)
+
+    asyncio.run(scenario())
+    assert 'second' in chunks[0] and 'first' not in chunks[0]
+
+
+def test_check_match_unknown_game_opens_no_channel(asgi):
+    status, body = asyncio.run(request(asgi.application, 'POST', '/check_match', {'game_id': '876543210'}))
+    assert status == 404 and body == {'error': 'Game not found'}
+    assert '876543210' not in asgi.hub._channels
+
+
+def test_flask_views_run_in_parallel(asgi, live_app, monkeypatch):
+    def slow_view():
+        time.sleep(0.5)
+        return {'ok': True}
+    monkeypatch.setitem(live_app.app.view_functions, 'leaderboard', slow_view)
+
+    async def scenario():
+        return await asyncio.gather(*(request(asgi.application, 'GET', '/leaderboard') for _ in range(6)))
+
+    started = time.monotonic()
+    results = asyncio.run(scenario())
+    assert all(status == 200 and body == {'ok': True} for status, body in results)
+    assert time.monotonic() - started < 1.5  # 3 s if the views ran one at a time
+
+
+def test_check_match_needs_a_token_when_required(asgi, live_app, monkeypatch):
+    game_id, starter, _ = new_game(live_app)
+    monkeypatch.setitem(live_app.app.config, 'TOKEN_REQUIRED', True)
+    status, _ = asyncio.run(request(asgi.application, 'POST', '/check_match', {'game_id': game_id}))
+    assert status == 401
+    token = live_app.tokens.issue(starter)[0]
+    status, body = asyncio.run(request(asgi.application, 'POST', '/check_match', {'game_id': game_id},
+                                       headers=[(b'authorization', f"Bearer {token}".encode())]))
+    assert status == 200 and body['message'] == 'matched'
+
+
+def test_strangers_cannot_follow_a_game(asgi, live_app):
+    game_id, starter, _ = new_game(live_app)
+    stranger = [(b'authorization', f"Bearer {live_app.tokens.issue('stranger@example.com')[0]}".encode())]
+    status, body = asyncio.run(request(asgi.application, 'POST', '/wait_event',
+                                       {'game_id': game_id, 'timeout': 0}, headers=stranger))
+    assert status == 403
+    status, body = asyncio.run(request(asgi.application, 'GET', f'/events/{game_id}', headers=stranger))
+    assert status == 403
+
+    async def scenario():
+        sock = Socket(asgi.application, f'/ws/{game_id}', b'email=stranger@example.com')
+        await sock.next()  # accept
+        error = await sock.frame('error')
+        return error, await sock.next()
+    error, closed = asyncio.run(scenario())
+    assert error['error'] == 'Not a player in this game' and closed == {'type': 'websocket.close', 'code': 1008}
@@ -0,0 +1,22 @@
+import bots
+from simulate import synthetic_catalog
+
+
+def test_best_attribute_tables_outlive_catalog_reloads():
+    catalogs = []
+    for version in range(1000, 1000 + bots.CATALOG_VERSIONS):
+        catalog = synthetic_catalog(40, seed=version)
+        catalog.version = version  # as get_catalog numbers its reloads
+        catalogs.append(catalog)
+        bots.best_attributes(catalog)
+    # a game still on the oldest kept version doesn't rebuild its table
+    oldest = catalogs[0]
+    assert bots.best_attributes(oldest) is bots._tables[oldest.version][1]
+    assert len(bots._tables) <= bots.CATALOG_VERSIONS
+
+
+def test_same_version_from_another_catalog_is_not_reused():
+    first, second = synthetic_catalog(40, seed=1), synthetic_catalog(40, seed=2)
+    assert first.version == second.version
+    assert bots.best_attributes(first) == bots._best_table(first)
+    assert bots.best_attributes(second) == bots._best_table(second)
@@ -0,0 +1,39 @@
+import threading
+
+import catalog as catalog_module
+import media
+from catalog import ATTRIBUTES, CardCatalog, get_catalog, invalidate_catalog
+from db import db, Cricket
+
+
+def test_changed_address_during_rebuild_does_not_deadlock(db_app, monkeypatch):
+    db.session.add(Cricket(player_name='A', power=1, strike_rate=1.0, img='uploads/a.webp'))
+    db.session.commit()
+    addresses = iter(['10.0.0.1', '10.0.0.2', '10.0.0.3', '10.0.0.4'])
+    resolver = media.MediaURLResolver(refresh=0, on_change=invalidate_catalog)
+    monkeypatch.setattr(resolver, '_resolve', lambda: f"http://{next(addresses)}:5000")
+    monkeypatch.setattr(media, '_resolver', resolver)
+    monkeypatch.setattr(catalog_module, '_catalog', None)
+    result = []
+
+    def load():
+        with db_app.app_context():
+            get_catalog()  # first address
+            catalog_module._loaded_at = 0.0  # stale: the next call rebuilds, and the address changes
+            result.append(get_catalog())
+
+    t = threading.Thread(target=load, daemon=True)
+    t.start()
+    t.join(5)
+    assert result, "get_catalog hung"
+    assert result[0].card_dict(0)['img'].startswith('http://10.0.0.')
+
+
+def test_ranks_and_batch_resolution():
+    rows = [(1, 'a', 10, 1.0, 5, 1, 1, 1, None), (2, 'b', 20, 1.0, None, 1, 1, 1, None),
+            (3, 'c', 10, 3.0, 7, 1, 1, 1, None)]
+    cards = CardCatalog(rows)
+    assert cards.ranks['power'] == (0, 1, 0)
+    assert cards.ranks['wickets'] == (0, None, 1)
+    attr = ATTRIBUTES.index('strike_rate')
+    assert list(cards.resolve_batch([2, 0], [0, 1], [attr, attr])) == [True, False]
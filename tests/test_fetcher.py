@@ -0,0 +1,154 @@
+import importlib
+import time
+
+import pytest
+
+from fetcher import DeadlineExceeded, Fetcher
+from http_cache import HTTPCache
+from stub_http import StubServer, route
+
+CRICDATA = "https://cricdata.org"
+
+
+@pytest.fixture
+def stub():
+    server = StubServer('cricdata')
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def scraper(stub, monkeypatch):
+    """scrapy_cricInfo with its shared fetcher talking to the stub server."""
+    module = importlib.import_module('scrapy_cricInfo')
+    fetcher = route(Fetcher(workers=4, rate=1000, burst=1000, backoff=0.01), CRICDATA, stub)
+    monkeypatch.setattr(module, 'fetcher', fetcher)
+    return module
+
+
+def test_scrape_cricdata_players_from_fixtures(scraper, stub):
+    players = scraper.scrape_cricdata_players(num_players=4)
+    assert [p['player_name'] for p in players] == ['Virat Kohli', 'Jasprit Bumrah', 'Kane Williamson', 'Rashid Khan']
+    kohli, bumrah, _, rashid = players
+    assert kohli == {
+        'player_name': 'Virat Kohli', 'power': 64, 'strike_rate': 93.54, 'wickets': 5,
+        'matches_played': 295, 'runs_scored': 13906, 'highest_score': 183,
+        'img': CRICDATA + '/img/players/virat-kohli.jpg',
+    }
+    assert bumrah['wickets'] == 149 and bumrah['power'] == 60
+    assert rashid['highest_score'] == 60  # '60*' (not out)
+    # every page fetched once, over no more keep-alive connections than workers
+    assert set(stub.hits.values()) == {1} and len(stub.hits) == 5
+    assert len(stub.connections) <= 4
+
+
+def test_profile_pages_are_fetched_concurrently(scraper, stub):
+    for slug in ('virat-kohli', 'jasprit-bumrah', 'kane-williamson', 'rashid-khan'):
+        stub.delays[f'/players/{slug}'] = 0.4
+    start = time.monotonic()
+    players = scraper.scrape_cricdata_players(num_players=4)
+    assert time.monotonic() - start < 1.2  # one after another would take 1.6 s
+    assert all(p['matches_played'] for p in players)
+
+
+def test_missing_profile_falls_back_to_defaults(scraper, stub):
+    stub.script('/players/jasprit-bumrah', (404, {}, 0))
+    players = scraper.scrape_cricdata_players(num_players=4)
+    assert players[1]['player_name'] == 'Jasprit Bumrah' and players[1]['img'] == ''
+    assert players[0]['runs_scored'] == 13906
+
+
+def test_listing_failure_returns_sample_data(scraper, stub):
+    stub.script('/players', *[(503, {}, 0)] * 4)
+    players = scraper.scrape_cricdata_players(num_players=3)
+    assert len(players) == 3 and stub.hits['/players'] == 4
+    assert list(stub.hits) == ['/players']  # no profile pages without a listing
+
+
+def test_retries_with_backoff(stub):
+    fetcher = route(Fetcher(rate=1000, burst=1000, retries=3, backoff=0.01), CRICDATA, stub)
+    stub.script('/players', (503, {}, 0), (429, {'Retry-After': '0'}, 0))
+    response = fetcher.get(CRICDATA + '/players')
+    assert response.status_code == 200 and 'Virat Kohli' in response.text
+    assert stub.hits['/players'] == 3
+
+
+def test_gives_up_after_retries(stub):
+    fetcher = route(Fetcher(rate=1000, burst=1000, retries=2, backoff=0.01), CRICDATA, stub)
+    stub.script('/players', *[(502, {}, 0)] * 5)
+    assert fetcher.get(CRICDATA + '/players').status_code == 502
+    assert stub.hits['/players'] == 3
+
+
+def test_rate_limit_is_per_host(stub):
+    fetcher = route(Fetcher(workers=8, rate=20, burst=2), CRICDATA, stub)
+    start = time.monotonic()
+    responses = fetcher.get_many([CRICDATA + '/players'] * 12)
+    elapsed = time.monotonic() - start
+    assert all(r.status_code == 200 for r in responses)
+    assert elapsed >= (12 - 2) / 20 * 0.9
+    # a second host has its own bucket
+    route(fetcher, 'https://other.example', stub)
+    start = time.monotonic()
+    fetcher.get('https://other.example/players')
+    assert time.monotonic() - start < 0.2
+
+
+def test_deadline_covers_the_whole_job(stub):
+    stub.delays['/players'] = 2
+    fetcher = route(Fetcher(rate=1000, burst=1000, backoff=0.01, deadline=0.5), CRICDATA, stub)
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        fetcher.get(CRICDATA + '/players')
+    assert time.monotonic() - start < 1.5
+    results = fetcher.get_many([CRICDATA + '/players/virat-kohli'] * 3)
+    assert results == [None, None, None]  # later fetches fail fast once the deadline has passed
+
+
+def test_cache_revalidates_with_etag(stub, tmp_path):
+    cache = HTTPCache(root=str(tmp_path / 'cache'), default_ttl=0, ttls={'cricdata.org': 0})
+    fetcher = route(Fetcher(rate=1000, burst=1000, cache=cache), CRICDATA, stub)
+    first = fetcher.get(CRICDATA + '/players/virat-kohli')
+    second = fetcher.get(CRICDATA + '/players/virat-kohli')
+    assert first.text == second.text and 'Matches' in second.text
+    assert cache.stats['misses'] == 1 and cache.stats['revalidated'] == 1
+
+
+def test_importing_the_scraper_creates_no_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    module = importlib.reload(importlib.import_module('scrapy_cricInfo'))
+    assert module.fetcher is None and not (tmp_path / '.scrape_cache').exists()
+
+
+class PlayerPages:
+    """Stands in for the fetcher: serves an ESPNcricinfo player page for every id but `missing`."""
+
+    def __init__(self, missing=()):
+        self.missing = set(missing)
+        self.fetched = []
+
+    def get_many(self, urls):
+        import requests
+        responses = []
+        for url in urls:
+            self.fetched.append(url)
+            player_id = url.rsplit('/', 1)[1].split('.')[0]
+            response = requests.Response()
+            response.status_code = 404 if player_id in self.missing else 200
+            response._content = f'<h1 class="engineering-subhead">Player {player_id}</h1>'.encode()
+            response.encoding = 'utf-8'
+            responses.append(response)
+        return responses
+
+
+def test_archive_scraper_fetches_only_the_players_it_needs(monkeypatch):
+    module = importlib.import_module('scrapy_cricInfo')
+    pages = PlayerPages()
+    monkeypatch.setattr(module, 'fetcher', pages)
+    assert [p['player_name'] for p in module.scrape_cricket_archive_api(3)] == \
+        ['Player 253802', 'Player 28081', 'Player 35320']
+    assert len(pages.fetched) == 3
+    # a page that fails is made up for with the next id
+    pages = PlayerPages(missing={'28081'})
+    monkeypatch.setattr(module, 'fetcher', pages)
+    assert len(module.scrape_cricket_archive_api(3)) == 3 and len(pages.fetched) == 4
@@ -0,0 +1,33 @@
+from db import db, Game, Player, get_player_match_history, HISTORY_MAX_PAGE_SIZE
+
+
+def seed(count):
+    db.session.add_all([Player(email='a', name='A', pwd='x'), Player(email='b', name='B', pwd='x')])
+    db.session.add_all([Game(player1='a', player2='b', winner='a', loser='b') for _ in range(count)])
+    db.session.commit()
+
+
+def test_page_is_clamped_to_the_first(db_app):
+    seed(5)
+    first, _ = get_player_match_history('a', limit=2, page=1)
+    for page in (0, -3):
+        history, next_cursor = get_player_match_history('a', limit=2, page=page)
+        assert history == first and next_cursor
+    assert [h['result'] for h in first] == ['Win', 'Win'] and first[0]['opponent'] == 'B'
+
+
+def test_limit_is_clamped(db_app):
+    seed(HISTORY_MAX_PAGE_SIZE + 5)
+    assert len(get_player_match_history('a', limit=-5)[0]) == 1
+    assert len(get_player_match_history('a', limit=10**6)[0]) == HISTORY_MAX_PAGE_SIZE
+
+
+def test_cursor_pages_cover_every_game_once(db_app):
+    seed(7)
+    seen, cursor = [], None
+    while True:
+        history, cursor = get_player_match_history('b', limit=3, cursor=cursor)
+        seen += [h['game_id'] for h in history]
+        if not cursor:
+            break
+    assert sorted(seen) == list(range(1, 8))
@@ -0,0 +1,108 @@
+import itertools
+import os
+import zlib
+
+import pytest
+import requests
+
+import http_cache
+from fetcher import Fetcher
+from http_cache import HTTPCache
+from stub_http import StubServer, route
+
+CRICDATA = "https://cricdata.org"
+
+
+def response(body, status=200, **headers):
+    r = requests.Response()
+    r.status_code = status
+    r._content = body
+    r.headers = requests.structures.CaseInsensitiveDict(headers)
+    return r
+
+
+def blobs(cache):
+    return [name for _, _, files in os.walk(os.path.join(cache.root, 'blobs')) for name in files]
+
+
+def hashes(cache):
+    return {h for (h,) in cache._conn().execute("SELECT DISTINCT body_hash FROM entries")}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.time() in http_cache moves one second per call, so LRU order is exact."""
+    ticks = itertools.count(1_000_000)
+    monkeypatch.setattr(http_cache.time, 'time', lambda: float(next(ticks)))
+
+
+def test_bodies_are_compressed_and_kept_once(tmp_path):
+    cache = HTTPCache(root=str(tmp_path))
+    page = b'<table>' + b'<tr><td>Virat Kohli</td><td>13906</td></tr>' * 200 + b'</table>'
+    cache.store(CRICDATA + '/players', response(page, **{'Content-Type': 'text/html; charset=utf-8'}))
+    cache.store(CRICDATA + '/players?page=1', response(page))
+    [blob] = blobs(cache)
+    with open(os.path.join(tmp_path, 'blobs', blob[:2], blob), 'rb') as f:
+        stored = f.read()
+    assert zlib.decompress(stored) == page and len(stored) < len(page) / 10
+    assert cache._bytes == len(stored)
+    entry = cache.lookup(CRICDATA + '/players')
+    assert entry['body'] == page and entry['status'] == 200
+    assert cache.to_response(CRICDATA + '/players', entry).text == page.decode()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    bodies = {name: os.urandom(1000) for name in 'abcd'}  # incompressible, about 1 kB each on disk
+    cache = HTTPCache(root=str(tmp_path), max_bytes=3500)
+    for name in 'abc':
+        cache.store(f"{CRICDATA}/{name}", response(bodies[name]))
+    cache.touch(f"{CRICDATA}/a")
+    cache.store(f"{CRICDATA}/d", response(bodies['d']))
+    assert cache.lookup(f"{CRICDATA}/b") is None
+    assert all(cache.lookup(f"{CRICDATA}/{name}")['body'] == bodies[name] for name in 'acd')
+    assert cache.stats['evicted'] == 1 and len(blobs(cache)) == 3
+    assert cache._bytes == sum(os.path.getsize(cache._blob_path(h)) for h in hashes(cache)) <= 3500
+
+
+def test_running_total_follows_replacements_and_reopening(tmp_path):
+    cache = HTTPCache(root=str(tmp_path))
+    cache.store(CRICDATA + '/a', response(os.urandom(500)))
+    cache.store(CRICDATA + '/b', response(os.urandom(700)))
+    cache.store(CRICDATA + '/a', response(os.urandom(300)))  # a's old body goes
+    on_disk = sum(os.path.getsize(cache._blob_path(h)) for h in hashes(cache))
+    assert cache._bytes == on_disk and len(blobs(cache)) == 2
+    assert HTTPCache(root=str(tmp_path))._bytes == on_disk
+
+
+@pytest.fixture
+def stub():
+    server = StubServer('cricdata')
+    yield server
+    server.close()
+
+
+def test_hits_misses_and_revalidations_are_counted(stub, tmp_path):
+    cache = HTTPCache(root=str(tmp_path / 'cache'), ttls={'cricdata.org': 3600})
+    fetcher = route(Fetcher(rate=1000, burst=1000, cache=cache), CRICDATA, stub)
+    url = CRICDATA + '/players/virat-kohli'
+    first = fetcher.get(url)
+    assert fetcher.get(url).text == first.text
+    assert stub.hits['/players/virat-kohli'] == 1  # the fresh copy was served from disk
+    assert cache.stats == dict(cache.stats, misses=1, hits=1, revalidated=0, stored=1)
+
+    cache.ttls['cricdata.org'] = 0  # stale from now on: a conditional GET, answered 304
+    assert fetcher.get(url).text == first.text
+    assert cache.stats['revalidated'] == 1 and stub.hits['/players/virat-kohli'] == 2
+    assert cache.report().startswith("HTTP cache: 1 hits, 1 revalidated, 1 misses (67% served from cache)")
+
+
+def test_offline_serves_stale_pages_and_fetches_nothing(stub, tmp_path):
+    cache = HTTPCache(root=str(tmp_path / 'cache'), ttls={'cricdata.org': 0})
+    fetcher = route(Fetcher(rate=1000, burst=1000, cache=cache), CRICDATA, stub)
+    fetcher.get(CRICDATA + '/players')
+    cache.offline = True
+    assert 'Virat Kohli' in fetcher.get(CRICDATA + '/players').text
+    with pytest.raises(requests.ConnectionError):
+        fetcher.get(CRICDATA + '/players/rashid-khan')
+    assert stub.hits['/players'] == 1 and '/players/rashid-khan' not in stub.hits
+    assert cache.stats['hits'] == 1 and cache.stats['misses'] == 2
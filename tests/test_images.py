@@ -0,0 +1,104 @@
+import io
+import os
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('PIL')
+from PIL import Image, features  # noqa: E402
+
+import images  # noqa: E402
+from images import ImagePipeline, VARIANT_WIDTHS, is_variant  # noqa: E402
+
+FORMATS = ['webp', 'avif'] if features.check('avif') else ['webp']
+
+
+def png(width, height, color=(200, 30, 30)):
+    out = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(out, format='PNG')
+    return out.getvalue()
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    uploads = tmp_path / 'static' / 'uploads'
+    uploads.mkdir(parents=True)
+    return ImagePipeline(str(uploads), workers=2)
+
+
+def variants(pipeline, img):
+    folder = os.path.join(os.path.dirname(pipeline.upload_folder), os.path.dirname(img))
+    found = {}
+    for name in sorted(os.listdir(folder)):
+        with Image.open(os.path.join(folder, name)) as image:
+            found[name] = (image.format, image.size)
+    return found
+
+
+def test_every_width_and_format_is_rendered(pipeline):
+    img = pipeline.process_bytes(png(600, 300))
+    assert is_variant(img) and img.endswith('/256.webp')
+    assert variants(pipeline, img) == {
+        f"{width}.{fmt}": (fmt.upper(), (width, width // 2)) for width in VARIANT_WIDTHS for fmt in FORMATS}
+
+
+def test_small_images_are_not_upscaled(pipeline):
+    img = pipeline.process_bytes(png(100, 80))
+    assert {size for _, size in variants(pipeline, img).values()} == {(100, 80)}
+
+
+def test_identical_uploads_are_stored_once(pipeline, tmp_path, monkeypatch):
+    rendered = []
+    render = images.render_variants
+    monkeypatch.setattr(images, 'render_variants', lambda data, out: rendered.append(out) or render(data, out))
+    for name in ('a.png', 'b.png'):
+        (tmp_path / name).write_bytes(png(300, 300))
+    first = pipeline.process_upload(str(tmp_path / 'a.png'), 'uploads/a.png')
+    second = pipeline.process_upload(str(tmp_path / 'b.png'), 'uploads/b.png')
+    assert first == second and len(rendered) == 1
+    assert pipeline.process_bytes(png(300, 300, color=(0, 0, 255))) != first
+
+
+def test_undecodable_uploads_keep_their_original_path(pipeline, tmp_path):
+    (tmp_path / 'notes.png').write_bytes(b'not an image')
+    assert pipeline.process_upload(str(tmp_path / 'notes.png'), 'uploads/notes.png') == 'uploads/notes.png'
+
+
+class Fetched:
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+
+    def get_many(self, urls):
+        self.requested += urls
+        return [SimpleNamespace(status_code=200, content=self.pages[url]) if url in self.pages else None
+                for url in urls]
+
+
+def test_convert_cards_rewrites_img_and_renders_each_picture_once(pipeline):
+    uploads = pipeline.upload_folder
+    same = png(400, 200)
+    for name in ('kohli.png', 'kohli-copy.png'):
+        with open(os.path.join(uploads, name), 'wb') as f:
+            f.write(same)
+    remote = 'https://img.example/rashid.jpg'
+    pipeline.fetcher = Fetched({remote: png(800, 800, color=(0, 120, 0))})
+    done = pipeline.process_bytes(png(50, 50))
+    cards = [
+        SimpleNamespace(player_name='Kohli', img='uploads/kohli.png'),
+        SimpleNamespace(player_name='Kohli again', img='uploads\\kohli-copy.png'),
+        SimpleNamespace(player_name='Rashid', img=remote),
+        SimpleNamespace(player_name='Bumrah', img='https://img.example/gone.jpg'),
+        SimpleNamespace(player_name='Missing', img='uploads/missing.png'),
+        SimpleNamespace(player_name='Done', img=done),
+        SimpleNamespace(player_name='No art', img=''),
+    ]
+    assert pipeline.convert_cards(cards) == 3
+    kohli, kohli_again, rashid, bumrah, missing, already, no_art = cards
+    assert kohli.img == kohli_again.img and is_variant(kohli.img) and is_variant(rashid.img)
+    assert kohli.img != rashid.img and already.img == done
+    assert (bumrah.img, missing.img, no_art.img) == ('https://img.example/gone.jpg', 'uploads/missing.png', '')
+    assert sorted(pipeline.fetcher.requested) == ['https://img.example/gone.jpg', remote]
+    # three pictures in all: the two copies share one folder
+    assert len(os.listdir(os.path.join(uploads, images.CARDS_DIR))) == 3
+    assert variants(pipeline, rashid.img)['512.webp'] == ('WEBP', (512, 512))
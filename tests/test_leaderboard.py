@@ -0,0 +1,77 @@
+import pytest
+
+from db import db, Game, Player, PlayerStats, add_game, update_game_result
+from leaderboard import Leaderboard, get_leaderboard, rebuild
+from ratings import DEFAULT_RATING, get_ratings
+
+
+@pytest.fixture
+def players(db_app):
+    get_leaderboard().reset()
+    get_ratings().reset()
+    emails = [f"p{i}@example.com" for i in range(4)]
+    for email in emails:
+        db.session.add(Player(email=email, name=email.split('@')[0], pwd='x'))
+    db.session.commit()
+    yield emails
+    get_leaderboard().reset()
+    get_ratings().reset()
+
+
+def play(winner, loser):
+    game = add_game(winner, loser)
+    update_game_result(game.id, winner, loser)
+    return game
+
+
+def test_update_rank_and_top():
+    board = Leaderboard()
+    board.loaded = True  # nothing to read from player_stats
+    board.update('a', 1500, 1, 0)
+    board.update('b', 1520, 2, 0)
+    board.update('c', 1480, 0, 1)
+    assert [row[1] for row in board.top()] == ['b', 'a', 'c']
+    board.update('c', 1600, 1, 1)  # moves, not duplicated
+    assert board.top(2) == [(1, 'c', 1600, 1, 1), (2, 'b', 1520, 2, 0)]
+    assert board.top(limit=2, offset=2) == [(3, 'a', 1500, 1, 0)]
+    assert (board.rank('c'), board.rank('a'), board.rank('nobody')) == (1, 3, None)
+    assert len(board) == 3
+
+
+def test_updates_before_loading_are_left_to_load():
+    board = Leaderboard()
+    board.update('a', 1500, 1, 0)
+    assert board.entries == {}
+
+
+def test_results_move_ratings_and_the_board(players):
+    a, b = players[:2]
+    board = get_leaderboard()
+    board.load()
+    play(a, b)
+    stats = {s.email: s for s in PlayerStats.query}
+    assert stats[a].rating > DEFAULT_RATING > stats[b].rating
+    assert (stats[a].wins, stats[b].losses) == (1, 1)
+    assert board.rank(a) == 1 and board.rank(b) == 2
+    assert get_ratings().rating(a) == stats[a].rating
+
+
+def test_a_repeated_result_changes_nothing(players):
+    a, b = players[:2]
+    game = play(a, b)
+    before = {s.email: (s.rating, s.wins, s.losses) for s in PlayerStats.query}
+    update_game_result(game.id, a, b)
+    update_game_result(game.id, b, a)  # e.g. a late move after a forfeit
+    assert {s.email: (s.rating, s.wins, s.losses) for s in PlayerStats.query} == before
+    assert db.session.get(Game, game.id).winner == a
+
+
+def test_rebuild_replays_the_same_ratings(players):
+    a, b, c, d = players
+    for winner, loser in [(a, b), (c, d), (a, c), (d, b), (b, a)]:
+        play(winner, loser)
+    incremental = {s.email: (round(s.rating, 6), s.wins, s.losses) for s in PlayerStats.query}
+    assert rebuild(batch_size=2) == (5, 4)
+    assert {s.email: (round(s.rating, 6), s.wins, s.losses) for s in PlayerStats.query} == incremental
+    assert not get_leaderboard().loaded  # reloaded on next use
+    assert get_leaderboard().top(1)[0][1] == max(incremental, key=lambda e: incremental[e][0])
@@ -0,0 +1,174 @@
+import random
+import time
+
+import pytest
+
+import catalog as catalog_module
+from gameplay import GamePlay
+from lifecycle import GameLifecycle
+from registry import GameRegistry
+from state_store import open_state_store
+
+
+@pytest.fixture
+def stored_game(tmp_path, monkeypatch):
+    """A Flask app with 40 cards and one started game in a SQLite store; the catalog is not loaded yet."""
+    from flask import Flask
+    from db import db, Cricket
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'app.db'}"
+    db.init_app(app)
+    store = open_state_store(f"sqlite:///{tmp_path / 'games.db'}")
+    monkeypatch.setattr(catalog_module, '_catalog', None)
+    with app.app_context():
+        db.create_all()
+        for i in range(40):
+            db.session.add(Cricket(player_name=f"Player {i}", power=50 + i, strike_rate=60.0 + i,
+                                   wickets=i, matches_played=10 + i, runs_scored=100 * i,
+                                   highest_score=20 + i, img=f"uploads/p{i}.webp"))
+        db.session.commit()
+        gp = GamePlay('1', 'a@example.com')
+        gp.join('b@example.com')
+        gp.starter = gp.turn = gp.player1
+        store.save(gp)
+        db.session.remove()
+    # another process (or a restart) sees only the stored state, no catalog
+    monkeypatch.setattr(catalog_module, '_catalog', None)
+    return app, store
+
+
+def test_stored_games_are_watched_and_reaped_outside_a_request(stored_game):
+    app, store = stored_game
+    results = []
+    lifecycle = GameLifecycle(GameRegistry(store), app=app, turn_timeout=1,
+                              record_result=lambda game_id, winner, loser: results.append((game_id, winner, loser)))
+    lifecycle.watch_all()  # app.py does this at import, with no app context
+    assert len(lifecycle.wheel) == 1
+    catalog_module._catalog = None  # expired by the time the check is due
+    lifecycle.reap(time.time() + 5)
+    assert results == [('1', 'b@example.com', 'a@example.com')]
+    assert lifecycle.stats['forfeits'] == 1
+
+
+def bot_lifecycle(games, catalog, **kwargs):
+    """A lifecycle driving the bot the way app.py wires it, minus the database."""
+    from bots import BOT_EMAIL, bot_attribute, is_bot_turn
+
+    def match_bot(gp):
+        with games.session(gp.game_id) as gp:
+            gp.bot = BOT_EMAIL
+            gp.join(BOT_EMAIL, catalog=catalog)
+        return True
+
+    def play_bot(gp):
+        if is_bot_turn(gp):
+            gp.play_turn(gp.bot, bot_attribute(gp))
+
+    return GameLifecycle(games, record_result=lambda *args: None, match_bot=match_bot, play_bot=play_bot,
+                         bot_match_after=20, bot_move_delay=1.5, **kwargs)
+
+
+def test_waiting_player_is_matched_with_the_bot_without_polling(catalog):
+    from simulate import SimulatedGame
+    games = GameRegistry()
+    lifecycle = bot_lifecycle(games, catalog)
+    gp = SimulatedGame('1', 'human@example.com')
+    games.add(gp)
+    lifecycle.watch(gp)
+    lifecycle.reap(gp.last_activity + 10)
+    assert not games.get('1').matched
+    lifecycle.reap(gp.last_activity + 22)
+    assert games.get('1').bot is not None and lifecycle.stats['bot_matches'] == 1
+
+
+def test_bot_moves_after_its_delay_without_polling(catalog):
+    from bots import BOT_EMAIL
+    from simulate import SimulatedGame
+    games = GameRegistry()
+    lifecycle = bot_lifecycle(games, catalog)
+    gp = SimulatedGame('1', 'human@example.com')
+    gp.bot = BOT_EMAIL
+    gp.join(BOT_EMAIL, catalog=catalog)
+    gp.set_starter(BOT_EMAIL)
+    games.add(gp)
+    lifecycle.watch(gp)
+    moved = gp.last_activity
+    lifecycle.reap(moved + 0.5)
+    assert gp.last_result is None
+    lifecycle.reap(moved + 3)
+    assert gp.last_result['attribute'] and gp.turn_processed
+    assert lifecycle.stats['forfeits'] == 0
+
+
+def test_push_clients_get_the_bot_without_polling(live_app):
+    import uuid
+    from bots import BOT_EMAIL
+    client = live_app.app.test_client()
+    email = f"solo-{uuid.uuid4().hex}@example.com"
+    game_id = client.post('/start_game', json={'email': email, 'queue': uuid.uuid4().hex}).get_json()['game_id']
+    seq = live_app.hub.last_seq(game_id)
+    # only the reaper runs from here on: no /check_match, /check_turn_processed or /wait_event
+    # the reaper's clock, run ahead (it never goes back)
+    clock = max(time.time(), live_app.lifecycle.wheel.ticked_at) + live_app.app.config['BOT_MATCH_AFTER'] + 2
+    live_app.lifecycle.reap(clock)
+    assert live_app.games.get(game_id).bot == BOT_EMAIL
+    client.post('/decide_starter', json={'game_id': game_id})
+    for _ in range(20):
+        if live_app.games.get(game_id).turn != email:
+            break
+        client.post('/play_turn', json={'game_id': game_id, 'email': email, 'attribute': 'power'})
+    assert live_app.games.get(game_id).turn == BOT_EMAIL
+    seq = live_app.hub.last_seq(game_id)
+    live_app.lifecycle.reap(clock + live_app.app.config['BOT_MOVE_DELAY'] + 2)
+    turns = [e for e in live_app.hub.wait(game_id, email, seq, 0) or [] if e['event'] == 'turn']
+    assert turns and turns[0]['data']['attribute']
+
+
+def test_no_moves_after_a_forfeit(catalog):
+    from simulate import SimulatedGame
+    results = []
+    games = GameRegistry()
+    lifecycle = GameLifecycle(games, turn_timeout=1,
+                              record_result=lambda game_id, winner, loser: results.append((winner, loser)))
+    gp = SimulatedGame('1', 'a')
+    gp.record_result = lambda game_id, winner, loser: results.append((winner, loser))
+    gp.join('b', catalog=catalog)
+    gp.set_starter('a')
+    games.add(gp)
+    lifecycle.watch(gp)
+    lifecycle.reap(gp.last_activity + 5)
+    assert results == [('b', 'a')] and not gp.active
+    # still lingering in the registry: the forfeited player keeps sending moves
+    rng = random.Random(3)
+    for _ in range(5000):
+        gp.play_turn(gp.turn, rng.choice(('power', 'wickets', 'runs_scored')))
+    assert results == [('b', 'a')] and gp.winner_of_game == 'b'
+
+
+def test_expired_waiting_games_are_evicted_unless_matched_meanwhile(catalog):
+    from matchmaking import Matchmaker
+
+    class Racing(Matchmaker):
+        def cancel(self, email, game_id=None):
+            # a human takes the ticket and joins just before the reaper can
+            super().cancel(email, game_id)
+            with games.session('1') as gp:
+                gp.join('human', catalog=catalog)
+            return False
+
+    games = GameRegistry()
+    for matchmaker, evicted in ((Matchmaker(timeout=1000), True), (Racing(timeout=1000), False)):
+        lifecycle = GameLifecycle(games, matchmaker=matchmaker, wait_timeout=10)
+
+        def park(email):
+            gp = GamePlay('1', email)
+            games.add(gp)
+            lifecycle.watch(gp)
+            return gp.game_id
+
+        matchmaker.match_or_enqueue('a', 1200, park)
+        lifecycle.reap(games.get('1').last_activity + 15)
+        assert (games.get('1') is None) is evicted
+        assert lifecycle.stats['expired_waiting'] == evicted and len(matchmaker) == 0
+        games.remove('1')
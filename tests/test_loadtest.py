@@ -0,0 +1,14 @@
+import pytest
+
+import loadtest
+
+
+@pytest.mark.parametrize('mode', ['rest', 'ws'])
+def test_load_client_reports_turn_latency(live_server, mode, capsys):
+    if mode == 'ws':
+        pytest.importorskip('simple_websocket')
+        pytest.importorskip('flask_sock')
+    report = loadtest.run(live_server, mode, pairs=3, turns=10)
+    assert 'failed' not in capsys.readouterr().out
+    assert report is not None and 3 <= report['turns'] <= 30
+    assert 0 < report['p50_ms'] <= report['p99_ms']
@@ -0,0 +1,106 @@
+import threading
+
+from matchmaking import Matchmaker
+
+
+def park(email):
+    return f"game-{email}"
+
+
+def test_closest_rating_within_the_window_is_matched():
+    mm = Matchmaker(base_window=100)
+    mm.match_or_enqueue('far', 1500, park, now=0.0)
+    mm.match_or_enqueue('near', 1240, park, now=0.0)
+    ticket, opponent = mm.match_or_enqueue('new', 1200, park, now=1.0)
+    assert ticket is None and opponent.email == 'near' and opponent.game_id == 'game-near'
+    assert len(mm) == 1
+
+
+def test_windows_widen_while_waiting():
+    mm = Matchmaker(base_window=100, widen_per_second=10, max_window=800, timeout=1000)
+    mm.match_or_enqueue('low', 1000, park, now=0.0)
+    # 300 apart: outside both players' windows on arrival
+    ticket, opponent = mm.match_or_enqueue('high', 1300, park, now=5.0)
+    assert opponent is None and ticket.game_id == 'game-high'
+    assert mm.match_or_enqueue('high', 1300, park, now=10.0)[1] is None
+    # 'low' has waited 20s, so its window (100 + 200) now takes 'high' in
+    ticket, opponent = mm.match_or_enqueue('high', 1300, park, now=20.0)
+    assert opponent.email == 'low'
+    assert ticket.email == 'high' and not ticket.active
+
+
+def test_windows_stop_at_max_window():
+    mm = Matchmaker(base_window=100, widen_per_second=100, max_window=300, timeout=1000)
+    mm.match_or_enqueue('low', 1000, park, now=0.0)
+    assert mm.match_or_enqueue('high', 1400, park, now=100.0)[1] is None
+    assert mm.match_or_enqueue('high', 1400, park, now=200.0)[1] is None
+    assert len(mm) == 2
+
+
+def test_queues_do_not_mix():
+    mm = Matchmaker()
+    mm.match_or_enqueue('a', 1200, park, queue='blitz', now=0.0)
+    assert mm.match_or_enqueue('b', 1200, park, queue='classic', now=1.0)[1] is None
+    assert mm.match_or_enqueue('c', 1200, park, queue='blitz', now=2.0)[1].email == 'a'
+    # switching queues drops the old ticket
+    mm.match_or_enqueue('b', 1200, park, queue='blitz', now=3.0)
+    assert mm.metrics()['queues'] == {'blitz': 1}
+
+
+def test_timed_out_tickets_are_dropped_and_redirected_to_nowhere():
+    mm = Matchmaker(timeout=60)
+    mm.match_or_enqueue('a', 1200, park, now=0.0)
+    assert mm.redirect('game-a') == (False, None)
+    ticket, opponent = mm.match_or_enqueue('b', 1200, park, now=61.0)
+    assert opponent is None and ticket.email == 'b'
+    assert mm.redirect('game-a') == (True, None)
+    assert mm.stats['timed_out'] == 1 and len(mm) == 1
+
+
+def test_a_waiting_player_matched_on_a_repeat_call_is_redirected():
+    mm = Matchmaker(base_window=100, widen_per_second=10, timeout=1000)
+    mm.match_or_enqueue('a', 1000, park, now=0.0)
+    mm.match_or_enqueue('b', 1250, park, now=0.0)
+    # 'b' polls again with a window wide enough for 'a'
+    ticket, opponent = mm.match_or_enqueue('b', 1250, park, now=20.0)
+    assert opponent.email == 'a' and ticket.game_id == 'game-b'
+    assert mm.redirect('game-b') == (True, 'game-a')
+    assert len(mm) == 0
+
+
+def test_cancel():
+    mm = Matchmaker()
+    mm.match_or_enqueue('a', 1200, park, now=0.0)
+    assert not mm.cancel('a', 'game-other')
+    assert mm.cancel('a', 'game-a')
+    assert not mm.cancel('a')
+    assert mm.match_or_enqueue('b', 1200, park, now=1.0)[1] is None
+
+
+def test_games_are_created_outside_the_lock():
+    mm = Matchmaker()
+    other = []
+
+    def slow_park(email):
+        # another queue's arrival while this game is being created
+        t = threading.Thread(target=lambda: other.append(mm.match_or_enqueue('x', 1200, park, queue='other')))
+        t.start()
+        t.join(5)
+        return park(email)
+
+    ticket, opponent = mm.match_or_enqueue('a', 1200, slow_park)
+    assert other and opponent is None and ticket.game_id == 'game-a'
+    assert len(mm) == 2
+
+
+def test_an_arrival_while_parking_is_matched():
+    mm = Matchmaker()
+
+    def racing_park(email):
+        assert mm.match_or_enqueue('b', 1210, park)[1] is None
+        return park(email)
+
+    ticket, opponent = mm.match_or_enqueue('a', 1200, racing_park)
+    # 'a' joins 'b', and drops the game it just parked
+    assert opponent.email == 'b' and ticket.game_id == 'game-a' and not ticket.active
+    assert len(mm) == 0 and mm.stats['matched'] == 1
@@ -0,0 +1,83 @@
+import io
+import os
+
+import pytest
+from flask import Flask
+from werkzeug.datastructures import FileStorage
+
+from media import IMMUTABLE_MAX_AGE, save_fingerprinted, send_upload
+
+ART = bytes(range(256)) * 8
+VARIANT = 'cards/' + 'ab' * 16 + '/256.webp'
+
+
+def test_uploads_are_served_from_the_app_folder_whatever_the_cwd(live_app, tmp_path, monkeypatch):
+    name = sorted(os.listdir(os.path.join(live_app.app.root_path, 'static', 'uploads')))[0]
+    monkeypatch.chdir(tmp_path)
+    response = live_app.app.test_client().get(f'/uploads/{name}')
+    assert response.status_code == 200 and response.data
+    response.close()
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    """A bare app serving tmp_path through send_upload, with a plain, a fingerprinted and a variant upload."""
+    app = Flask(__name__)
+    app.config['ACCEL'] = None
+
+    @app.route('/uploads/<path:filename>')
+    def uploaded(filename):
+        return send_upload(str(tmp_path), filename, max_age=300, accel_prefix=app.config['ACCEL'])
+
+    (tmp_path / 'kohli.png').write_bytes(ART)
+    named = save_fingerprinted(FileStorage(io.BytesIO(ART), 'kohli.PNG'), str(tmp_path), 'kohli.PNG')
+    (tmp_path / VARIANT).parent.mkdir(parents=True)
+    (tmp_path / VARIANT).write_bytes(ART)
+    return app, named
+
+
+def test_only_fingerprinted_names_are_immutable(uploads):
+    app, named = uploads
+    client = app.test_client()
+    assert named.startswith('kohli.') and named.endswith('.png') and named != 'kohli.png'
+    plain = client.get('/uploads/kohli.png')
+    assert plain.cache_control.max_age == 300 and not plain.cache_control.immutable
+    for name in (named, VARIANT):
+        response = client.get(f'/uploads/{name}')
+        assert response.data == ART
+        assert response.cache_control.immutable and response.cache_control.max_age == IMMUTABLE_MAX_AGE
+        response.close()
+    plain.close()
+
+
+def test_fingerprint_is_a_strong_etag(uploads):
+    app, named = uploads
+    client = app.test_client()
+    response = client.get(f'/uploads/{named}')
+    etag, weak = response.get_etag()
+    assert etag == named.split('.')[1] and not weak
+    response.close()
+    again = client.get(f'/uploads/{named}', headers={'If-None-Match': f'"{etag}"'})
+    assert again.status_code == 304 and not again.data
+
+
+def test_ranges_are_served(uploads):
+    app, named = uploads
+    response = app.test_client().get(f'/uploads/{named}', headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206 and response.data == ART[100:200]
+    assert response.headers['Content-Range'] == f'bytes 100-199/{len(ART)}'
+    response.close()
+
+
+def test_accel_redirect_leaves_the_body_to_the_proxy(uploads):
+    app, named = uploads
+    app.config['ACCEL'] = '/protected-uploads/'
+    client = app.test_client()
+    response = client.get(f'/uploads/{named}')
+    assert response.status_code == 200 and not response.data
+    assert response.headers['X-Accel-Redirect'] == f'/protected-uploads/{named}'
+    assert response.mimetype == 'image/png' and response.cache_control.immutable
+    etag = response.get_etag()[0]
+    assert client.get(f'/uploads/{named}', headers={'If-None-Match': f'"{etag}"'}).status_code == 304
+    assert client.get('/uploads/kohli.png').headers['X-Accel-Redirect'] == '/protected-uploads/kohli.png'
+    assert client.get('/uploads/../secret.png').status_code == 404
@@ -0,0 +1,39 @@
+import pytest
+from sqlalchemy import text
+
+from db import db, Cricket
+from migrations import MigrationError, run_migrations
+
+
+def test_duplicate_player_names_stop_the_unique_index_with_their_names(db_app):
+    # a database from before the unique index
+    db.session.execute(text("DROP INDEX ux_cricket_player_name"))
+    for name in ('Virat Kohli', 'Virat Kohli', 'Rashid Khan'):
+        db.session.add(Cricket(player_name=name, power=50, strike_rate=100.0))
+    db.session.commit()
+
+    with pytest.raises(MigrationError, match=r"'Virat Kohli' x2"):
+        run_migrations()
+    applied = {row[0] for row in db.session.execute(text("SELECT version FROM schema_migrations"))}
+    assert applied == {1}
+    assert Cricket.query.count() == 3  # nothing deleted
+
+    Cricket.query.filter_by(player_name='Virat Kohli').first().player_name = 'Virat Kohli (2)'
+    db.session.commit()
+    run_migrations()
+    applied = {row[0] for row in db.session.execute(text("SELECT version FROM schema_migrations"))}
+    assert applied == {1, 2}
+
+
+def test_cards_for_an_existing_player_are_a_conflict(live_app):
+    client = live_app.app.test_client()
+    response = client.post('/card', json={'player_name': 'Player 0', 'power': 1, 'strike_rate': 1.0})
+    assert response.status_code == 409
+    with live_app.app.app_context():
+        first, second = Cricket.query.order_by(Cricket.id).limit(2).all()
+        first_name, second_id, second_name = first.player_name, second.id, second.player_name
+    response = client.put(f"/card/{second_id}", json={'player_name': first_name})
+    assert response.status_code == 409
+    # rolled back: the card kept its name
+    with live_app.app.app_context():
+        assert db.session.get(Cricket, second_id).player_name == second_name
@@ -0,0 +1,42 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from passwords import PasswordHasher
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc/self/fd'), reason="needs /proc")
+def test_pool_workers_do_not_inherit_the_server_socket():
+    server = socket.create_server(('127.0.0.1', 0))
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1)
+    try:
+        assert hasher.check(hasher.hash('secret'), 'secret')
+        wanted = f"socket:[{os.fstat(server.fileno()).st_ino}]"
+        for pid in hasher._pool._processes:
+            fds = os.listdir(f'/proc/{pid}/fd')
+            assert wanted not in {os.readlink(f'/proc/{pid}/fd/{fd}') for fd in fds}
+    finally:
+        hasher._pool.shutdown()
+        server.close()
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc/self/fd'), reason="needs /proc")
+def test_pool_workers_exit_with_a_killed_server(tmp_path):
+    script = ("import os, sys; sys.path.insert(0, sys.argv[1])\n"
+              "from passwords import PasswordHasher\n"
+              "hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1)\n"
+              "hasher.hash('secret')\n"
+              "print(*hasher._pool._processes, flush=True)\n"
+              "os._exit(1)  # no pool shutdown, as after a crash or SIGKILL\n")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, '-c', script, root], capture_output=True, text=True, timeout=60).stdout
+    workers = [int(pid) for pid in out.split()]
+    assert workers
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline and any(os.path.exists(f'/proc/{pid}') for pid in workers):
+        time.sleep(0.1)
+    assert not any(os.path.exists(f'/proc/{pid}') for pid in workers)
@@ -0,0 +1,101 @@
+import threading
+import uuid
+
+from push import PushHub, sse_stream
+
+
+def matched_game(client):
+    queue = uuid.uuid4().hex
+    a, b = f"a-{queue}@example.com", f"b-{queue}@example.com"
+    client.post('/start_game', json={'email': a, 'queue': queue})
+    return client.post('/start_game', json={'email': b, 'queue': queue}).get_json()['game_id'], a, b
+
+
+def sse_events(body):
+    """[(id, event)] of an SSE response body, keep-alive comments skipped."""
+    found = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if fields:
+            found.append((int(fields['id']), fields['event']))
+    return found
+
+
+def test_stream_resumes_after_last_event_id_and_ends_on_game_over(live_app):
+    client = live_app.app.test_client()
+    game_id, a, b = matched_game(client)
+    hub = live_app.hub
+    first = hub.last_seq(game_id)
+    hub.publish(game_id, 'starter', {'starter': a})
+    hub.publish(game_id, 'hand', {'card': 1}, to=b)  # someone else's
+    hub.publish(game_id, 'turn', {'attribute': 'power'})
+    hub.publish(game_id, 'game_over', {'overallWinner': a})
+    hub.publish(game_id, 'turn', {'attribute': 'wickets'})  # never sent: the stream is over
+
+    response = client.get(f"/events/{game_id}?email={a}", headers={'Last-Event-ID': str(first + 1)})
+    assert response.status_code == 200 and response.mimetype == 'text/event-stream'
+    assert sse_events(response.get_data(as_text=True)) == [(first + 3, 'turn'), (first + 4, 'game_over')]
+    # ?after= does the same for clients that can't set the header
+    response = client.get(f"/events/{game_id}?email={b}&after={first}")
+    assert [event for _, event in sse_events(response.get_data(as_text=True))] == \
+        ['starter', 'hand', 'turn', 'game_over']
+
+
+def test_long_poll_times_out_empty(live_app):
+    client = live_app.app.test_client()
+    game_id, a, _ = matched_game(client)
+    after = live_app.hub.last_seq(game_id)
+    response = client.post('/wait_event', json={'game_id': game_id, 'email': a, 'after': after, 'timeout': 0.2})
+    assert response.status_code == 200 and response.get_json() == {'events': []}
+    live_app.hub.publish(game_id, 'turn', {'attribute': 'power'})
+    events = client.post('/wait_event', json={'game_id': game_id, 'email': a, 'after': after}).get_json()['events']
+    assert [(e['seq'], e['event']) for e in events] == [(after + 1, 'turn')]
+
+
+def test_closing_a_channel_releases_long_polls(live_app, monkeypatch):
+    client = live_app.app.test_client()
+    game_id, a, _ = matched_game(client)
+    hub = live_app.hub
+    after = hub.last_seq(game_id)
+    answers = []
+    waiter = threading.Thread(target=lambda: answers.append(client.post(
+        '/wait_event', json={'game_id': game_id, 'email': a, 'after': after, 'timeout': 30}).get_json()), daemon=True)
+    waiting = threading.Event()
+    channel = hub._channel
+
+    def spying(game_id):
+        ch = channel(game_id)
+        if threading.current_thread() is waiter:
+            waiting.set()  # it holds the channel that close() is about to take away
+        return ch
+
+    monkeypatch.setattr(hub, '_channel', spying)
+    waiter.start()
+    assert waiting.wait(5)
+    hub.close(game_id)
+    waiter.join(5)
+    assert answers == [{'events': [], 'closed': True}]
+
+
+def test_stream_ends_when_the_channel_closes(monkeypatch):
+    hub = PushHub()
+    hub.publish('1', 'matched', {})
+    stream = sse_stream(hub, '1', 'a@example.com')
+    assert next(stream).startswith('id: 1\nevent: matched\n')
+    rest = []
+    reader = threading.Thread(target=lambda: rest.extend(stream), daemon=True)
+    reading = threading.Event()
+    channel = hub._channel
+
+    def spying(game_id):
+        ch = channel(game_id)
+        if threading.current_thread() is reader:
+            reading.set()
+        return ch
+
+    monkeypatch.setattr(hub, '_channel', spying)
+    reader.start()
+    assert reading.wait(5)
+    hub.close('1')
+    reader.join(5)
+    assert not reader.is_alive() and rest == []
@@ -0,0 +1,112 @@
+import itertools
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from gameplay import GamePlay
+from registry import GameRegistry
+from tests.test_state_store import colliding_game_ids
+
+PLAYERS = 4000
+HTTP_PLAYERS = 1000
+
+
+def start_game(games, email, new_ids, catalog):
+    """The 'fifo' path of app.start_game: claim the waiting game or park a new one."""
+    gp, claimed = games.claim_or_wait(email, lambda first: GamePlay(next(new_ids), first))
+    if not claimed:
+        return None
+    with games.session(gp.game_id) as gp:
+        gp.join(email, catalog=catalog)
+    return gp.game_id
+
+
+def test_parallel_start_game_pairs_everyone_once(catalog):
+    games = GameRegistry()
+    # every other new game gets an id that used to share a lock with 'waiting'
+    special = iter(colliding_game_ids('waiting', PLAYERS))
+    plain = (str(n) for n in itertools.count(10**8))
+    lock = threading.Lock()
+    counter = itertools.count()
+
+    def next_id():
+        with lock:
+            return next(special) if next(counter) % 2 else next(plain)
+
+    new_ids = iter(next_id, None)
+    emails = [f"p{i}@example.com" for i in range(PLAYERS)]
+    barrier = threading.Barrier(32)
+
+    def call(email):
+        if email in emails[:32]:
+            barrier.wait()
+        return start_game(games, email, new_ids, catalog)
+
+    with ThreadPoolExecutor(32) as pool:
+        joined = [g for g in pool.map(call, emails) if g is not None]
+
+    assert len(joined) == len(set(joined)) == PLAYERS // 2
+    seen = []
+    for game_id in joined:
+        gp = games.get(game_id)
+        assert gp.matched and gp.player1 != gp.player2
+        seen += [gp.player1, gp.player2]
+    assert sorted(seen) == sorted(emails)
+    assert games.store.get_waiting() is None
+    assert len(games) == PLAYERS // 2
+
+
+@pytest.mark.parametrize('mode', ['fifo', 'skill'])
+def test_parallel_start_game_requests_pair_everyone_once(live_app, monkeypatch, mode):
+    monkeypatch.setitem(live_app.app.config, 'MATCHMAKING', mode)
+    run = uuid.uuid4().hex
+    emails = [f"p{i}-{run}@example.com" for i in range(HTTP_PLAYERS)]
+    barrier = threading.Barrier(32)
+
+    def call(email):
+        if email in emails[:32]:
+            barrier.wait()
+        response = live_app.app.test_client().post('/start_game', json={'email': email, 'queue': run})
+        assert response.status_code in (200, 202), response.get_json()
+        return response.status_code, response.get_json()
+
+    with ThreadPoolExecutor(32) as pool:
+        responses = list(pool.map(call, emails))
+
+    joined = [body['game_id'] for status, body in responses if status == 200]
+    assert len(joined) == len(set(joined)) == HTTP_PLAYERS // 2
+    seen = []
+    for game_id in joined:
+        gp = live_app.games.get(game_id)
+        assert gp.matched and gp.player1 != gp.player2
+        seen += [gp.player1, gp.player2]
+    assert sorted(seen) == sorted(emails)
+    for game_id in joined:
+        live_app.games.remove(game_id)
+
+
+def test_sessions_serialize_turns_on_one_game(catalog):
+    games = GameRegistry()
+    gp = GamePlay('1', 'a')
+    gp.join('b', catalog=catalog)
+    gp.record_result = lambda *args: None
+    gp.set_starter('a')
+    games.add(gp)
+    played = []
+
+    def play():
+        for _ in range(50):
+            with games.session('1') as gp:
+                if gp.active:
+                    before = len(gp.deck1) + len(gp.deck2)
+                    gp.play_turn(gp.turn, 'power')
+                    played.append(before == len(gp.deck1) + len(gp.deck2))
+
+    threads = [threading.Thread(target=play) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert played and all(played)
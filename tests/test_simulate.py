@@ -0,0 +1,30 @@
+import json
+import os
+
+from simulate import compare
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def baseline():
+    with open(os.path.join(ROOT, 'simulate_baseline.json')) as f:
+        return json.load(f)
+
+
+def test_a_slower_machine_is_not_a_regression():
+    old = baseline()
+    result = dict(old, turns_per_sec=old['turns_per_sec'] // 2,
+                  turns_per_sec_per_worker=old['turns_per_sec_per_worker'] // 2)
+    assert compare(result, old, 0.15) == []
+
+
+def test_slower_turns_against_the_reference_are_a_regression():
+    old = baseline()
+    result = dict(old, turns_per_reference=old['turns_per_reference'] * 0.8)
+    assert any('throughput dropped' in p for p in compare(result, old, 0.15))
+
+
+def test_another_hash_seed_is_not_compared():
+    old = baseline()
+    result = dict(old, config=dict(old['config'], hash_seed=None))
+    assert any('settings differ' in p for p in compare(result, old, 0.15))
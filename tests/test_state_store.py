@@ -0,0 +1,180 @@
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from gameplay import GamePlay
+from registry import GameRegistry
+from state_store import MemoryStateStore, open_state_store
+
+
+def colliding_game_ids(name, count, stripes=1024):
+    """Game ids whose lock names landed on the same stripe as `name` in the old striped store."""
+    target = zlib.crc32(name.encode()) % stripes
+    ids, n = [], 0
+    while len(ids) < count:
+        n += 1
+        if zlib.crc32(f'game:{n}'.encode()) % stripes == target:
+            ids.append(str(n))
+    return ids
+
+
+def test_colliding_ids_are_known():
+    assert '1861' in colliding_game_ids('waiting', 3)
+
+
+def test_nested_locks_on_colliding_names():
+    store = MemoryStateStore()
+    done = threading.Event()
+
+    def nested():
+        with store.lock('waiting'):
+            with store.lock('game:1861'):
+                done.set()
+
+    t = threading.Thread(target=nested, daemon=True)
+    t.start()
+    t.join(2)
+    assert done.is_set()
+    assert store._locks == {}  # released locks are dropped
+
+
+def test_claim_waiting_game_with_colliding_id():
+    games = GameRegistry()
+    ids = iter(colliding_game_ids('waiting', 1))
+    gp, claimed = games.claim_or_wait('a', lambda email: GamePlay(next(ids), email))
+    assert (gp.game_id, claimed) == ('1861', False)
+    gp, claimed = games.claim_or_wait('b', lambda email: pytest.fail("should join the waiting game"))
+    assert claimed and gp.game_id == '1861' and gp.player2 == 'b'
+    assert games.store.get_waiting() is None
+
+
+def test_lock_excludes_other_threads():
+    store = MemoryStateStore()
+    inside, overlaps = [0], []
+
+    def worker():
+        for _ in range(200):
+            with store.lock('game:7'):
+                inside[0] += 1
+                overlaps.append(inside[0])
+                inside[0] -= 1
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert max(overlaps) == 1
+
+
+# -------- Shared backends: SQLite file and a local Redis-protocol server --------
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def store_url(request, tmp_path):
+    if request.param == 'sqlite':
+        yield f"sqlite:///{tmp_path / 'games.db'}"
+        return
+    pytest.importorskip('redis')
+    from tests.fake_redis import FakeRedisServer
+    with FakeRedisServer() as server:
+        yield server.url
+
+
+def dealt_game(game_id, catalog):
+    gp = GamePlay(game_id, 'a@example.com')
+    gp.join('b@example.com', catalog=catalog)
+    gp.set_starter('a@example.com')
+    return gp
+
+
+def test_round_trip(store_url, catalog):
+    store = open_state_store(store_url)
+    gp = dealt_game('5', catalog)
+    gp.play_turn(gp.turn, 'power')
+    store.save(gp)
+    loaded = store.load('5')
+    assert loaded.to_state() == gp.to_state()
+    assert list(loaded.deck1) == list(gp.deck1) and loaded.last_result == gp.last_result
+    assert store.game_ids() == ['5']
+    store.delete('5')
+    assert store.load('5') is None and store.game_ids() == []
+
+
+def test_waiting_slot(store_url):
+    store = open_state_store(store_url)
+    assert store.get_waiting() is None
+    store.set_waiting('9')
+    assert open_state_store(store_url).get_waiting() == '9'
+    store.set_waiting(None)
+    assert store.get_waiting() is None
+
+
+def test_lock_is_shared_between_workers(store_url, monkeypatch):
+    import state_store
+    monkeypatch.setattr(state_store, 'LOCK_TIMEOUT', 0.2)
+    first, second = open_state_store(store_url), open_state_store(store_url)
+    with first.lock('game:1'):
+        with pytest.raises(TimeoutError):
+            with second.lock('game:1'):
+                pass
+        with second.lock('game:2'):
+            pass
+    with second.lock('game:1'):
+        pass
+
+
+def test_lease_expires_for_a_dead_worker(store_url, monkeypatch):
+    import state_store
+    monkeypatch.setattr(state_store, 'LOCK_LEASE', 0.05)
+    dead = open_state_store(store_url).lock('game:1')
+    dead.__enter__()  # never released, like a crashed worker
+    time.sleep(0.1)
+    with open_state_store(store_url).lock('game:1'):
+        pass
+
+
+def test_two_workers_pair_players(store_url, catalog):
+    workers = [GameRegistry(open_state_store(store_url)) for _ in range(2)]
+    new_ids = iter(str(n) for n in range(1, 1000))
+    lock = threading.Lock()
+
+    def create(email):
+        with lock:
+            return GamePlay(next(new_ids), email)
+
+    def start(i):
+        games = workers[i % 2]
+        gp, claimed = games.claim_or_wait(f"p{i}", create)
+        if claimed:
+            with games.session(gp.game_id) as gp:
+                gp.join(f"p{i}", catalog=catalog)
+            return gp.game_id
+
+    with ThreadPoolExecutor(8) as pool:
+        joined = [g for g in pool.map(start, range(200)) if g]
+    assert len(joined) == len(set(joined)) == 100
+    players = sorted(p for g in joined for p in (workers[0].get(g).player1, workers[1].get(g).player2))
+    assert players == sorted(f"p{i}" for i in range(200))
+
+
+def test_round_trip_after_a_card_is_deleted(store_url, catalog, monkeypatch):
+    import catalog as catalog_module
+    from catalog import CardCatalog
+    store = open_state_store(store_url)
+    gp = dealt_game('6', catalog)
+    gp.play_turn(gp.turn, 'power')
+    store.save(gp)
+    # the won card is deleted, and the catalog reloaded without it
+    deleted = catalog.ids[gp.last_result['won_card']]
+    monkeypatch.setattr(catalog_module, '_catalog',
+                        CardCatalog([card for card in catalog.cards if card[0] != deleted], version=1))
+    loaded = store.load('6')
+    assert loaded.last_result['won_card'] is None
+    store.save(loaded)  # every session saves the game back
+    again = store.load('6')
+    assert again.last_result['won_card'] is None
+    assert again.last_result['lost_card'] == loaded.last_result['lost_card'] is not None
+    assert len(again.deck1) + len(again.deck2) == len(catalog) - 1
@@ -0,0 +1,108 @@
+import uuid
+
+import pytest
+
+from tokens import InvalidToken, TokenSigner
+
+
+def test_non_ascii_signature_is_rejected():
+    signer = TokenSigner({'k1': 'secret'})
+    token, _ = signer.issue('player@example.com')
+    payload = token.rsplit('.', 1)[0]
+    with pytest.raises(InvalidToken, match='Bad signature'):
+        signer.verify(f"{payload}.ééé")
+
+
+def test_rotation_keeps_old_tokens_until_their_key_is_retired():
+    old = TokenSigner({'k1': 'one'})
+    token, _ = old.issue('a@example.com')
+    rotated = TokenSigner({'k1': 'one', 'k2': 'two'}, active_kid='k2')
+    fresh, _ = rotated.issue('b@example.com')
+    assert fresh.startswith('k2.')
+    assert rotated.verify(token) == 'a@example.com'  # and now it's cached
+    rotated.retire('k1')
+    with pytest.raises(InvalidToken, match='Unknown signing key'):
+        rotated.verify(token)
+    assert rotated.verify(fresh) == 'b@example.com'
+    with pytest.raises(ValueError):
+        rotated.retire('k2')
+
+
+def test_tokens_from_another_key_are_forged():
+    token, _ = TokenSigner({'k1': 'one'}).issue('a@example.com')
+    with pytest.raises(InvalidToken, match='Bad signature'):
+        TokenSigner({'k1': 'other'}).verify(token)
+
+
+def test_tokens_expire_even_when_cached():
+    signer = TokenSigner({'k1': 'secret'}, ttl=60)
+    token, expiry = signer.issue('a@example.com', now=1000)
+    assert expiry == 1060
+    assert signer.verify(token, now=1059) == 'a@example.com'
+    with pytest.raises(InvalidToken, match='expired'):
+        signer.verify(token, now=1060)  # LRU hit
+    with pytest.raises(InvalidToken, match='expired'):
+        TokenSigner({'k1': 'secret'}).verify(token, now=1060)  # HMAC path
+
+
+def test_required_tokens_need_configured_keys(live_app):
+    config = dict(live_app.app.config, TOKEN_KEYS=None, TOKEN_REQUIRED=True)
+    with pytest.raises(RuntimeError, match='TOKEN_KEYS'):
+        live_app.token_signer(config)
+    assert live_app.token_signer(dict(config, TOKEN_REQUIRED=False)).verify  # random key, one process
+    signer = live_app.token_signer(dict(config, TOKEN_KEYS={'k1': 'shared'}))
+    assert signer.verify(signer.issue('a@example.com')[0]) == 'a@example.com'
+
+
+def matched_game(client):
+    queue = uuid.uuid4().hex
+    a, b = f"a-{queue}@example.com", f"b-{queue}@example.com"
+    client.post('/start_game', json={'email': a, 'queue': queue})
+    return client.post('/start_game', json={'email': b, 'queue': queue}).get_json()['game_id'], a
+
+
+@pytest.mark.parametrize('path', ['/decide_starter', '/check_turn_processed', '/reset_turn', '/check_match'])
+def test_game_endpoints_need_a_token_when_required(live_app, monkeypatch, path):
+    client = live_app.app.test_client()
+    game_id, a = matched_game(client)
+    monkeypatch.setitem(live_app.app.config, 'TOKEN_REQUIRED', True)
+
+    assert client.post(path, json={'game_id': game_id}).status_code == 401
+    stranger = live_app.tokens.issue('stranger@example.com')[0]
+    response = client.post(path, json={'game_id': game_id}, headers={'Authorization': f"Bearer {stranger}"})
+    assert response.status_code == 403
+    player = live_app.tokens.issue(a)[0]
+    response = client.post(path, json={'game_id': game_id}, headers={'Authorization': f"Bearer {player}"})
+    assert response.status_code == 200
+
+
+def test_strangers_cannot_follow_a_game(live_app):
+    client = live_app.app.test_client()
+    game_id, a = matched_game(client)
+    stranger = {'Authorization': f"Bearer {live_app.tokens.issue('stranger@example.com')[0]}"}
+    player = {'Authorization': f"Bearer {live_app.tokens.issue(a)[0]}"}
+    assert client.get(f'/events/{game_id}', headers=stranger).status_code == 403
+    body = {'game_id': game_id, 'after': 0, 'timeout': 0}
+    assert client.post('/wait_event', json=body, headers=stranger).status_code == 403
+    assert client.post('/wait_event', json=body, headers=player).status_code == 200
+
+
+def test_strangers_cannot_open_a_game_socket(live_app, live_server):
+    pytest.importorskip('flask_sock')
+    import socket
+    from urllib.parse import urlsplit
+    game_id, _ = matched_game(live_app.app.test_client())
+    url = urlsplit(live_server)
+    # a raw handshake: simple-websocket's client can miss a frame sent with the handshake
+    with socket.create_connection((url.hostname, url.port), timeout=5) as sock:
+        sock.sendall((f"GET /ws/{game_id}?email=stranger@example.com HTTP/1.1\r\nHost: {url.netloc}\r\n"
+                      "Upgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Version: 13\r\n"
+                      "Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n\r\n").encode())
+        received = b''
+        while b'"error"' not in received:
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            received += chunk
+    assert b' 101 ' in received.split(b'\r\n', 1)[0]
+    assert b'Not a player in this game' in received
@@ -0,0 +1,118 @@
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from conftest import ROOT
+from turnlog import TurnLog, TurnLogBusy
+
+
+def run_python(code, cwd, env=None, **kwargs):
+    env = dict(os.environ, PYTHONPATH=ROOT, **(env or {}))
+    return subprocess.Popen([sys.executable, '-c', textwrap.dedent(code)], cwd=cwd, env=env,
+                            stdout=subprocess.PIPE, text=True, **kwargs)
+
+
+def test_directory_is_exclusive_within_a_process(tmp_path):
+    log = TurnLog(str(tmp_path))
+    with pytest.raises(TurnLogBusy):
+        TurnLog(str(tmp_path))
+    log.stop()
+    TurnLog(str(tmp_path)).stop()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork")
+def test_lock_is_not_held_by_forked_children_after_a_crash(tmp_path):
+    proc = run_python(f"""
+        import os, sys, time
+        from turnlog import TurnLog
+        log = TurnLog({str(tmp_path)!r})
+        child = os.fork()
+        if child == 0:
+            time.sleep(60)
+            os._exit(0)
+        print(child, flush=True)
+        time.sleep(60)
+    """, cwd=tmp_path)
+    child = int(proc.stdout.readline())
+    try:
+        with pytest.raises(TurnLogBusy):
+            TurnLog(str(tmp_path))  # the server is up
+        proc.kill()  # crash, leaving the forked child running
+        proc.wait()
+        TurnLog(str(tmp_path)).stop()
+    finally:
+        proc.kill()
+        os.kill(child, signal.SIGKILL)
+
+
+def test_importing_app_leaves_the_turn_log_alone(tmp_path):
+    proc = run_python("""
+        import sys
+        sys.path.insert(0, 'tests')
+        import conftest  # the gameplay module alias
+        import app
+        print(app.turn_log, app._turn_log_started, flush=True)
+    """, cwd=ROOT, env={'DATABASE_URL': f"sqlite:///{tmp_path / 'app.db'}"})
+    out, _ = proc.communicate(timeout=60)
+    assert out.split() == ['None', 'False']
+
+
+def test_recover_rebuilds_live_games_from_snapshot_and_log(tmp_path, catalog, monkeypatch):
+    import json
+    import random
+    from registry import GameRegistry
+    from simulate import SimulatedGame
+
+    rng = random.Random(7)
+    attributes = ('power', 'strike_rate', 'wickets', 'runs_scored')
+    log = TurnLog(str(tmp_path), snapshot_interval=None)
+    monkeypatch.setattr(SimulatedGame, 'journal', log.append)
+    log.start()
+    games = GameRegistry()
+
+    def play(game_id, turns):
+        with games.session(game_id) as gp:
+            for _ in range(turns):
+                if not gp.active:
+                    break
+                gp.play_turn(gp.turn, rng.choice(attributes))
+
+    for n in range(20):
+        gp = SimulatedGame(str(n), f"a{n}@example.com")
+        games.add(gp)
+        with games.session(gp.game_id) as gp:
+            gp.join(f"b{n}@example.com", rng=rng)
+            gp.set_starter(gp.player1)
+    for n in range(20):
+        play(str(n), 5)
+    finished_before = '0'
+    play(finished_before, 100000)
+    assert log.snapshot(games) == 19
+    for n in range(20):
+        play(str(n), 7)
+    finished_after = '1'
+    play(finished_after, 100000)
+    assert log.flush()
+    log.stop()
+
+    # the crash tore the last record in half
+    segment = max(int(name.split('.')[1]) for name in os.listdir(tmp_path) if name.startswith('turns.'))
+    torn = json.dumps({'g': '2', 'n': 10**6, 'k': 'turn', 'player': games.get('2').turn, 'attribute': 'power'})
+    with open(tmp_path / f'turns.{segment}.log', 'a') as f:
+        f.write(torn[:len(torn) // 2])
+
+    monkeypatch.setattr(SimulatedGame, 'journal', None)
+    recovered_into = GameRegistry()
+    recovered = TurnLog(str(tmp_path)).recover(recovered_into)
+    expected = {game_id: games.get(game_id) for game_id in games.store.game_ids()}
+    assert not expected[finished_before].active and not expected[finished_after].active
+    assert sorted(gp.game_id for gp in recovered) == sorted(g for g, gp in expected.items() if gp.active)
+    for gp in recovered:
+        want = expected[gp.game_id]
+        assert (list(gp.deck1), list(gp.deck2), gp.turn) == (list(want.deck1), list(want.deck2), want.turn)
+        assert recovered_into.get(gp.game_id) is not None
+    assert recovered_into.get(finished_before) is None and recovered_into.get(finished_after) is None
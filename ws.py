@@ -0,0 +1,117 @@
+"""
+WebSocket gameplay: one socket per player at /ws/<game_id>?token=... (or ?email=)
+
+Client -> server:  {"t": "play", "attribute": "power"}
+Server -> client:  {"t": "state", "turn", "card"}        sent on connect
+                   {"t": "turn", "turn"}                 starter decided
+                   {"t": "result", "result", "attribute", "card",
+                    "next_card", "next_turn", "gameOver", "overallWinner"}
+                   {"t": "over", "overallWinner"}
+                   {"t": "error", "error"}
+
+A turn costs one "play" frame and one "result" frame carrying the revealed
+card and the player's next top card, instead of /play_turn,
+/check_turn_processed, /get_turn_details and /get_game_state.
+
+init_ws serves it through flask-sock under the WSGI server; asgi.py serves the
+same frames natively.
+"""
+import json
+import threading
+
+from flask import request
+
+
+def result_frame(turn, next_card, email):
+    """Build a player's result frame from a 'turn' event and their 'next_card' event."""
+    won = turn['winner'] == email
+    return {
+        't': 'result',
+        'result': won,
+        'attribute': turn['attribute'],
+        # winner sees the card they beat, loser the card they lost to
+        'card': turn['lost_card'] if won else turn['won_card'],
+        'next_card': next_card['card'] if next_card else None,
+        'next_turn': turn['next_turn'],
+        'gameOver': turn['gameOver'],
+        'overallWinner': turn['overallWinner'],
+    }
+
+
+def player_frames(events, email):
+    """The frames one player is sent for a batch of hub events."""
+    next_cards = {e['seq']: e['data'] for e in events if e['event'] == 'next_card'}
+    for e in events:
+        kind = e['event']
+        if kind == 'turn':
+            # publish_turn appends the player's next_card right after the turn
+            nxt = next((d for seq, d in next_cards.items() if seq > e['seq']), None)
+            yield result_frame(e['data'], nxt, email)
+        elif kind == 'starter':
+            yield {'t': 'turn', 'turn': e['data']['starter']}
+        elif kind == 'game_over':
+            yield {'t': 'over', 'overallWinner': e['data']['overallWinner']}
+        elif kind == 'error':
+            yield {'t': 'error', 'error': e['data']['error']}
+
+
+def init_ws(app, games, hub, apply_turn, player_email=None):
+    """player_email(args) names the caller, e.g. from a ?token=; defaults to ?email=."""
+    from flask_sock import Sock
+    from simple_websocket import ConnectionClosed
+
+    sock = Sock(app)
+
+    @sock.route('/ws/<game_id>')
+    def game_socket(ws, game_id):
+        try:
+            email = player_email(request.args) if player_email else request.args.get('email')
+        except Exception as e:
+            ws.send(json.dumps({'t': 'error', 'error': str(e)}))
+            return
+        gp = games.get(game_id)
+        if not email or not gp:
+            ws.send(json.dumps({'t': 'error', 'error': 'Game not found'}))
+            return
+        if email not in (gp.player1, gp.player2):
+            ws.send(json.dumps({'t': 'error', 'error': 'Not a player in this game'}))
+            return
+        after = hub.last_seq(game_id)
+        ws.send(json.dumps({'t': 'state', 'turn': gp.get_current_turn(), 'card': gp.get_top_card(email)}))
+
+        # A single sender drains the hub so frames never interleave on the socket
+        done = threading.Event()
+
+        def sender():
+            nonlocal after
+            while not done.is_set():
+                events = hub.wait(game_id, email, after, timeout=5)
+                if events is None:
+                    break
+                for frame in player_frames(events, email):
+                    ws.send(json.dumps(frame))
+                    if frame['t'] == 'over':
+                        done.set()
+                if events:
+                    after = events[-1]['seq']
+            try:
+                ws.close()
+            except ConnectionClosed:
+                pass  # the client hung up first
+
+        threading.Thread(target=sender, daemon=True).start()
+        try:
+            while not done.is_set():
+                msg = ws.receive(timeout=5)
+                if msg is None:
+                    continue
+                try:
+                    msg = json.loads(msg)
+                except ValueError:
+                    msg = {}
+                if msg.get('t') == 'play':
+                    apply_turn(game_id, email, msg.get('attribute'))
+                else:
+                    hub.publish(game_id, 'error', {'error': 'Unknown message'}, to=email)
+        finally:
+            done.set()